@@ -0,0 +1,131 @@
+"""
+Equivalence check and benchmark for bulk user registration.
+
+Writes a synthetic transactions CSV and pre-registers some users, then builds
+a batch of registration rows with invalid rows, repeated Aadhar IDs and
+emails, and clashes with the registered users mixed in. Registers the first
+rows one request at a time through the register-user endpoint, records each
+outcome and removes the users it created. Then registers the whole batch with
+``onboarding.register_users`` and checks that those rows get the same outcome
+and credit score. A clash with an earlier row of the batch counts as the
+"already exists" error the endpoint gives.
+
+Exits non-zero if any outcome differs.
+
+Usage:
+    python benchmarks/bulk_registration.py [--rows 100000] [--single 2000] [--seed 5]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+from scratch import setup_django, write_transactions
+
+EXISTING = 1000
+
+
+def build_rows(rng, count, known_ids):
+    """Registration rows: mostly new users, with about 5% of rows invalid or duplicated."""
+    rows = []
+    for i in range(count):
+        roll = rng.random()
+        aadhar_id = rng.choice(known_ids) if rng.random() < 0.7 else str(rng.randint(10 ** 11, 10 ** 12 - 1))
+        row = {'aadhar_id': aadhar_id, 'name': f"Partner user {i}", 'email_id': f"partner{i}@example.com",
+               'annual_income': str(rng.randint(100000, 3000000))}
+        if roll < 0.01:
+            row[rng.choice(['email_id', 'annual_income', 'aadhar_id'])] = rng.choice(['', 'not-valid', '1' * 13])
+        elif roll < 0.02 and rows:
+            row['aadhar_id'] = rng.choice(rows)['aadhar_id']
+        elif roll < 0.03 and rows:
+            row['email_id'] = rng.choice(rows)['email_id']
+        elif roll < 0.04:
+            row['aadhar_id'] = f"{rng.randrange(EXISTING):012d}"
+        elif roll < 0.05:
+            row['email_id'] = f"user{rng.randrange(EXISTING)}@example.com"
+        rows.append(row)
+    return rows
+
+
+def outcome(error):
+    """Compare batch clashes as the endpoint's "already exists" errors."""
+    from loans import onboarding
+
+    return {
+        onboarding.AADHAR_REPEATED: onboarding.AADHAR_EXISTS,
+        onboarding.EMAIL_REPEATED: onboarding.EMAIL_EXISTS,
+    }.get(error, error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--single', type=int, default=2000, help='Rows also registered one at a time')
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='creditservice-onboarding-')
+    setup_django(os.path.join(workdir, 'db.sqlite3'))
+    logging.getLogger('django.request').setLevel(logging.ERROR)  # rejected rows log a warning each
+    from django.conf import settings
+    from django.test import Client
+    from loans.models import User
+    from loans.onboarding import register_users
+    from loans.transactions import get_index
+
+    csv_path = os.path.join(workdir, 'transactions.csv')
+    write_transactions(csv_path, args.rows * 3, args.seed)
+    settings.TRANSACTIONS_CSV_PATH = csv_path
+    settings.TRANSACTIONS_CACHE_DIR = os.path.join(workdir, 'transactions_cache')
+    known_ids = [str(aadhar_id) for aadhar_id in get_index().ids[:args.rows]]
+
+    User.objects.bulk_create([
+        User(aadhar_id=f"{i:012d}", name=f"User {i}", email=f"user{i}@example.com",
+             annual_income=Decimal('900000'), credit_score=700)
+        for i in range(EXISTING)
+    ])
+    rng = random.Random(args.seed)
+    rows = build_rows(rng, args.rows, known_ids)
+
+    client = Client()
+    single = []
+    start = time.perf_counter()
+    for row in rows[:args.single]:
+        response = client.post('/api/register-user/', json.dumps(row), content_type='application/json')
+        body = response.json()
+        if body['error'] is None:
+            single.append((None, User.objects.get(unique_user_id=body['unique_user_id']).credit_score))
+        else:
+            single.append((body['error'], None))
+    single_seconds = time.perf_counter() - start
+    User.objects.exclude(aadhar_id__in=[f"{i:012d}" for i in range(EXISTING)]).delete()
+
+    result = register_users(rows)
+    mismatches = 0
+    for (error, credit_score), row in zip(single, result['results']):
+        if outcome(row['error']) != error or row.get('credit_score') != credit_score:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH row {row['row']}: endpoint {error!r} {credit_score}, bulk {row}")
+    stored = User.objects.count() - EXISTING
+    if stored != result['created']:
+        print(f"MISMATCH {stored} users stored for {result['created']} created")
+        mismatches += 1
+
+    per_row = single_seconds / max(len(single), 1)
+    print(f"register-user endpoint: {per_row * 1000:.2f} ms per row, "
+          f"{per_row * args.rows / 60:.1f} min projected for {args.rows} rows")
+    print(f"register_users: {result['created']} created, {result['rejected']} rejected of {args.rows} rows "
+          f"in {result['seconds']:.1f}s ({args.rows / result['seconds']:.0f} rows/s)")
+    print(f"{mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Credit scoring latency under a billing run, with shared and split task queues.
+
+Seeds active loans in a scratch database and starts real Celery workers on a
+scratch SQLite broker through ``manage.py run_celery_worker``, in two layouts
+with the same number of worker processes:
+
+    shared  one worker consuming both queues, as when every task shared a queue
+    split   one worker for 'interactive' and one for 'bulk'
+
+In each, it times credit scoring tasks one after another while idle, then
+queues process_daily_billing and statement exports and keeps timing scoring
+tasks until the bulk work is done. Latency is from sending a task to reading
+its result.
+
+Runs with the high_throughput database profile, since with a rollback
+journal a long export blocks the billing writes whatever the queues.
+
+Exits non-zero if a task fails.
+
+Usage:
+    python benchmarks/celery_queues.py [--loans 8000] [--exports 2] [--idle 10]
+"""
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from scratch import setup_django, write_transactions
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETTINGS = """
+from kombu.transport import sqlalchemy
+from creditservice.settings import *
+
+sqlalchemy.Transport.polling_interval = 0.05  # poll the broker table every 50 ms, not every second
+
+DATABASES['default']['NAME'] = {database!r}
+CELERY_BROKER_URL = 'sqla+sqlite:///' + {broker!r}
+CELERY_RESULT_BACKEND = 'db+sqlite:///' + {results!r}
+TRANSACTIONS_CSV_PATH = {csv!r}
+TRANSACTIONS_CACHE_DIR = {cache!r}
+"""
+
+LAYOUTS = {
+    'shared': [['interactive', 'bulk', '--concurrency', '2']],
+    'split': [['interactive'], ['bulk']],
+}
+
+
+def seed(count):
+    from django.utils import timezone
+    from loans.models import Loan, User
+
+    today = timezone.now().date()
+    users = User.objects.bulk_create([
+        User(aadhar_id=f"{i:012d}", name=f"User {i}", email=f"user{i}@example.com",
+             annual_income=Decimal('900000'), credit_score=700)
+        for i in range(count)
+    ], batch_size=2000)
+    Loan.objects.bulk_create([
+        Loan(user=user, loan_type='CREDIT_CARD', loan_amount=Decimal(5000 + 37 * i),
+             interest_rate=Decimal('15'), term_period=12, disbursement_date=today - timedelta(days=1 + i % 40),
+             principal_balance=Decimal(5000 + 37 * i),
+             next_billing_date=today - timedelta(days=1 + i % 40) + timedelta(days=Loan.BILLING_CYCLE_DAYS))
+        for i, user in enumerate(users)
+    ], batch_size=2000)
+    return [(str(user.unique_user_id), user.aadhar_id) for user in users[:200]]
+
+
+def reset_billing():
+    """Undo a billing run so the next layout bills the same loans."""
+    from django.db.models import DateField, ExpressionWrapper, F
+    from loans.models import Bill, DailyInterestAccrual, Loan, LoanLedgerEntry
+
+    DailyInterestAccrual.objects.all().delete()
+    Bill.objects.all().delete()
+    LoanLedgerEntry.objects.all().delete()
+    Loan.objects.update(next_billing_date=ExpressionWrapper(
+        F('disbursement_date') + timedelta(days=Loan.BILLING_CYCLE_DAYS), output_field=DateField()
+    ))
+
+
+def score(users, position):
+    """Run one scoring task and return its latency in ms."""
+    from loans.tasks import calculate_credit_score
+
+    start = time.perf_counter()
+    result = calculate_credit_score.delay(*users[position % len(users)])
+    result.get(timeout=300, interval=0.01)
+    return (time.perf_counter() - start) * 1000
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {statistics.median(ordered):7.0f} ms  p95 {p95:7.0f} ms  max {ordered[-1]:7.0f} ms  (n={len(ordered)})"
+
+
+def run_layout(name, workers, users, args, workdir, env):
+    from loans.tasks import export_statements, process_daily_billing
+
+    processes = []
+    for number, queues in enumerate(workers):
+        log = open(os.path.join(workdir, f'{name}-{number}.log'), 'w')
+        processes.append(subprocess.Popen(
+            [sys.executable, 'manage.py', 'run_celery_worker', *queues, '--loglevel', 'warning'],
+            cwd=REPO, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+        ))
+    try:
+        score(users, 0)  # wait for the workers to come up
+        idle = [score(users, i) for i in range(args.idle)]
+
+        start = time.perf_counter()
+        bulk = [process_daily_billing.delay()]
+        bulk += [export_statements.delay(os.path.join(workdir, f'export-{name}-{i}.csv'))
+                 for i in range(args.exports)]
+        loaded = []
+        while not all(result.ready() for result in bulk):
+            loaded.append(score(users, len(loaded)))
+        bulk_seconds = time.perf_counter() - start
+        for result in bulk:
+            result.get(timeout=0)
+    finally:
+        for process in processes:
+            process.terminate()  # warm shutdown: finish the running tasks
+        for process in processes:
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+
+    print(f"{name:>7} idle:     {summary(idle)}")
+    print(f"{name:>7} billing:  {summary(loaded)}  bulk work took {bulk_seconds:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=8000)
+    parser.add_argument('--exports', type=int, default=2)
+    parser.add_argument('--idle', type=int, default=10, help='Scoring tasks timed before the bulk work')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='creditservice-queues-')
+    paths = {name: os.path.join(workdir, file) for name, file in (
+        ('database', 'db.sqlite3'), ('broker', 'broker.sqlite'), ('results', 'results.sqlite'),
+        ('csv', 'transactions.csv'), ('cache', 'transactions_cache'),
+    )}
+    with open(os.path.join(workdir, 'queue_bench_settings.py'), 'w') as settings_file:
+        settings_file.write(SETTINGS.format(**paths))
+    write_transactions(paths['csv'], 50000, 5)
+    sys.path.insert(0, workdir)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'queue_bench_settings'
+    os.environ['CREDITSERVICE_DB_PROFILE'] = 'high_throughput'
+    setup_django(paths['database'])
+    users = seed(args.loans)
+
+    env = dict(os.environ, PYTHONPATH=workdir, CREDITSERVICE_INTERACTIVE_WORKERS='1',
+               CREDITSERVICE_BULK_WORKERS='1')
+    print(f"{args.loans} loans, billing + {args.exports} statement exports, 2 worker processes per layout")
+    try:
+        for name, workers in LAYOUTS.items():
+            reset_billing()
+            run_layout(name, workers, users, args, workdir, env)
+    except Exception as exc:
+        print(f"Task failed: {exc!r}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Equivalence check and benchmark for the versioned credit score models.
+
+Scores random and boundary balances with each model one at a time and as an
+array, and checks that both agree exactly. Compares the models with the
+rules they replace: balance-v1 with the old ``calculate_credit_score`` task
+and balance-v2 with the old registration rule. Then seeds users against a
+synthetic transactions CSV, times ``rescore_users`` under each model, and
+checks the stored scores against scoring each user on its own.
+
+Exits non-zero if the scalar and array paths or the stored scores disagree.
+
+Usage:
+    python benchmarks/credit_scoring.py [--balances 200000] [--users 20000] [--seed 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from scratch import setup_django, write_transactions
+
+
+def legacy_task_score(balance):
+    """The rule the calculate_credit_score task applied."""
+    if balance >= 1000000:
+        return 900
+    elif balance <= 100000:
+        return 300
+    credit_score = 300 + ((balance - 100000) // 15000) * 10
+    return int(min(900, credit_score))
+
+
+def legacy_registration_score(balance):
+    """The rule registration applied."""
+    if balance >= 1000000:
+        credit_score = 900
+    elif balance <= 100000:
+        credit_score = 300
+    else:
+        credit_score = min(900, 300 + int(((balance - 100000) / 15000) * 10))
+    if balance >= 500000:
+        credit_score = max(credit_score, 700)
+    elif balance >= 250000:
+        credit_score = max(credit_score, 600)
+    elif balance >= 150000:
+        credit_score = max(credit_score, 500)
+    return int(credit_score)
+
+
+def random_balances(rng, count):
+    edges = [0, 100000, 150000, 250000, 500000, 1000000]
+    balances = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.3:
+            balances.append(rng.choice(edges) + rng.choice([-1, -0.01, 0, 0.01, 1]))
+        elif roll < 0.5:
+            balances.append(100000 + rng.randint(-5, 70) * rng.choice([1500, 15000]))
+        elif roll < 0.9:
+            balances.append(round(rng.uniform(-200000, 1500000), rng.choice([0, 2])))
+        else:
+            balances.append(rng.uniform(-1e9, 1e9))
+    return balances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--balances', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='creditservice-scoring-')
+    setup_django(os.path.join(workdir, 'db.sqlite3'))
+    import numpy as np
+    from decimal import Decimal
+    from django.conf import settings
+    from loans.models import User
+    from loans.scoring import get_model, rescore_users
+    from loans.transactions import get_index
+
+    rng = random.Random(args.seed)
+    balances = random_balances(rng, args.balances)
+    array = np.array(balances)
+    failures = 0
+    legacy = {'balance-v1': legacy_task_score, 'balance-v2': legacy_registration_score}
+    print(f"{'model':>11} {'scalar/array':>13} {'vs legacy':>10} {'scalar':>10} {'array':>9} {'speedup':>8}")
+    for version in settings.CREDIT_SCORE_MODELS:
+        model = get_model(version)
+        start = time.perf_counter()
+        scalar = [model.score(balance) for balance in balances]
+        scalar_time = time.perf_counter() - start
+        start = time.perf_counter()
+        vectorized = model.score_many(array).tolist()
+        array_time = time.perf_counter() - start
+        mismatches = sum(a != b for a, b in zip(scalar, vectorized))
+        failures += mismatches
+        differ = sum(score != legacy[version](balance) for score, balance in zip(scalar, balances)) \
+            if version in legacy else 0
+        print(f"{version:>11} {mismatches:>13} {differ:>10} {scalar_time * 1000:7.1f} ms "
+              f"{array_time * 1000:6.1f} ms {scalar_time / array_time:7.1f}x")
+
+    csv_path = os.path.join(workdir, 'transactions.csv')
+    write_transactions(csv_path, args.users * 3, args.seed)
+    settings.TRANSACTIONS_CSV_PATH = csv_path
+    settings.TRANSACTIONS_CACHE_DIR = os.path.join(workdir, 'transactions_cache')
+    index = get_index()
+    known = [str(aadhar_id) for aadhar_id in rng.sample(list(index.ids), min(args.users, len(index.ids)))]
+    aadhar_ids = known[:args.users * 9 // 10] + [str(rng.randint(10 ** 11, 10 ** 12 - 1))
+                                                  for _ in range(args.users - len(known[:args.users * 9 // 10]))]
+    User.objects.bulk_create([
+        User(aadhar_id=aadhar_id, name=f"User {i}", email=f"user{i}@example.com", annual_income=Decimal('900000'))
+        for i, aadhar_id in enumerate(aadhar_ids)
+    ], batch_size=2000)
+
+    for version in list(settings.CREDIT_SCORE_MODELS) + [None]:
+        result = rescore_users(version)
+        model = get_model(version)
+        wrong = 0
+        for aadhar_id, credit_score, model_version in User.objects.values_list(
+                'aadhar_id', 'credit_score', 'credit_score_model'):
+            if credit_score != model.score_totals(index.credits_and_debits(aadhar_id)) or model_version != model.version:
+                wrong += 1
+        failures += wrong
+        print(f"rescore_users({version!r}): {result['changed']} of {result['scanned']} users changed "
+              f"in {result['seconds']:.2f}s, {wrong} wrong")
+
+    print(f"{failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
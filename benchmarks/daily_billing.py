@@ -0,0 +1,158 @@
+"""
+Equivalence check and benchmark for billing by next billing date.
+
+Seeds active loans disbursed over the month before a start day, then runs
+daily billing for a few consecutive days twice: with the per-loan loop that
+process_daily_billing ran before, which looked up every loan's latest bill,
+and with ``billing.accrue_interest`` and ``billing.generate_bills``. Checks
+that both write the same accruals and bills, and times each day.
+
+Exits non-zero if the accruals or bills differ.
+
+Usage:
+    python benchmarks/daily_billing.py [--loans 3000] [--days 3]
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from scratch import setup_django
+
+START = date(2025, 3, 1)
+
+
+def legacy_billing(today):
+    """The loop process_daily_billing ran: every active loan, its latest bill, one accrual at a time."""
+    from django.db import transaction
+    from django.db.models import Sum
+    from loans import analytics, money
+    from loans.models import Bill, DailyInterestAccrual, Loan, LoanLedgerEntry
+
+    accrual_count = 0
+    accrual_total = 0
+    for loan in Loan.objects.filter(status='ACTIVE'):
+        latest_bill = Bill.objects.filter(loan=loan).order_by('-billing_date').first()
+        if latest_bill:
+            is_billing_date = (today - latest_bill.billing_date).days >= 30
+        else:
+            is_billing_date = (today - loan.disbursement_date).days >= 30
+
+        principal = money.to_paise(loan.principal_balance)
+        daily_interest = money.daily_interest(principal, money.to_basis_points(loan.interest_rate))
+        with transaction.atomic():
+            DailyInterestAccrual.objects.create(
+                loan=loan, accrual_date=today, interest_amount=money.from_paise(daily_interest),
+                principal_balance=loan.principal_balance
+            )
+            LoanLedgerEntry.objects.create(
+                loan=loan, entry_type='ACCRUAL', entry_date=today,
+                amount=money.from_paise(daily_interest), interest_delta=money.from_paise(daily_interest)
+            )
+        accrual_count += 1
+        accrual_total += daily_interest
+
+        if is_billing_date:
+            with transaction.atomic():
+                start = latest_bill.billing_date + timedelta(days=1) if latest_bill else loan.disbursement_date
+                interest_accrued = money.to_paise(DailyInterestAccrual.objects.filter(
+                    loan=loan, accrual_date__gte=start, accrual_date__lte=today
+                ).aggregate(total=Sum('interest_amount'))['total'] or 0)
+                min_due = money.minimum_due(principal, interest_accrued)
+                past_due = 0
+                if latest_bill and latest_bill.status != 'PAID':
+                    past_due = money.to_paise(latest_bill.total_due_amount) - money.to_paise(latest_bill.amount_paid)
+                bill = Bill.objects.create(
+                    loan=loan, billing_date=today, due_date=today + timedelta(days=15),
+                    principal_due=loan.principal_balance, interest_accrued=money.from_paise(interest_accrued),
+                    min_due_amount=money.from_paise(min_due), past_due_amount=money.from_paise(past_due),
+                    total_due_amount=money.from_paise(min_due + past_due), status='GENERATED'
+                )
+                LoanLedgerEntry.objects.create(
+                    loan_id=bill.loan_id, entry_type='BILL', entry_date=bill.billing_date,
+                    amount=bill.min_due_amount, interest_delta=-bill.interest_accrued,
+                    due_delta=bill.min_due_amount, reference=str(bill.bill_id)
+                )
+                analytics.bills_generated([bill])
+    analytics.interest_accrued(today, accrual_count, money.from_paise(accrual_total))
+
+
+def current_billing(today):
+    from loans import billing
+
+    billing.accrue_interest(today)
+    billing.generate_bills(today)
+
+
+def seed(count):
+    from loans.models import Loan, User
+
+    users = User.objects.bulk_create([
+        User(aadhar_id=f"{i:012d}", name=f"User {i}", email=f"user{i}@example.com",
+             annual_income=Decimal('900000'), credit_score=700)
+        for i in range(count)
+    ], batch_size=2000)
+    Loan.objects.bulk_create([
+        Loan(user=user, loan_type='CREDIT_CARD', loan_amount=Decimal(5000 + 37 * i),
+             interest_rate=Decimal('12') + Decimal(i % 9), term_period=12,
+             disbursement_date=START - timedelta(days=1 + i % 40), principal_balance=Decimal(5000 + 37 * i))
+        for i, user in enumerate(users)
+    ], batch_size=2000)
+
+
+def reset():
+    """Remove the accruals, bills and ledger entries of a run and reschedule billing."""
+    from django.db.models import DateField, ExpressionWrapper, F
+    from loans.models import Bill, DailyInterestAccrual, Loan, LoanLedgerEntry
+
+    DailyInterestAccrual.objects.all().delete()
+    Bill.objects.all().delete()
+    LoanLedgerEntry.objects.all().delete()
+    Loan.objects.update(next_billing_date=ExpressionWrapper(
+        F('disbursement_date') + timedelta(days=30), output_field=DateField()
+    ))
+
+
+def written():
+    from loans.models import Bill, DailyInterestAccrual, LoanLedgerEntry
+
+    return (
+        set(DailyInterestAccrual.objects.values_list('loan_id', 'accrual_date', 'interest_amount', 'principal_balance')),
+        set(Bill.objects.values_list('loan_id', 'billing_date', 'due_date', 'principal_due', 'interest_accrued',
+                                     'min_due_amount', 'past_due_amount', 'total_due_amount')),
+        LoanLedgerEntry.objects.count(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=3000)
+    parser.add_argument('--days', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.loans)
+
+    results = {}
+    for name, run in (('legacy', legacy_billing), ('current', current_billing)):
+        reset()
+        seconds = []
+        for offset in range(args.days):
+            start = time.perf_counter()
+            run(START + timedelta(days=offset))
+            seconds.append(time.perf_counter() - start)
+        results[name] = written()
+        accruals, bills, entries = results[name]
+        print(f"{name:>8}: {len(accruals)} accruals, {len(bills)} bills, {entries} ledger entries, "
+              f"{sum(seconds) / len(seconds):.2f}s per day")
+
+    failures = sum(len(a ^ b) for a, b in zip(results['legacy'][:2], results['current'][:2]))
+    failures += results['legacy'][2] != results['current'][2]
+    print(f"{failures} differences")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
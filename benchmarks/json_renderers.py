@@ -0,0 +1,141 @@
+"""
+Microbenchmark for the fast JSON rendering path.
+
+Renders statement-shaped and payment-shaped payloads with DRF's
+``JSONRenderer`` and with ``FastJSONRenderer`` using each available encoder,
+checking first that every encoder produces byte-identical output, including
+for an edge-case payload (UUIDs, UTC datetimes, U+2028, non-ASCII text).
+Then fetches real statements through the test client with the fast path off
+and on, to show the share of request time it saves.
+
+Exits non-zero if any output differs.
+
+Usage:
+    python benchmarks/json_renderers.py [--iterations 20000] [--requests 500]
+"""
+
+import argparse
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from scratch import setup_django, seed_loans
+
+
+def statement_payload(rng, lines=36):
+    start = date(2025, 1, 31)
+    paid = rng.randint(0, lines)
+    return {
+        "error": None,
+        "past_transactions": [{
+            "date": (start + timedelta(days=30 * month)).strftime('%Y-%m-%d'),
+            "principal_due": Decimal(rng.randint(0, 10 ** 7)).scaleb(-2),
+            "interest": Decimal(rng.randint(0, 10 ** 6)).scaleb(-2),
+            "amount_paid": Decimal(rng.randint(1, 10 ** 5)).quantize(Decimal('0.01')),
+        } for month in range(paid)],
+        "upcoming_transactions": [{
+            "date": (start + timedelta(days=30 * month)).strftime('%Y-%m-%d'),
+            "amount_due": Decimal(rng.randint(1, 10 ** 5)).quantize(Decimal('0.01')),
+        } for month in range(paid, lines)],
+    }
+
+
+def payment_payload(rng):
+    return {"error": None, "message": f"Payment of ₹{Decimal(rng.randint(1, 10 ** 7)).scaleb(-2)} recorded successfully."}
+
+
+def edge_payload():
+    return {
+        "loan_id": uuid.uuid4(),
+        "created_at": datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+        "naive": datetime(2025, 1, 2, 3, 4, 5),
+        "day": date(2025, 1, 2),
+        "text": "line\u2028separator\u2029and ₹ unicode \"quoted\" \\ \n",
+        "amounts": (Decimal('0'), Decimal('-12.50'), Decimal('99999999.99'), 1.5, 7, True, None),
+        "nested": {"empty": [], "map": {"a": Decimal('0.10')}},
+    }
+
+
+def time_render(render, payloads, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        render(payloads[i % len(payloads)])
+    return time.perf_counter() - start
+
+
+def bench_renderers(iterations):
+    from rest_framework.renderers import JSONRenderer
+    from loans.renderers import FastJSONRenderer, ENCODERS, orjson
+
+    encoders = [name for name in ENCODERS if name != 'orjson' or orjson is not None]
+    renderers = {'drf': JSONRenderer()}
+    for name in encoders:
+        renderer = FastJSONRenderer()
+        renderer.encoder_name = name
+        renderers[name] = renderer
+
+    rng = random.Random(3)
+    workloads = {
+        'statement': [statement_payload(rng) for _ in range(200)],
+        'payment': [payment_payload(rng) for _ in range(200)],
+    }
+
+    failures = 0
+    for payload in workloads['statement'] + workloads['payment'] + [edge_payload()]:
+        expected = renderers['drf'].render(payload)
+        for name in encoders:
+            if renderers[name].render(payload) != expected:
+                failures += 1
+                print(f"MISMATCH {name}: {renderers[name].render(payload)!r} != {expected!r}")
+    print(f"Output check over {len(workloads['statement']) + len(workloads['payment']) + 1} payloads: "
+          f"{failures} mismatches")
+
+    print(f"{'payload':>10} {'renderer':>8} {'us/render':>10} {'speedup':>8}")
+    for workload, payloads in workloads.items():
+        baseline = None
+        for name, renderer in renderers.items():
+            elapsed = time_render(renderer.render, payloads, iterations)
+            baseline = baseline or elapsed
+            print(f"{workload:>10} {name:>8} {elapsed / iterations * 1e6:10.1f} {baseline / elapsed:7.1f}x")
+    return failures
+
+
+def bench_requests(requests):
+    from django.conf import settings
+    from django.test import Client
+
+    loans = seed_loans(20, term_period=36, paid=12)
+    client = Client()
+    paths = [f'/api/get-statement/?loan_id={loan.loan_id}' for loan in loans]
+
+    bodies = {}
+    for encoder in ('', 'auto'):
+        settings.FAST_JSON_ENCODER = encoder
+        bodies[encoder] = [client.get(path).content for path in paths]
+        start = time.perf_counter()
+        for i in range(requests):
+            client.get(paths[i % len(paths)])
+        elapsed = time.perf_counter() - start
+        label = 'JSONRenderer' if not encoder else 'FastJSONRenderer'
+        print(f"{label:>17} statement requests: {requests / elapsed:8.0f} req/s")
+    settings.FAST_JSON_ENCODER = ''
+    return 0 if bodies[''] == bodies['auto'] else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    failures = bench_renderers(args.iterations)
+    failures += bench_requests(args.requests)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
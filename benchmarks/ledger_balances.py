@@ -0,0 +1,116 @@
+"""
+Equivalence check and benchmark for ledger balances with snapshots.
+
+Seeds loans with a year of daily accruals, monthly bills and payments as
+ledger entries, then computes balances as of random days three ways: by
+summing every entry up to the day, with ``balance_as_of`` before any
+snapshot exists, and with ``balance_as_of`` after weekly snapshots. Checks
+that all three agree and times them.
+
+Exits non-zero if any balance differs.
+
+Usage:
+    python benchmarks/ledger_balances.py [--loans 200] [--days 365] [--queries 500]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from scratch import setup_django
+
+
+def seed_ledger(loans, days, rng):
+    from loans.models import User, Loan, LoanLedgerEntry
+
+    start = date(2025, 1, 1)
+    entries = []
+    loan_ids = []
+    for i in range(loans):
+        user = User.objects.create(aadhar_id=f"{i:012d}", name=f"User {i}", email=f"user{i}@example.com",
+                                   annual_income=Decimal('900000'), credit_score=700)
+        loan = Loan.objects.create(user=user, loan_type='CREDIT_CARD', loan_amount=Decimal('50000'),
+                                   interest_rate=Decimal('15'), term_period=12, disbursement_date=start,
+                                   principal_balance=Decimal('50000'))
+        loan_ids.append(loan.loan_id)
+        principal = Decimal('50000')
+        accrued = Decimal('0')
+        entries.append(LoanLedgerEntry(loan=loan, entry_type='DISBURSEMENT', entry_date=start,
+                                       amount=principal, principal_delta=principal))
+        for day in range(1, days):
+            today = start + timedelta(days=day)
+            interest = (principal * Decimal('0.15') / 365).quantize(Decimal('0.01'))
+            accrued += interest
+            entries.append(LoanLedgerEntry(loan=loan, entry_type='ACCRUAL', entry_date=today,
+                                           amount=interest, interest_delta=interest))
+            if day % 30 == 0:
+                due = (principal * Decimal('0.03') + accrued).quantize(Decimal('1'))
+                entries.append(LoanLedgerEntry(loan=loan, entry_type='BILL', entry_date=today, amount=due,
+                                               interest_delta=-accrued, due_delta=due))
+                accrued = Decimal('0')
+            if day % 30 == 10 and rng.random() < 0.9:
+                amount = Decimal(rng.randint(1500, 3000))
+                repaid = min(principal, amount / 2)
+                principal -= repaid
+                entries.append(LoanLedgerEntry(loan=loan, entry_type='PAYMENT', entry_date=today, amount=amount,
+                                               principal_delta=-repaid, due_delta=-amount, paid_delta=amount))
+    LoanLedgerEntry.objects.bulk_create(entries, batch_size=5000)
+    return loan_ids, start, len(entries)
+
+
+def full_scan(loan_id, as_of):
+    from django.db.models import Sum
+    from loans.ledger import BALANCES, CENT, DELTAS
+    from loans.models import LoanLedgerEntry
+
+    totals = LoanLedgerEntry.objects.filter(loan_id=loan_id, entry_date__lte=as_of).aggregate(
+        **{balance: Sum(delta) for balance, delta in DELTAS.items()}
+    )
+    return {balance: (totals[balance] or Decimal(0)).quantize(CENT) for balance in BALANCES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365, help="Days of history, ending before today")
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from loans.ledger import BALANCES, balance_as_of, take_snapshots
+
+    rng = random.Random(args.seed)
+    loan_ids, start, entries = seed_ledger(args.loans, args.days, rng)
+    print(f"{entries} ledger entries for {args.loans} loans over {args.days} days")
+    queries = [(rng.choice(loan_ids), start + timedelta(days=rng.randint(0, args.days + 5)))
+               for _ in range(args.queries)]
+
+    def run(label, compute):
+        started = time.perf_counter()
+        results = [compute(loan_id, as_of) for loan_id, as_of in queries]
+        elapsed = time.perf_counter() - started
+        print(f"{label:>28}: {elapsed / len(queries) * 1000:6.2f} ms per balance")
+        return [{balance: result[balance] for balance in BALANCES} for result in results]
+
+    expected = run("sum of all entries", full_scan)
+    no_snapshots = run("balance_as_of, no snapshots", balance_as_of)
+
+    started = time.perf_counter()
+    snapshots = 0
+    for day in range(0, args.days, 7):
+        snapshots += take_snapshots(start + timedelta(days=day))['snapshots']
+    print(f"{snapshots} weekly snapshots taken in {time.perf_counter() - started:.2f}s")
+    with_snapshots = run("balance_as_of, weekly", balance_as_of)
+
+    failures = sum(a != b for a, b in zip(expected, no_snapshots)) + \
+        sum(a != b for a, b in zip(expected, with_snapshots))
+    print(f"{failures} mismatches")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Timing of the Decimal money helpers against the integer-paise core.
+
+Generates random loans (amount, rate, term, principal, payment and accrued
+interest) and times each money rule both ways, with values starting and
+ending as the Decimals the models hold: the Decimal helpers in
+``loans.utils`` that the call sites use, and the same rule in
+``loans.money`` with its conversions to and from paise. The EMI schedule is
+timed against the Decimal loop it replaced. The tests in ``loans/tests.py``
+check that both implementations agree exactly.
+
+Usage:
+    python benchmarks/money_paise.py [--cases 20000] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loans import money, utils  # noqa: E402
+
+
+def decimal_emi_schedule(loan_amount, interest_rate, term_period):
+    schedule = []
+    remaining_principal = loan_amount
+    for month in range(1, term_period + 1):
+        monthly_interest = (remaining_principal * interest_rate / 100) / 12
+        principal_portion = loan_amount * Decimal('0.03')
+        if month == term_period:
+            amount_due = remaining_principal + monthly_interest
+        else:
+            amount_due = principal_portion + monthly_interest
+            remaining_principal -= principal_portion
+        schedule.append(round(amount_due))
+    return schedule
+
+
+def paise_emi_schedule(loan_amount, interest_rate, term_period):
+    return money.emi_schedule(money.to_paise(loan_amount), money.to_basis_points(interest_rate), term_period)
+
+
+def paise_daily_interest(principal, interest_rate):
+    return money.from_paise(money.daily_interest(money.to_paise(principal), money.to_basis_points(interest_rate)))
+
+
+def paise_min_due(principal, interest_accrued):
+    return money.from_paise(money.minimum_due(money.to_paise(principal), money.to_paise(interest_accrued)))
+
+
+def paise_principal_after_payment(principal, amount, interest_rate):
+    return money.from_paise(money.principal_after_payment(
+        money.to_paise(principal), money.to_paise(amount), money.to_basis_points(interest_rate)
+    ))
+
+
+def paise_payment_split(amount, loan_amount, interest_rate):
+    principal, interest = money.payment_split(
+        money.to_paise(amount), money.to_paise(loan_amount), money.to_basis_points(interest_rate)
+    )
+    return money.from_paise(principal), money.from_paise(interest)
+
+
+TIMINGS = [
+    ('emi_schedule', decimal_emi_schedule, paise_emi_schedule, ('loan_amount', 'interest_rate', 'term_period')),
+    ('daily_interest', utils.calculate_daily_interest, paise_daily_interest, ('principal', 'interest_rate')),
+    ('minimum_due', utils.calculate_minimum_due, paise_min_due, ('principal', 'interest_accrued')),
+    ('principal_after_payment', utils.calculate_principal_after_payment, paise_principal_after_payment,
+     ('principal', 'payment', 'interest_rate')),
+    ('payment_split', utils.calculate_payment_split, paise_payment_split, ('payment', 'loan_amount', 'interest_rate')),
+]
+
+
+def rupees(rng, low, high, whole=False):
+    paise = rng.randint(low * 100, high * 100)
+    if whole:
+        paise -= paise % 100
+    return money.from_paise(paise)
+
+
+def random_case(rng):
+    loan_amount = rupees(rng, 1000, 5000000, whole=rng.random() < 0.5)
+    return {
+        'loan_amount': loan_amount,
+        'interest_rate': Decimal(rng.choice([rng.randint(1, 9999), rng.randint(1, 40) * 100])).scaleb(-2),
+        'term_period': rng.randint(1, 33),
+        'principal': rupees(rng, 0, 5000000),
+        'payment': rupees(rng, 1, 200000, whole=True),
+        'interest_accrued': rupees(rng, 0, 50000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cases', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [random_case(rng) for _ in range(args.cases)]
+
+    print(f"{args.cases} random cases")
+    print(f"{'function':>24} {'decimal':>10} {'paise':>10} {'paise speedup':>14}")
+    for name, decimal_function, paise_function, fields in TIMINGS:
+        inputs = [[case[field] for field in fields] for case in cases]
+        timings = []
+        for function in (decimal_function, paise_function):
+            start = time.perf_counter()
+            for values in inputs:
+                function(*values)
+            timings.append(time.perf_counter() - start)
+        print(f"{name:>24} {timings[0]:9.3f}s {timings[1]:9.3f}s {timings[0] / timings[1]:13.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
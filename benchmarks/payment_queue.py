@@ -0,0 +1,121 @@
+"""
+Throughput benchmark for group-committed payments.
+
+Seeds loans with long EMI schedules, then has concurrent client threads pay
+EMIs through the make-payment endpoint, first with each request writing its
+own transaction and then with PAYMENT_WRITE_QUEUE on. Each client pays its
+own loans' EMIs in order. Prints payments per second and failed requests for
+both modes, then checks that every accepted payment, and no other, is in the
+database: one Payment, one paid EMI and one PAYMENT ledger entry each.
+
+Exits non-zero if the database doesn't match the accepted payments.
+
+Usage:
+    python benchmarks/payment_queue.py [--clients 16] [--payments 50] [--profile default]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from scratch import seed_loans, setup_django
+
+LOANS_PER_CLIENT = 2
+
+
+def pay(loans, schedules, count, results):
+    """Pay ``count`` EMIs across ``loans`` in due-date order, recording each response."""
+    from django.test import Client
+
+    client = Client()
+    accepted = {loan.loan_id: 0 for loan in loans}
+    failed = []
+    for i in range(count):
+        loan = loans[i % len(loans)]
+        amount = schedules[loan.loan_id][accepted[loan.loan_id]]
+        response = client.post('/api/make-payment/', json.dumps({
+            'loan_id': str(loan.loan_id), 'amount': str(amount)
+        }), content_type='application/json')
+        if response.status_code == 200:
+            accepted[loan.loan_id] += 1
+        else:
+            failed.append(response.json()['error'])
+    results.append((accepted, failed))
+
+
+def run(mode, loans, schedules, clients, payments):
+    from django.conf import settings
+
+    settings.PAYMENT_WRITE_QUEUE = mode == 'queue'
+    results = []
+    threads = [
+        threading.Thread(target=pay, args=(
+            loans[i * LOANS_PER_CLIENT:(i + 1) * LOANS_PER_CLIENT], schedules, payments, results
+        ))
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    accepted = {}
+    failed = []
+    for client_accepted, client_failed in results:
+        accepted.update(client_accepted)
+        failed.extend(client_failed)
+    total = sum(accepted.values())
+    print(f"{mode:>7}: {total / seconds:8.0f} payments/s, {total} accepted, {len(failed)} failed"
+          + (f" (e.g. {failed[0]!r})" if failed else ""))
+    return accepted
+
+
+def check(accepted):
+    """Count loans whose payments, paid EMIs or ledger entries differ from the accepted payments."""
+    from loans.models import EMISchedule, LoanLedgerEntry, Payment
+
+    wrong = 0
+    for loan_id, count in accepted.items():
+        if (Payment.objects.filter(loan_id=loan_id).count() != count
+                or EMISchedule.objects.filter(loan_id=loan_id, is_paid=True).count() != count
+                or LoanLedgerEntry.objects.filter(loan_id=loan_id, entry_type='PAYMENT').count() != count):
+            wrong += 1
+    return wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--payments', type=int, default=50, help='Payments per client')
+    parser.add_argument('--profile', default='default', help='CREDITSERVICE_DB_PROFILE to run with')
+    args = parser.parse_args()
+
+    os.environ['CREDITSERVICE_DB_PROFILE'] = args.profile
+    setup_django()
+    logging.getLogger('django.request').setLevel(logging.ERROR)  # rejected payments log a warning each
+    from loans.models import EMISchedule
+
+    term_period = args.payments // LOANS_PER_CLIENT + 1
+    loans = seed_loans(2 * args.clients * LOANS_PER_CLIENT, term_period=term_period, paid=0)
+    schedules = {}
+    for loan_id, amount_due in EMISchedule.objects.order_by('loan_id', 'due_date').values_list('loan_id', 'amount_due'):
+        schedules.setdefault(loan_id, []).append(amount_due)
+
+    print(f"{args.clients} clients x {args.payments} payments, {args.profile} database profile")
+    wrong = 0
+    for position, mode in enumerate(('direct', 'queue')):
+        mode_loans = loans[position * args.clients * LOANS_PER_CLIENT:(position + 1) * args.clients * LOANS_PER_CLIENT]
+        wrong += check(run(mode, mode_loans, schedules, args.clients, args.payments))
+
+    print(f"{wrong} loans with mismatched payments")
+    return 1 if wrong else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Prepayment and foreclosure against paying a loan off EMI by EMI.
+
+Seeds loans in a scratch database and pays off half of them the only way
+the API allowed before, one exact-amount make-payment request per EMI, and
+the other half with a single foreclose-loan request, timing both. Then
+prepays part of some more loans and checks that:
+
+    * the remaining EMIs keep their due dates and hold the schedule
+      recomputed on the new principal
+    * the loan's principal matches its ledger balance, and foreclosed loans,
+      including those left active with principal after their last EMI, are
+      closed in both with no EMIs left unpaid
+    * the statement shows the new schedule under a new ETag
+    * the portfolio counters match a rebuild from the base tables
+
+Exits non-zero if any check fails.
+
+Usage:
+    python benchmarks/prepayment.py [--loans 200] [--term 24]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from scratch import setup_django, seed_loans
+
+
+def post(client, path, payload):
+    start = time.perf_counter()
+    response = client.post(path, payload, content_type='application/json')
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} {payload}: {response.content.decode()}")
+    return response, elapsed
+
+
+def pay_emi_by_emi(client, loan):
+    """Pay every EMI of a loan with its own request; returns (requests, seconds)."""
+    from loans.models import EMISchedule
+
+    requests = seconds = 0
+    for amount_due in EMISchedule.objects.filter(loan=loan, is_paid=False).order_by('due_date').values_list(
+        'amount_due', flat=True
+    ):
+        _, elapsed = post(client, '/api/make-payment/', {'loan_id': str(loan.loan_id), 'amount': str(amount_due)})
+        requests += 1
+        seconds += elapsed
+    return requests, seconds
+
+
+def metrics():
+    from loans.models import PortfolioMetric
+
+    return {(metric, key): (count, amount) for metric, key, count, amount in PortfolioMetric.objects.values_list(
+        'metric', 'key', 'count', 'amount'
+    ) if count or amount}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=200, help='Loans paid off each way')
+    parser.add_argument('--term', type=int, default=24, help='Term of each loan in months')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from loans import ledger, money
+    from loans.analytics import rebuild_metrics
+    from loans.models import EMISchedule, Loan
+
+    loans = seed_loans(args.loans * 3, term_period=args.term, paid=1)
+    by_emi, foreclosed, prepaid = loans[:args.loans], loans[args.loans:2 * args.loans], loans[2 * args.loans:]
+    client = Client()
+    failures = 0
+
+    costs = [pay_emi_by_emi(client, loan) for loan in by_emi]
+    requests = sum(count for count, _ in costs)
+    print(f"{'EMI by EMI':>14}: {requests / len(costs):5.1f} requests, "
+          f"median {statistics.median(seconds for _, seconds in costs) * 1000:7.2f} ms per loan")
+    # Installments are rounded to the rupee, so the last one may not clear the principal
+    left_open = list(Loan.objects.filter(loan_id__in=[loan.loan_id for loan in by_emi], status='ACTIVE'))
+    print(f"{'':>14}  {len(left_open)} of {len(by_emi)} loans still active with every EMI paid, "
+          f"foreclosing the principal left")
+    for loan in left_open:
+        post(client, '/api/foreclose-loan/', {'loan_id': str(loan.loan_id)})
+    latencies = [post(client, '/api/foreclose-loan/', {'loan_id': str(loan.loan_id)})[1] for loan in foreclosed]
+    print(f"{'foreclosure':>14}: {1:5.1f} requests, median {statistics.median(latencies) * 1000:7.2f} ms per loan")
+
+    for loan in left_open + foreclosed:
+        loan.refresh_from_db()
+        balance = ledger.balance_as_of(loan.loan_id)
+        unpaid = EMISchedule.objects.filter(loan=loan, is_paid=False).count()
+        if loan.status != 'CLOSED' or loan.principal_balance or unpaid or balance['status'] != 'CLOSED' \
+                or balance['principal']:
+            print(f"MISMATCH foreclosed loan {loan.loan_id}: {loan.status}, {loan.principal_balance} left, "
+                  f"{unpaid} EMIs unpaid, ledger {balance}")
+            failures += 1
+
+    latencies = []
+    for i, loan in enumerate(prepaid):
+        before = client.get('/api/get-statement/', {'loan_id': loan.loan_id})
+        due_dates = list(EMISchedule.objects.filter(loan=loan, is_paid=False).order_by('due_date').values_list(
+            'due_date', flat=True
+        ))
+        amount = 300 + 10 * (i % 100)
+        response, elapsed = post(client, '/api/prepay-loan/', {'loan_id': str(loan.loan_id), 'amount': str(amount)})
+        latencies.append(elapsed)
+
+        loan.refresh_from_db()
+        remaining = list(EMISchedule.objects.filter(loan=loan, is_paid=False).order_by('due_date').values_list(
+            'due_date', 'amount_due'
+        ))
+        expected = money.emi_schedule(
+            money.to_paise(loan.principal_balance), money.to_basis_points(loan.interest_rate), len(due_dates) - 1
+        )
+        if [due_date for due_date, _ in remaining] != due_dates[1:] or [amount for _, amount in remaining] != expected:
+            print(f"MISMATCH schedule of loan {loan.loan_id}: {remaining}, expected {expected}")
+            failures += 1
+        if ledger.balance_as_of(loan.loan_id)['principal'] != loan.principal_balance:
+            print(f"MISMATCH ledger principal of loan {loan.loan_id}")
+            failures += 1
+        after = client.get('/api/get-statement/', {'loan_id': loan.loan_id})
+        upcoming = [entry['amount_due'] for entry in after.json()['upcoming_transactions']]
+        if after['ETag'] == before['ETag'] or upcoming != [float(amount) for amount in expected] \
+                or response.json()['due_dates'] != after.json()['upcoming_transactions']:
+            print(f"MISMATCH statement of loan {loan.loan_id} after prepaying {amount}")
+            failures += 1
+    print(f"{'prepayment':>14}: {1:5.1f} requests, median {statistics.median(latencies) * 1000:7.2f} ms per loan")
+
+    incremental = metrics()
+    rebuild_metrics()
+    if incremental != metrics():
+        print(f"MISMATCH portfolio counters:\n  incremental {incremental}\n  rebuilt     {metrics()}")
+        failures += 1
+
+    print(f"{Loan.objects.filter(status='CLOSED').count()} loans closed, {failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
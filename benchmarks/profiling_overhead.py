@@ -0,0 +1,112 @@
+"""
+Overhead of the on-demand profiler, and a check of what it stores.
+
+Seeds loans in a scratch database and times statement requests through the
+test client with profiling enabled but idle, and enabled with a trigger
+armed for another path, each taking turns with a client that has it
+disabled (the middleware isn't installed). Then
+profiles some requests with the token header and a billing task sent with
+``send_profiled``, and checks that each stored profile has the view or task
+in its call tree and one SQL entry per statement executed.
+
+Exits non-zero if a profile is missing or incomplete.
+
+Usage:
+    python benchmarks/profiling_overhead.py [--loans 50] [--requests 2000] [--profiled 20]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+from scratch import setup_django, seed_loans
+
+TOKEN = 'benchmark-token'
+
+
+def client_for(loans):
+    """A test client with the middleware chain loaded under the current settings."""
+    from django.test import Client
+
+    client = Client()
+    client.get('/api/get-statement/', {'loan_id': loans[0].loan_id})
+    return client
+
+
+def timed(clients, loans, count, **headers):
+    """Per-request latencies of statement requests, taking turns between the clients."""
+    latencies = [[] for _ in clients]
+    for i in range(count):
+        for position, client in enumerate(clients):
+            start = time.perf_counter()
+            response = client.get('/api/get-statement/', {'loan_id': loans[i % len(loans)].loan_id}, **headers)
+            latencies[position].append(time.perf_counter() - start)
+    return latencies, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests timed per mode')
+    parser.add_argument('--profiled', type=int, default=20, help='Requests profiled with the token header')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from creditservice.celery import app
+    from loans import profiling, tasks
+    from loans.models import ExecutionProfile, ProfilingTrigger
+
+    loans = seed_loans(args.loans, term_period=36)
+    settings.PROFILING_TOKEN = TOKEN
+    failures = 0
+
+    clients = []
+    for enabled in (False, True):
+        settings.PROFILING_ENABLED = enabled
+        clients.append(client_for(loans))
+    for label in ('enabled, idle', 'enabled, trigger armed'):
+        if label == 'enabled, trigger armed':
+            ProfilingTrigger.objects.create(path='/api/get-balance/', remaining=1)  # another path
+            profiling._triggers_read_at = None
+        (disabled, enabled), _ = timed(clients, loans, args.requests)
+        baseline = statistics.median(disabled) * 1e6
+        median = statistics.median(enabled) * 1e6
+        print(f"{label:>24}: median {median:7.1f} us per request, "
+              f"{median - baseline:+.1f} us against {baseline:7.1f} us disabled")
+    if ExecutionProfile.objects.exists():
+        print("MISMATCH requests were profiled without asking")
+        failures += 1
+
+    (latencies,), response = timed(clients[1:], loans, args.profiled, HTTP_X_PROFILE=TOKEN)
+    profiles = ExecutionProfile.objects.filter(kind='REQUEST')
+    profiled = statistics.median(profile.duration_ms for profile in profiles) * 1000
+    median = statistics.median(latencies) * 1e6
+    print(f"{'profiled':>24}: median {profiled:7.1f} us under cProfile ({profiled / baseline:.1f}x), "
+          f"{median:7.1f} us with storing the profile")
+    if profiles.count() != args.profiled or 'X-Profile-Id' not in response:
+        print(f"MISMATCH {profiles.count()} request profiles stored for {args.profiled} requests")
+        failures += 1
+    for profile in profiles:
+        if 'build_statement' not in profile.call_tree or sum(group['count'] for group in profile.sql) != profile.query_count:
+            print(f"MISMATCH incomplete profile {profile}")
+            failures += 1
+
+    app.conf.task_always_eager = True
+    profiling.connect_task_signals()
+    profiling.send_profiled(tasks.process_daily_billing).get()
+    task_profile = ExecutionProfile.objects.filter(kind='TASK').first()
+    if task_profile is None or 'accrue_interest' not in task_profile.call_tree:
+        print("MISMATCH billing task profile missing or incomplete")
+        failures += 1
+    else:
+        print(f"task profile: {task_profile}, {task_profile.query_count} queries "
+              f"({task_profile.sql_ms:.0f} ms of SQL), {len(task_profile.stats)} bytes of stats")
+
+    print(f"{failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Throughput and accuracy of the portfolio reconciliation job.
+
+Bulk-seeds a synthetic book in a scratch database: loans with EMI
+schedules, the payments of their first EMIs with the principal they leave,
+and a bill each. Then corrupts a sample of loans, one kind of discrepancy
+each (principal off by a rupee, closed with principal left, an EMI marked
+paid without a payment, a bill credited with more than was paid, a bill's
+status flipped), reconciles the book with one worker and
+with several, and checks that each run reports exactly the corrupted loans
+with their kinds.
+
+Exits non-zero if a run misses a discrepancy or reports one that wasn't
+injected.
+
+Usage:
+    python benchmarks/reconciliation.py [--loans 100000] [--workers 4] [--corrupt 50]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from scratch import setup_django
+
+KINDS = ('PRINCIPAL', 'LOAN_STATUS', 'EMIS_PAID', 'BILLS_PAID', 'BILL_STATUS')
+
+
+def seed_book(count, term, seed, batch=5000):
+    """Bulk-create a consistent book of ``count`` loans; returns the loan IDs."""
+    from django.db import transaction
+    from loans import money
+    from loans.models import Bill, EMISchedule, Loan, Payment, User
+
+    rng = random.Random(seed)
+    loan_ids = []
+    for offset in range(0, count, batch):
+        users, loans, emis, payments, bills = [], [], [], [], []
+        for i in range(offset, min(offset + batch, count)):
+            if i % 100 == 0:
+                users.append(User(aadhar_id=f"{i // 100:012d}", name=f"User {i // 100}",
+                                  email=f"user{i // 100}@example.com", annual_income=Decimal('900000'),
+                                  credit_score=700))
+            loan_paise, rate_bp = rng.randint(1000, 500000) * 100, rng.choice((1200, 1500, 1800, 2400))
+            schedule = money.emi_schedule(loan_paise, rate_bp, term)
+            paid = rng.randint(0, term - 1)
+            principal = loan_paise
+            for amount in schedule[:paid]:
+                principal = money.principal_after_payment(principal, amount * 100, rate_bp)
+
+            loan = Loan(user=users[-1], loan_type='CREDIT_CARD', loan_amount=money.from_paise(loan_paise),
+                        interest_rate=money.from_paise(rate_bp), term_period=term,
+                        disbursement_date=date(2025, 1, 1), principal_balance=money.from_paise(principal),
+                        status='ACTIVE')
+            loans.append(loan)
+            emis += [EMISchedule(loan=loan, due_date=date(2025, 1, 1) + timedelta(days=30 * month),
+                                 amount_due=amount, is_paid=month <= paid)
+                     for month, amount in enumerate(schedule, start=1)]
+            payments += [Payment(loan=loan, amount=amount, status='COMPLETED',
+                                 payment_date=datetime(2025, 1, 1, tzinfo=dt_timezone.utc) + timedelta(days=30 * month))
+                         for month, amount in enumerate(schedule[:paid], start=1)]
+            total_due = rng.randint(100, 5000)
+            paid_on_bill = min(total_due, sum(schedule[:paid]))
+            bills.append(Bill(loan=loan, billing_date=date(2025, 1, 31), due_date=date(2025, 2, 15),
+                              principal_due=loan.principal_balance, interest_accrued=0, min_due_amount=total_due,
+                              total_due_amount=total_due, amount_paid=paid_on_bill,
+                              status='PAID' if paid_on_bill >= total_due else 'GENERATED'))
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            for loan in loans:
+                loan.user_id = loan.user.pk
+            Loan.objects.bulk_create(loans)
+            for rows in (emis, payments, bills):
+                for row in rows:
+                    row.loan_id = row.loan.pk
+            EMISchedule.objects.bulk_create(emis, batch_size=2000)
+            Payment.objects.bulk_create(payments, batch_size=2000)
+            Bill.objects.bulk_create(bills, batch_size=2000)
+        loan_ids += [loan.loan_id for loan in loans]
+    return loan_ids
+
+
+def corrupt(loan_ids, per_kind, seed):
+    """Break ``per_kind`` loans for each kind of discrepancy; returns the expected (loan_id, kind) set."""
+    from django.db.models import F, Sum
+    from loans.models import Bill, EMISchedule, Loan, Payment
+
+    rng = random.Random(seed)
+    victims = rng.sample(loan_ids, per_kind * len(KINDS))
+    expected = set()
+    for number, loan_id in enumerate(victims):
+        kind = KINDS[number % len(KINDS)]
+        if kind == 'PRINCIPAL':
+            Loan.objects.filter(pk=loan_id).update(principal_balance=F('principal_balance') + 1)
+        elif kind == 'LOAN_STATUS':
+            Loan.objects.filter(pk=loan_id).update(status='CLOSED')
+        elif kind == 'EMIS_PAID':
+            emi = EMISchedule.objects.filter(loan_id=loan_id, is_paid=False).order_by('due_date').last()
+            EMISchedule.objects.filter(pk=emi.pk).update(is_paid=True)
+        elif kind == 'BILLS_PAID':
+            paid = Payment.objects.filter(loan_id=loan_id).aggregate(total=Sum('amount'))['total'] or 0
+            Bill.objects.filter(loan_id=loan_id).update(total_due_amount=paid + 100, amount_paid=paid + 100,
+                                                        status='PAID')
+        else:
+            bill = Bill.objects.get(loan_id=loan_id)
+            Bill.objects.filter(pk=bill.pk).update(status='GENERATED' if bill.status == 'PAID' else 'PAID')
+        expected.add((loan_id, kind))
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--term', type=int, default=12, help='Term of each loan in months')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--corrupt', type=int, default=50, help='Loans corrupted per kind of discrepancy')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+
+    setup_django()
+    from loans.models import EMISchedule, Payment
+    from loans.reconciliation import reconcile
+
+    start = time.perf_counter()
+    loan_ids = seed_book(args.loans, args.term, args.seed)
+    print(f"seeded {len(loan_ids)} loans, {EMISchedule.objects.count()} EMIs, {Payment.objects.count()} payments "
+          f"in {time.perf_counter() - start:.1f}s")
+    expected = corrupt(loan_ids, args.corrupt, args.seed)
+
+    failures = 0
+    for workers in sorted({1, args.workers}):
+        run = reconcile(workers=workers)
+        seconds = (run.finished_at - run.started_at).total_seconds()
+        found = set(run.discrepancies.values_list('loan_id', 'kind'))
+        print(f"{workers:>2} workers: {seconds:6.1f}s, {run.loans_checked / seconds:8.0f} loans/s, "
+              f"{seconds * 5_000_000 / run.loans_checked / 60:5.1f} min for 5M loans; "
+              f"{len(found)} discrepancies")
+        if run.loans_checked != len(loan_ids):
+            print(f"MISMATCH checked {run.loans_checked} of {len(loan_ids)} loans")
+            failures += 1
+        for loan_id, kind in sorted(expected - found, key=str)[:10]:
+            print(f"MISMATCH missed {kind} on loan {loan_id}")
+        for loan_id, kind in sorted(found - expected, key=str)[:10]:
+            print(f"MISMATCH reported {kind} on loan {loan_id}, which wasn't corrupted that way")
+        failures += len(expected ^ found)
+
+    print(f"{failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
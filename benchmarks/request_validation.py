@@ -0,0 +1,179 @@
+"""
+Equivalence check and benchmark for the lightweight request validators.
+
+Feeds the same randomly generated request bodies (JSON-style dicts and
+form/query QueryDicts, valid and invalid in every way the fields can be) to
+each DRF serializer and to the matching schema in ``loans.validators``, and
+checks that both accept the same input, produce the same validated data and
+report the same errors in the same order. Then times both on valid and
+invalid input.
+
+Exits non-zero if any case differs.
+
+Usage:
+    python benchmarks/request_validation.py [--cases 5000] [--iterations 20000] [--seed 5]
+"""
+
+import argparse
+import random
+import sys
+import time
+import uuid
+
+from scratch import setup_django
+
+FIELD_VALUES = {
+    'uuid': [
+        lambda rng: str(uuid.UUID(int=rng.getrandbits(128))),
+        lambda rng: uuid.UUID(int=rng.getrandbits(128)).hex.upper(),
+        lambda rng: uuid.UUID(int=rng.getrandbits(128)).urn,
+        lambda rng: rng.randint(-5, 2 ** 130),
+        lambda rng: 'not-a-uuid', lambda rng: True, lambda rng: 1.5, lambda rng: [1],
+    ],
+    'decimal': [
+        lambda rng: str(rng.randint(1, 5000)),
+        lambda rng: f'{rng.randint(-100, 10 ** 7)}.{rng.randint(0, 999)}',
+        lambda rng: rng.randint(-10, 10 ** 13), lambda rng: rng.random() * 10 ** rng.randint(0, 12),
+        lambda rng: rng.choice(['NaN', 'Infinity', '-inf', '1e3', '1E-3', ' 12.50 ', '0.001', '-0', 'abc',
+                                '1' * 1001, '00012.10', '12,5', True, {'a': 1}]),
+    ],
+    'integer': [
+        lambda rng: rng.randint(-3, 60), lambda rng: str(rng.randint(-3, 60)),
+        lambda rng: rng.choice(['12.0', '12.5', ' 7 ', '7.00 ', 'x', '1' * 1001, 3.0, 3.5, True, [2]]),
+    ],
+    'date': [
+        lambda rng: f'2025-{rng.randint(1, 13):02d}-{rng.randint(1, 32):02d}',
+        lambda rng: rng.choice(['2025-1-5', '20250105', '2025-01-05T10:00', '05/01/2025', 20250105, '', 'x']),
+    ],
+    'aadhar': [
+        lambda rng: str(rng.randint(10 ** 11, 10 ** 12 - 1)),
+        lambda rng: str(rng.randint(0, 10 ** 13)),
+        lambda rng: rng.randint(10 ** 11, 10 ** 12 - 1),
+        lambda rng: rng.choice(['12345678901a', ' 123456789012 ', '1234\x005678901', '12\ud800', True, 1.5]),
+    ],
+    'name': [
+        lambda rng: rng.choice(['Asha', ' Ravi Kumar ', 'ಕನ್ನಡ', 'x' * 256, 'a\x00b', '\udfff', 42, False]),
+    ],
+    'email': [
+        lambda rng: f'user{rng.randint(0, 99)}@example.com',
+        lambda rng: rng.choice(['no-at-sign', 'a@b', ' spaced@example.com ', 'x' * 300 + '@example.com', 'a\x00@b.com']),
+    ],
+    'loan_type': [
+        lambda rng: rng.choice(['CREDIT_CARD', 'Credit Card Loan', 'HOME', 'x' * 25, '']),
+    ],
+}
+
+SCHEMAS = {
+    'RegisterUser': {'aadhar_id': 'aadhar', 'name': 'name', 'email_id': 'email', 'annual_income': 'decimal'},
+    'LoanApplication': {
+        'unique_user_id': 'uuid', 'loan_type': 'loan_type', 'loan_amount': 'decimal',
+        'interest_rate': 'decimal', 'term_period': 'integer', 'disbursement_date': 'date',
+    },
+    'Payment': {'loan_id': 'uuid', 'amount': 'decimal'},
+    'Foreclosure': {'loan_id': 'uuid'},
+    'Statement': {'loan_id': 'uuid'},
+    'Balance': {'loan_id': 'uuid', 'as_of': 'date'},
+}
+
+
+def random_body(rng, fields):
+    from django.http import QueryDict
+
+    roll = rng.random()
+    if roll < 0.02:
+        return rng.choice([None, [], 'text', 12])
+
+    body = {}
+    for name, kind in fields.items():
+        choice = rng.random()
+        if choice < 0.04:
+            continue  # missing
+        elif choice < 0.06:
+            body[name] = rng.choice([None, '', '   '])
+        else:
+            # The first generator of each kind usually produces valid values
+            generators = FIELD_VALUES[kind]
+            body[name] = (generators[0] if rng.random() < 0.6 else rng.choice(generators))(rng)
+
+    if roll < 0.5:
+        return body
+    # Form and query-string input only carries strings
+    form = QueryDict(mutable=True)
+    for name, value in body.items():
+        if value is not None and not isinstance(value, (list, dict)):
+            form.setlist(name, ['' if isinstance(value, bool) else str(value)] * rng.randint(1, 2))
+    return form
+
+
+def run_serializer(serializer_class, body):
+    serializer = serializer_class(data=body)
+    if serializer.is_valid():
+        return dict(serializer.validated_data), {}
+    return {}, {field: [str(error) for error in errors] for field, errors in serializer.errors.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cases', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from loans import serializers, validators
+    from loans.services import validation_error_message
+
+    rng = random.Random(args.seed)
+    failures = 0
+    for name, fields in SCHEMAS.items():
+        serializer_class = getattr(serializers, f'{name}Serializer')
+        schema = getattr(validators, f'{name}Schema')
+        valid = 0
+        for _ in range(args.cases):
+            body = random_body(rng, fields)
+            expected = run_serializer(serializer_class, body)
+            actual = schema.validate(body)
+            if expected != actual or (expected[1] and validation_error_message(expected[1])
+                                      != validation_error_message(actual[1])):
+                failures += 1
+                if failures <= 10:
+                    print(f"MISMATCH {name} {body!r}:\n  serializer {expected}\n  schema     {actual}")
+            valid += not expected[1]
+        print(f"{name:>16}: {args.cases} random bodies ({valid} valid), checked")
+    print(f"{failures} mismatches")
+
+    samples = {
+        'Payment': ({'loan_id': str(uuid.uuid4()), 'amount': '212.00'}, {'loan_id': 'x', 'amount': 'y'}),
+        'Statement': ({'loan_id': str(uuid.uuid4())}, {}),
+        'LoanApplication': (
+            {'unique_user_id': str(uuid.uuid4()), 'loan_type': 'Credit Card Loan', 'loan_amount': '5000',
+             'interest_rate': '15', 'term_period': 6, 'disbursement_date': '2025-01-01'},
+            {'unique_user_id': 'x', 'loan_type': '', 'loan_amount': '9000', 'interest_rate': '2',
+             'term_period': 'z', 'disbursement_date': '01/01/2025'},
+        ),
+        'RegisterUser': (
+            {'aadhar_id': '123456789012', 'name': 'Asha', 'email_id': 'asha@example.com', 'annual_income': '900000'},
+            {'aadhar_id': '12', 'name': '', 'email_id': 'nope', 'annual_income': '-1'},
+        ),
+    }
+    print(f"{'schema':>16} {'input':>8} {'serializer':>11} {'schema':>9} {'speedup':>8}")
+    for name, bodies in samples.items():
+        serializer_class = getattr(serializers, f'{name}Serializer')
+        schema = getattr(validators, f'{name}Schema')
+        for label, body in zip(('valid', 'invalid'), bodies):
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                run_serializer(serializer_class, body)
+            serializer_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                schema.validate(body)
+            schema_time = time.perf_counter() - start
+            print(f"{name:>16} {label:>8} {serializer_time / args.iterations * 1e6:8.1f} us "
+                  f"{schema_time / args.iterations * 1e6:6.1f} us {serializer_time / schema_time:7.1f}x")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Equivalence check and benchmark for the local scoring service.
+
+Writes a synthetic transactions CSV, starts the scoring service on a scratch
+socket and checks that it returns the same credit and debit totals as the
+in-process index for known and unknown Aadhar IDs. Then times single-user and
+batched lookups both ways, and starts fresh worker processes that score one
+user locally or through the service to compare the memory each one holds.
+
+Exits non-zero if any lookup differs.
+
+Usage:
+    python benchmarks/scoring_service.py [--rows 500000] [--workers 4] [--calls 2000]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from scratch import setup_django, write_transactions
+
+
+def memory_kb():
+    """Resident and proportional set size of this process, in KiB."""
+    sizes = {}
+    with open('/proc/self/smaps_rollup') as rollup:
+        for line in rollup:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                sizes[name] = int(value.split()[0])
+    return sizes
+
+
+def child(mode, csv_path, cache_dir, address, aadhar_id):
+    """Score one user in a fresh process and print its memory use as JSON."""
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'creditservice.settings'
+    os.environ['CREDITSERVICE_SCORING_SOCKET'] = address if mode == 'service' else ''
+
+    import django
+    from django.conf import settings
+
+    settings.TRANSACTIONS_CSV_PATH = csv_path
+    settings.TRANSACTIONS_CACHE_DIR = cache_dir
+    # Scoring reads ingested balances from the scratch database
+    settings.DATABASES['default']['NAME'] = os.path.join(os.path.dirname(csv_path), 'db.sqlite3')
+    django.setup()
+
+    from loans.scoring_service import transaction_totals
+
+    before = memory_kb()
+    totals = transaction_totals([aadhar_id])
+    after = memory_kb()
+    print(json.dumps({'before': before, 'after': after, 'totals': totals,
+                      'numpy_loaded': 'numpy' in sys.modules}))
+
+
+def time_calls(function, batches):
+    start = time.perf_counter()
+    for batch in batches:
+        function(batch)
+    return (time.perf_counter() - start) / len(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--child', nargs=5, metavar=('MODE', 'CSV', 'CACHE', 'ADDRESS', 'ID'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='creditservice-scoring-')
+    csv_path = os.path.join(workdir, 'transactions.csv')
+    cache_dir = os.path.join(workdir, 'transactions_cache')
+    address = os.path.join(workdir, 'scoring.sock')
+    write_transactions(csv_path, args.rows, args.seed)
+
+    setup_django(os.path.join(workdir, 'db.sqlite3'))
+    from django.conf import settings
+
+    settings.TRANSACTIONS_CSV_PATH = csv_path
+    settings.TRANSACTIONS_CACHE_DIR = cache_dir
+
+    import multiprocessing
+    from loans import scoring_service
+    from loans.transactions import get_index
+
+    server = multiprocessing.get_context('fork').Process(
+        target=scoring_service.serve, args=(address, args.workers))
+    server.start()
+    deadline = time.monotonic() + 60
+    while not os.path.exists(address):
+        if time.monotonic() > deadline or not server.is_alive():
+            print("Scoring service did not start")
+            return 1
+        time.sleep(0.05)
+
+    try:
+        rng = random.Random(args.seed)
+        known = [int(aadhar_id) for aadhar_id in rng.sample(list(get_index().ids), 2000)]
+        unknown = [rng.randint(10 ** 11, 10 ** 12 - 1) for _ in range(200)]
+        candidates = known + unknown + ['not-a-number', str(known[0])]
+        rng.shuffle(candidates)
+
+        failures = 0
+        for start in range(0, len(candidates), 100):
+            batch = candidates[start:start + 100]
+            if scoring_service.request_totals(batch, address) != scoring_service.local_totals(batch):
+                failures += 1
+                print(f"MISMATCH in batch starting at {start}")
+        print(f"{len(candidates)} Aadhar IDs checked, {failures} mismatching batches")
+
+        print(f"{'lookup':>14} {'in-process':>11} {'service':>10}")
+        for size in (1, 100):
+            batches = [rng.sample(known, size) for _ in range(args.calls // size or 1)]
+            local = time_calls(scoring_service.local_totals, batches)
+            remote = time_calls(lambda batch: scoring_service.request_totals(batch, address), batches)
+            print(f"{f'batch of {size}':>14} {local * 1e6:8.0f} us {remote * 1e6:7.0f} us")
+
+        print(f"{'worker scoring':>14} {'numpy':>6} {'RSS':>9} {'PSS':>9} {'private':>9}")
+        for mode in ('local', 'service'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, csv_path, cache_dir,
+                 address, str(known[0])],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            after = result['after']
+            private = after['Private_Clean'] + after['Private_Dirty']
+            print(f"{mode:>14} {'yes' if result['numpy_loaded'] else 'no':>6} {after['Rss'] / 1024:6.1f} MB "
+                  f"{after['Pss'] / 1024:6.1f} MB {private / 1024:6.1f} MB")
+    finally:
+        server.terminate()
+        server.join()
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Helpers for benchmarks that need Django configured against a scratch database.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def setup_django(database=None):
+    """Configure Django on a freshly migrated SQLite file and return its path."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'creditservice.settings')
+
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(prefix='creditservice-bench-'), 'db.sqlite3')
+    settings.DATABASES['default']['NAME'] = database
+    settings.ALLOWED_HOSTS = ['*']
+    django.setup()
+    call_command('migrate', verbosity=0)
+    return database
+
+
+def seed_loans(count, term_period=12, paid=3):
+    """Create one user per loan, each with an EMI schedule and a few payments."""
+    from datetime import date
+    from decimal import Decimal
+    from loans.models import User
+    from loans.services import create_loan, record_payment
+
+    loans = []
+    for i in range(count):
+        user = User.objects.create(
+            aadhar_id=f"{i:012d}", name=f"User {i}", email=f"user{i}@example.com",
+            annual_income=Decimal('900000'), credit_score=700,
+        )
+        loan, _ = create_loan(
+            user, 'CREDIT_CARD', Decimal('5000'), Decimal('15'), term_period, date(2025, 1, 1)
+        )
+        for emi in loan.emi_schedule.order_by('due_date')[:paid]:
+            record_payment(loan, emi.amount_due, emi)
+        loans.append(loan)
+    return loans
+
+
+def write_transactions(path, rows, seed):
+    """Write a transactions CSV of random users and amounts."""
+    import random
+
+    rng = random.Random(seed)
+    with open(path, 'w') as csv:
+        csv.write('AADHARID,Date,Amount,Transaction_type\n')
+        for _ in range(rows):
+            csv.write(f"{rng.randint(10 ** 11, 10 ** 12 - 1)},2023-01-{rng.randint(1, 28):02d},"
+                      f"{rng.randint(100, 500000)},{rng.choice(('CREDIT', 'DEBIT'))}\n")
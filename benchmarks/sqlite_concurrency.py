@@ -0,0 +1,162 @@
+"""
+Reader/writer concurrency benchmark for the SQLite tuning profiles.
+
+Runs a mixed workload of statement-style reads and payment-style writes from
+several threads against a scratch database, once per profile defined in
+``creditservice.settings.SQLITE_PROFILES``, and prints the throughput of each.
+
+The "default" profile mimics Django's stock behaviour: a new connection per
+operation and deferred transactions. Profiles with a positive CONN_MAX_AGE
+keep one connection per thread, as Django does with persistent connections.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--readers 8] [--writers 4] [--seconds 5]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from creditservice.settings import SQLITE_PROFILES, sqlite_init_command  # noqa: E402
+
+LOANS = 200
+EMIS_PER_LOAN = 12
+
+
+def create_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE emi (id INTEGER PRIMARY KEY, loan_id TEXT, due_date TEXT,
+                          amount_due NUMERIC, is_paid BOOL);
+        CREATE INDEX emi_loan ON emi (loan_id, due_date);
+        CREATE TABLE payment (id TEXT PRIMARY KEY, loan_id TEXT, amount NUMERIC,
+                              payment_date TEXT);
+        CREATE INDEX payment_loan ON payment (loan_id, payment_date);
+    """)
+    loan_ids = [uuid.uuid4().hex for _ in range(LOANS)]
+    conn.executemany(
+        "INSERT INTO emi (loan_id, due_date, amount_due, is_paid) VALUES (?, ?, ?, 0)",
+        [(loan_id, f"2025-{month:02d}-01", 250) for loan_id in loan_ids
+         for month in range(1, EMIS_PER_LOAN + 1)],
+    )
+    conn.commit()
+    conn.close()
+    return loan_ids
+
+
+class Worker:
+    def __init__(self, path, profile):
+        self.path = path
+        self.profile = profile
+        self.persistent = profile['CONN_MAX_AGE'] != 0
+        self.conn = None
+
+    def connect(self):
+        options = self.profile['OPTIONS']
+        conn = sqlite3.connect(self.path, timeout=options.get('timeout', 5), isolation_level=None)
+        if self.profile['PRAGMAS']:
+            for command in sqlite_init_command(self.profile['PRAGMAS']).split(';'):
+                conn.execute(command)
+        return conn
+
+    def connection(self):
+        if not self.persistent:
+            return self.connect()
+        if self.conn is None:
+            self.conn = self.connect()
+        return self.conn
+
+    def release(self, conn):
+        if not self.persistent:
+            conn.close()
+
+    def read(self, loan_id):
+        conn = self.connection()
+        conn.execute(
+            "SELECT due_date, amount_due, is_paid FROM emi WHERE loan_id = ? ORDER BY due_date",
+            (loan_id,),
+        ).fetchall()
+        conn.execute(
+            "SELECT amount, payment_date FROM payment WHERE loan_id = ? ORDER BY payment_date",
+            (loan_id,),
+        ).fetchall()
+        self.release(conn)
+
+    def write(self, loan_id):
+        conn = self.connection()
+        mode = self.profile['OPTIONS'].get('transaction_mode', 'DEFERRED')
+        conn.execute(f"BEGIN {mode}")
+        try:
+            conn.execute(
+                "INSERT INTO payment (id, loan_id, amount, payment_date) VALUES (?, ?, ?, ?)",
+                (uuid.uuid4().hex, loan_id, 250, time.strftime('%Y-%m-%d %H:%M:%S')),
+            )
+            conn.execute(
+                "UPDATE emi SET is_paid = 1 WHERE id = (SELECT id FROM emi WHERE loan_id = ? "
+                "AND is_paid = 0 ORDER BY due_date LIMIT 1)",
+                (loan_id,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self.release(conn)
+
+
+def run_profile(name, profile, readers, writers, seconds):
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.sqlite3')
+    loan_ids = create_database(path)
+    counts = {'read': 0, 'write': 0, 'error': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def loop(kind):
+        worker = Worker(path, profile)
+        operation = worker.read if kind == 'read' else worker.write
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                operation(random.choice(loan_ids))
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts[kind] += done
+            counts['error'] += errors
+
+    threads = [threading.Thread(target=loop, args=('read',)) for _ in range(readers)]
+    threads += [threading.Thread(target=loop, args=('write',)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{name:>16}: {counts['read'] / seconds:10.0f} reads/s "
+          f"{counts['write'] / seconds:10.0f} writes/s "
+          f"{counts['error']:6d} lock errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile")
+    for name, profile in SQLITE_PROFILES.items():
+        run_profile(name, profile, args.readers, args.writers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Startup benchmark for the lazy and eager startup modes.
+
+Builds a scratch database and a synthetic transactions CSV (with its columnar
+cache already built, as after a restart), then starts a fresh Python process
+per run and mode. Each process times ``django.setup()`` (which runs the
+startup phase), its first request and its second request. The requests
+register a user, which reads the transactions index, so with lazy startup
+the first request pays for importing NumPy and pandas' readers and opening
+the index. Prints the median of each over the runs.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--rows 200000]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from scratch import setup_django, write_transactions
+
+
+def child(mode, database, csv_path, cache_dir):
+    """Time one process start in ``mode`` and print the timings as JSON."""
+    import io
+    from contextlib import redirect_stdout
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'creditservice.settings'
+    os.environ['CREDITSERVICE_STARTUP'] = mode
+
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = database
+    settings.ALLOWED_HOSTS = ['*']
+    settings.TRANSACTIONS_CSV_PATH = csv_path
+    settings.TRANSACTIONS_CACHE_DIR = cache_dir
+
+    timings = {}
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        django.setup()
+    timings['setup'] = time.perf_counter() - start
+
+    from django.test import Client
+
+    client = Client()
+    for label, aadhar in (('first_request', '100000000001'), ('second_request', '100000000002')):
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            response = client.post('/api/register-user/', {
+                'aadhar_id': aadhar, 'name': 'Asha', 'email_id': f'asha{aadhar}@example.com',
+                'annual_income': '900000',
+            })
+        timings[label] = time.perf_counter() - start
+        assert response.status_code == 200, response.content
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=5)
+    parser.add_argument('--child', nargs=4, metavar=('MODE', 'DB', 'CSV', 'CACHE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='creditservice-startup-')
+    template = setup_django(os.path.join(workdir, 'template.sqlite3'))
+    csv_path = os.path.join(workdir, 'transactions.csv')
+    cache_dir = os.path.join(workdir, 'transactions_cache')
+    write_transactions(csv_path, args.rows, args.seed)
+
+    from loans.transactions import build_cache
+
+    build_cache(csv_path, cache_dir)
+
+    results = {}
+    for run in range(args.runs):
+        for mode in ('lazy', 'eager'):
+            database = os.path.join(workdir, f'{mode}-{run}.sqlite3')
+            shutil.copy(template, database)
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, database, csv_path, cache_dir],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            timings['process'] = time.perf_counter() - start
+            for name, seconds in timings.items():
+                results.setdefault(mode, {}).setdefault(name, []).append(seconds)
+
+    print(f"{args.rows} transactions, median of {args.runs} process starts")
+    print(f"{'mode':>6} {'setup':>9} {'1st request':>12} {'2nd request':>12} {'setup+1st':>10} {'process':>9}")
+    for mode, timings in results.items():
+        median = {name: statistics.median(values) * 1000 for name, values in timings.items()}
+        print(f"{mode:>6} {median['setup']:6.0f} ms {median['first_request']:9.1f} ms "
+              f"{median['second_request']:9.1f} ms {median['setup'] + median['first_request']:7.0f} ms "
+              f"{median['process']:6.0f} ms")
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
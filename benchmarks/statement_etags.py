@@ -0,0 +1,94 @@
+"""
+Benchmark for conditional statement requests.
+
+Seeds loans in a scratch database and polls their statements through the
+test client the way a mobile client does: first without a validator, then
+sending back each loan's ETag in ``If-None-Match``. Compares time, queries
+and bytes per poll. Then pays an EMI on some loans and checks that exactly
+those loans get a fresh 200 with a new ETag, and the rest still get 304.
+
+Exits non-zero if a poll gets the wrong status or payload.
+
+Usage:
+    python benchmarks/statement_etags.py [--loans 200] [--polls 5] [--term 36]
+"""
+
+import argparse
+import sys
+import time
+
+from scratch import setup_django, seed_loans
+
+
+def poll(client, loans, etags=None):
+    """Fetch each loan's statement once; return responses, seconds and query count."""
+    from contextlib import ExitStack
+    from django.db import connections, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    responses = {}
+    reset_queries()  # the query log holds only the last 9000 queries
+    with ExitStack() as stack:  # statements are read through the replica alias
+        captures = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+        start = time.perf_counter()
+        for loan in loans:
+            headers = {'HTTP_IF_NONE_MATCH': etags[loan.loan_id]} if etags else {}
+            responses[loan.loan_id] = client.get('/api/get-statement/', {'loan_id': loan.loan_id}, **headers)
+        seconds = time.perf_counter() - start
+    return responses, seconds, sum(len(capture.captured_queries) for capture in captures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=200)
+    parser.add_argument('--polls', type=int, default=5, help='Polls of every loan per mode')
+    parser.add_argument('--term', type=int, default=36, help='EMIs per loan')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from loans.models import EMISchedule
+    from loans.services import record_payment
+
+    loans = seed_loans(args.loans, term_period=args.term)
+    client = Client()
+    failures = 0
+
+    full, _, _ = poll(client, loans)
+    etags = {loan_id: response['ETag'] for loan_id, response in full.items()}
+    for label, validators in (('full', None), ('conditional', etags)):
+        seconds = queries = size = 0
+        for _ in range(args.polls):
+            responses, poll_seconds, poll_queries = poll(client, loans, validators)
+            seconds += poll_seconds
+            queries += poll_queries
+            size += sum(len(response.content) for response in responses.values())
+            expected = 304 if validators else 200
+            failures += sum(response.status_code != expected for response in responses.values())
+        count = args.polls * len(loans)
+        print(f"{label:>11}: {seconds / count * 1000:6.2f} ms, {queries / count:.1f} queries, "
+              f"{size / count:7.0f} bytes per poll")
+
+    paid = loans[::4]
+    for loan in paid:
+        emi = EMISchedule.objects.filter(loan=loan, is_paid=False).order_by('due_date').first()
+        record_payment(loan, emi.amount_due, emi)
+    responses, _, _ = poll(client, loans, etags)
+    paid_ids = {loan.loan_id for loan in paid}
+    for loan_id, response in responses.items():
+        if loan_id in paid_ids:
+            fresh = client.get('/api/get-statement/', {'loan_id': loan_id})
+            if (response.status_code != 200 or response['ETag'] == etags[loan_id]
+                    or response.content != fresh.content):
+                failures += 1
+        elif response.status_code != 304:
+            failures += 1
+    print(f"after paying {len(paid)} loans: "
+          f"{sum(response.status_code == 200 for response in responses.values())} re-sent, "
+          f"{sum(response.status_code == 304 for response in responses.values())} not modified")
+    print(f"{failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Concurrency benchmark for the sync (WSGI) and async (ASGI) API views.
+
+Issues the same burst of concurrent statement and registration requests
+(the latter reads the transactions CSV) against ``/api/...`` through a
+bounded thread pool, which stands in for a WSGI server's worker threads,
+and against ``/api/async/...`` from a single event loop, as an ASGI server would
+run them. Prints throughput and latency percentiles for each.
+
+Usage:
+    python benchmarks/wsgi_vs_asgi.py [--requests 400] [--concurrency 100] [--threads 8]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scratch import setup_django, seed_loans
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:>28}: {len(latencies) / elapsed:8.0f} req/s  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p95 {p95 * 1000:7.1f} ms")
+
+
+def run_sync(paths, threads):
+    from django.db import connection
+    from django.test import Client
+
+    def fetch(method, path, params):
+        client = Client()
+        start = time.perf_counter()
+        getattr(client, method)(path, params)
+        latency = time.perf_counter() - start
+        connection.close()
+        return latency
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(lambda item: fetch(*item), paths))
+    return latencies, time.perf_counter() - start
+
+
+def run_async(paths, concurrency):
+    from django.test import AsyncClient
+
+    async def fetch(semaphore, method, path, params):
+        async with semaphore:
+            start = time.perf_counter()
+            await getattr(AsyncClient(), method)(path, params)
+            return time.perf_counter() - start
+
+    async def burst():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(fetch(semaphore, *item) for item in paths))
+
+    start = time.perf_counter()
+    latencies = asyncio.run(burst())
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads")
+    parser.add_argument('--loans', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    loans = seed_loans(args.loans)
+    statements = [{'loan_id': str(loans[i % len(loans)].loan_id)} for i in range(args.requests)]
+    registrations = [
+        {'aadhar_id': f"{digit}{i:011d}", 'name': f"Bench {i}", 'email_id': f"{digit}.{i}@example.com",
+         'annual_income': '900000'}
+        for digit in (8, 9) for i in range(args.requests)
+    ]
+
+    print(f"{args.requests} requests per run, {args.threads} WSGI threads, "
+          f"{args.concurrency} concurrent async requests")
+    report("statement, sync WSGI", *run_sync(
+        [('get', '/api/get-statement/', params) for params in statements], args.threads))
+    report("statement, async ASGI", *run_async(
+        [('get', '/api/async/get-statement/', params) for params in statements], args.concurrency))
+    report("registration, sync WSGI", *run_sync(
+        [('post', '/api/register-user/', params) for params in registrations[:args.requests]],
+        args.threads))
+    report("registration, async ASGI", *run_async(
+        [('post', '/api/async/register-user/', params) for params in registrations[args.requests:]],
+        args.concurrency))
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,10 @@ ASGI config for creditservice project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async implementations of the API are mounted under /api/async/ and only
+release their worker while waiting on I/O when served through this callable,
+e.g. ``uvicorn creditservice.asgi:application --workers 4``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +16,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'creditservice.settings')
+# API servers warm up before taking traffic, see loans/startup.py
+os.environ.setdefault('CREDITSERVICE_STARTUP', 'eager')
+
+application = get_asgi_application()
+
+from loans import startup  # noqa: E402  (needs the app registry)
 
-application = get_asgi_application()
\ No newline at end of file
+startup.report_ready()
@@ -0,0 +1,109 @@
+"""
+Database routing for creditservice project.
+
+Reads go to the primary unless the code doing them has opted in with
+``use_read_replica()``. Once anything in the current request has written,
+every later read in that request goes to the primary as well, so a request
+always sees its own writes. Clients that just wrote are also pinned to the
+primary for a short window through a cookie, which covers replication lag
+between a payment and the statement fetched right after it.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_replica_allowed = ContextVar('replica_allowed', default=False)
+_wrote = ContextVar('wrote', default=False)
+_pinned = ContextVar('pinned', default=False)
+
+
+def replica_alias():
+    """Return the configured replica alias, or the primary if there is none."""
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None) or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_read_replica():
+    """Send reads inside the block to the replica, unless the request has written."""
+    token = _replica_allowed.set(True)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+def reset_write_pin():
+    """Forget earlier writes, e.g. at the start of a new request or task."""
+    _wrote.set(False)
+
+
+class ReadReplicaRouter:
+    """Route opted-in reads to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if _replica_allowed.get() and not (_wrote.get() or _pinned.get()):
+            return replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinMiddleware:
+    """Scope write tracking to one request and pin recent writers to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        pinned_token = _pinned.set(bool(request.COOKIES.get(settings.REPLICA_PIN_COOKIE)))
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _wrote.reset(wrote_token)
+            _pinned.reset(pinned_token)
+        return self._pin(response, wrote)
+
+    async def __acall__(self, request):
+        pinned_token = _pinned.set(bool(request.COOKIES.get(settings.REPLICA_PIN_COOKIE)))
+        wrote_token = _wrote.set(False)
+        try:
+            response = await self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _wrote.reset(wrote_token)
+            _pinned.reset(pinned_token)
+        return self._pin(response, wrote)
+
+    @staticmethod
+    def _pin(response, wrote):
+        if wrote and replica_alias() != DEFAULT_DB_ALIAS:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
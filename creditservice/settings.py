@@ -5,6 +5,9 @@ Django settings for creditservice project.
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
+from kombu import Queue
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -34,11 +37,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'loans.middleware.FirstRequestTimingMiddleware',
+    'loans.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'creditservice.routers.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,6 +79,91 @@ DATABASES = {
     }
 }
 
+# SQLite tuning profiles, selected with CREDITSERVICE_DB_PROFILE.
+# "default" keeps Django's stock behaviour (a fresh connection per request,
+# rollback journal). "high_throughput" switches the database to WAL so readers
+# no longer block on writers, relaxes fsync to once per checkpoint, enlarges
+# the page cache, memory-maps the file and keeps connections open between
+# requests. The pragmas are applied by SQLite's init_command hook every time
+# Django opens a connection.
+SQLITE_PROFILES = {
+    'default': {
+        'CONN_MAX_AGE': 0,
+        'PRAGMAS': {},
+        'OPTIONS': {},
+    },
+    'high_throughput': {
+        'CONN_MAX_AGE': 600,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -64000,  # 64 MB, negative values are KiB
+            'mmap_size': 268435456,  # 256 MB
+            'temp_store': 'MEMORY',
+            'busy_timeout': 20000,  # ms
+        },
+        'OPTIONS': {
+            'timeout': 20,  # seconds
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+}
+
+SQLITE_PROFILE = os.environ.get('CREDITSERVICE_DB_PROFILE', 'default')
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(f"Unknown CREDITSERVICE_DB_PROFILE: {SQLITE_PROFILE}")
+
+
+def sqlite_init_command(pragmas):
+    """Build the init_command that applies a set of SQLite pragmas."""
+    return ';'.join(f"PRAGMA {name}={value}" for name, value in pragmas.items())
+
+
+_sqlite_profile = SQLITE_PROFILES[SQLITE_PROFILE]
+DATABASES['default']['CONN_MAX_AGE'] = _sqlite_profile['CONN_MAX_AGE']
+DATABASES['default']['CONN_HEALTH_CHECKS'] = _sqlite_profile['CONN_MAX_AGE'] > 0
+DATABASES['default']['OPTIONS'] = dict(_sqlite_profile['OPTIONS'])
+if _sqlite_profile['PRAGMAS']:
+    DATABASES['default']['OPTIONS']['init_command'] = sqlite_init_command(_sqlite_profile['PRAGMAS'])
+
+# Optional read replica. Point CREDITSERVICE_REPLICA_DB at a second SQLite
+# file (a replicated or periodically copied snapshot of db.sqlite3) to send
+# statement, eligibility and reporting reads there. Writes always go to
+# "default", and a client that just wrote is pinned to it for
+# REPLICA_PIN_SECONDS. The replica is only ever read, so it takes the
+# profile's connection reuse, lock timeout and read-side pragmas but not the
+# WAL switch or fsync setting, which write to a file the replication owns,
+# nor IMMEDIATE transactions, which would take its write lock on every read.
+SQLITE_REPLICA_PRAGMAS = ('cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+
+def sqlite_replica(name, profile):
+    """Build the settings of a read replica at ``name`` under a tuning profile."""
+    options = {}
+    if 'timeout' in profile['OPTIONS']:
+        options['timeout'] = profile['OPTIONS']['timeout']
+    pragmas = {pragma: value for pragma, value in profile['PRAGMAS'].items() if pragma in SQLITE_REPLICA_PRAGMAS}
+    if pragmas:
+        options['init_command'] = sqlite_init_command(pragmas)
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': profile['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': profile['CONN_MAX_AGE'] > 0,
+        'OPTIONS': options,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+
+DATABASE_REPLICA_ALIAS = None
+if os.environ.get('CREDITSERVICE_REPLICA_DB'):
+    DATABASE_REPLICA_ALIAS = 'replica'
+    DATABASES[DATABASE_REPLICA_ALIAS] = sqlite_replica(os.environ['CREDITSERVICE_REPLICA_DB'], _sqlite_profile)
+
+DATABASE_ROUTERS = ['creditservice.routers.ReadReplicaRouter']
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -118,8 +209,65 @@ CELERY_RESULT_BACKEND = 'db+sqlite:///' + os.path.join(BASE_DIR, 'celeryresults.
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+# The broker and result backend are SQLite files as well; give them the same
+# busy timeout so workers wait for the lock instead of failing immediately.
+CELERY_DATABASE_ENGINE_OPTIONS = {'connect_args': {'timeout': 20}}
+CELERY_BROKER_TRANSPORT_OPTIONS = {'connect_args': {'timeout': 20}}
+CELERY_BEAT_SCHEDULE = {
+    'snapshot-loan-balances': {
+        'task': 'loans.tasks.snapshot_loan_balances',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'sweep-overdue-bills': {
+        'task': 'loans.tasks.sweep_overdue_bills',
+        'schedule': crontab(hour=0, minute=30),
+    },
+}
 CELERY_TIMEZONE = TIME_ZONE
 
+# Task queues. Work a user is waiting on (credit scoring) goes to
+# 'interactive' and batch jobs go to 'bulk', so a nightly billing run can't
+# starve scoring. Run a worker per queue with python manage.py
+# run_celery_worker <queue>, sized by TASK_QUEUE_WORKERS. Priorities only
+# take effect on brokers that support them (Redis, RabbitMQ); the SQLite
+# broker delivers each queue first in, first out.
+CELERY_TASK_QUEUES = (
+    Queue('interactive', routing_key='interactive'),
+    Queue('bulk', routing_key='bulk'),
+)
+CELERY_TASK_DEFAULT_QUEUE = 'interactive'
+CELERY_TASK_QUEUE_MAX_PRIORITY = 9
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_TASK_ROUTES = {
+    'loans.tasks.calculate_credit_score': {'queue': 'interactive', 'priority': 9},
+    'loans.tasks.process_daily_billing': {'queue': 'bulk', 'priority': 3},
+    'loans.tasks.ingest_transactions': {'queue': 'bulk', 'priority': 3},
+    'loans.tasks.rescore_changed_user': {'queue': 'bulk', 'priority': 3},
+    'loans.tasks.sweep_overdue_bills': {'queue': 'bulk', 'priority': 3},
+    'loans.tasks.snapshot_loan_balances': {'queue': 'bulk', 'priority': 1},
+    'loans.tasks.export_statements': {'queue': 'bulk', 'priority': 1},
+    'loans.tasks.reconcile_portfolio': {'queue': 'bulk', 'priority': 1},
+}
+# Rescores queued by ingestion run on the bulk queue at this rate per worker,
+# so a large feed can't hold the database write lock for long stretches
+BULK_RESCORE_RATE_LIMIT = os.environ.get('CREDITSERVICE_BULK_RESCORE_RATE', '20/s')
+CELERY_TASK_ANNOTATIONS = {
+    'loans.tasks.rescore_changed_user': {'rate_limit': BULK_RESCORE_RATE_LIMIT},
+}
+
+# Worker processes and prefetch per queue. Bulk tasks run for minutes, so
+# its worker takes one message at a time and leaves the rest queued.
+TASK_QUEUE_WORKERS = {
+    'interactive': {
+        'concurrency': int(os.environ.get('CREDITSERVICE_INTERACTIVE_WORKERS', 2)),
+        'prefetch_multiplier': 4,
+    },
+    'bulk': {
+        'concurrency': int(os.environ.get('CREDITSERVICE_BULK_WORKERS', 1)),
+        'prefetch_multiplier': 1,
+    },
+}
+
 # Django REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -130,5 +278,107 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Opt-in fast JSON rendering for the statement and payment endpoints:
+# '' (off), 'auto', 'orjson' or 'json'; see loans/renderers.py
+FAST_JSON_ENCODER = os.environ.get('CREDITSERVICE_FAST_JSON', '')
+
+# Caches. 'entities' holds hot User and Loan rows (see loans/entity_cache.py);
+# use a shared backend such as Redis for invalidation across processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'entities': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'entities',
+        'TIMEOUT': int(os.environ.get('CREDITSERVICE_ENTITY_CACHE_TTL', 30)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CREDITSERVICE_ENTITY_CACHE_SIZE', 10000)),
+        },
+    },
+}
+
+# Startup mode of the loans app: 'eager' loads the transactions index and the
+# API modules before serving, 'lazy' loads them on first use (see
+# loans/startup.py). wsgi.py and asgi.py default to eager.
+LOANS_STARTUP_MODE = os.environ.get('CREDITSERVICE_STARTUP', 'lazy')
+
+# Server processes log their startup and first-request timings to stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'stderr': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'loans.startup': {'handlers': ['stderr'], 'level': 'INFO', 'propagate': False},
+        'loans.profiling': {'handlers': ['stderr'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Transactions CSV file path
 TRANSACTIONS_CSV_PATH = os.path.join(BASE_DIR, 'data', 'transactions.csv')
+
+# Columnar cache of the transactions CSV, rebuilt whenever the CSV changes
+TRANSACTIONS_CACHE_DIR = os.path.join(BASE_DIR, 'data', '.transactions_cache')
+
+# Credit score models, selected with CREDITSERVICE_SCORE_MODEL (see
+# loans/scoring.py). A score starts at min_score and rises by step_points for
+# every step_balance of balance above base_balance, in increments of
+# resolution points, capped at max_score. ``floors`` lists (balance, score)
+# pairs: a balance of at least that much scores at least that much, highest
+# balance first. Users record the version that scored them; add a new
+# version rather than editing one in place, then run rescore_users.
+CREDIT_SCORE_MODELS = {
+    # The rule calculate_credit_score applied: 10 points per full Rs. 15,000
+    'balance-v1': {
+        'min_score': 300,
+        'max_score': 900,
+        'base_balance': 100000,
+        'step_balance': 15000,
+        'step_points': 10,
+        'resolution': 10,
+        'floors': [],
+    },
+    # The rule registration applied: pro rata points with floors for high balances
+    'balance-v2': {
+        'min_score': 300,
+        'max_score': 900,
+        'base_balance': 100000,
+        'step_balance': 15000,
+        'step_points': 10,
+        'resolution': 1,
+        'floors': [(500000, 700), (250000, 600), (150000, 500)],
+    },
+}
+
+CREDIT_SCORE_MODEL = os.environ.get('CREDITSERVICE_SCORE_MODEL', 'balance-v2')
+if CREDIT_SCORE_MODEL not in CREDIT_SCORE_MODELS:
+    raise ValueError(f"Unknown CREDITSERVICE_SCORE_MODEL: {CREDIT_SCORE_MODEL}")
+
+# Unix socket of the local scoring service (python manage.py
+# run_scoring_service, see loans/scoring_service.py). When unset, or when the
+# service doesn't answer within the timeout, workers read the transactions
+# cache themselves.
+SCORING_SERVICE_ADDRESS = os.environ.get('CREDITSERVICE_SCORING_SOCKET', '')
+SCORING_SERVICE_TIMEOUT = float(os.environ.get('CREDITSERVICE_SCORING_TIMEOUT', 5))
+
+# Group-commit payments, off unless CREDITSERVICE_PAYMENT_QUEUE=1 (see
+# loans/payment_queue.py). Payment requests are validated by the view and
+# queued; one writer thread per process commits up to BATCH_SIZE of them per
+# transaction.
+PAYMENT_WRITE_QUEUE = os.environ.get('CREDITSERVICE_PAYMENT_QUEUE', '') == '1'
+PAYMENT_QUEUE_BATCH_SIZE = int(os.environ.get('CREDITSERVICE_PAYMENT_QUEUE_BATCH', 64))
+
+# Largest batch POST /api/register-users/ accepts; register bigger partner
+# files with python manage.py register_users (see loans/onboarding.py)
+BULK_REGISTRATION_MAX_ROWS = int(os.environ.get('CREDITSERVICE_BULK_REGISTRATION_MAX_ROWS', 10000))
+
+# On-demand profiling of single requests and tasks (see loans/profiling.py).
+# Off unless CREDITSERVICE_PROFILING=1. Requests are profiled when they send
+# "X-Profile: <CREDITSERVICE_PROFILING_TOKEN>" or match a profiling trigger
+# armed in the admin; tasks when sent with profiling.send_profiled.
+PROFILING_ENABLED = os.environ.get('CREDITSERVICE_PROFILING', '') == '1'
+PROFILING_TOKEN = os.environ.get('CREDITSERVICE_PROFILING_TOKEN', '')
+PROFILING_TRIGGER_POLL_SECONDS = 5
+PROFILING_MIN_CALL_SHARE = 0.005  # calls under 0.5% of the time are left out of the call tree
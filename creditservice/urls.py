@@ -10,4 +10,5 @@ urlpatterns = [
     path('', index, name='index'),
     path('admin/', admin.site.urls),
     path('api/', include('loans.urls')),
+    path('api/async/', include('loans.async_urls')),
 ]
@@ -12,5 +12,11 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'creditservice.settings')
+# API servers warm up before taking traffic, see loans/startup.py
+os.environ.setdefault('CREDITSERVICE_STARTUP', 'eager')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+from loans import startup  # noqa: E402  (needs the app registry)
+
+startup.report_ready()
@@ -0,0 +1,96 @@
+"""
+Admin for the loans application: profiling triggers, stored profiles and
+reconciliation reports.
+"""
+
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import ExecutionProfile, LoanDiscrepancy, ProfilingTrigger, ReconciliationRun
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Reports written by jobs, browsable but not editable."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfilingTrigger)
+class ProfilingTriggerAdmin(admin.ModelAdmin):
+    """Arm profiling for the next requests to a path, e.g. one loan's statement."""
+
+    list_display = ('path', 'query_contains', 'remaining', 'created_at')
+
+
+@admin.register(ExecutionProfile)
+class ExecutionProfileAdmin(ReadOnlyAdmin):
+    """Browse stored profiles and download their stats."""
+
+    list_display = ('name', 'kind', 'started_at', 'duration_ms', 'query_count', 'sql_ms')
+    list_filter = ('kind',)
+    search_fields = ('name',)
+    fields = ('name', 'kind', 'started_at', 'duration_ms', 'query_count', 'sql_ms',
+              'download', 'call_tree_text', 'sql_table')
+    readonly_fields = fields
+
+    def get_urls(self):
+        return [
+            path('<uuid:profile_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='loans_executionprofile_download'),
+        ] + super().get_urls()
+
+    def download_view(self, request, profile_id):
+        profile = get_object_or_404(ExecutionProfile, profile_id=profile_id)
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile_id}.prof"'
+        return response
+
+    @admin.display(description='Stats')
+    def download(self, obj):
+        url = reverse('admin:loans_executionprofile_download', args=[obj.profile_id])
+        return format_html('<a href="{}">profile-{}.prof</a>', url, obj.profile_id)
+
+    @admin.display(description='Call tree')
+    def call_tree_text(self, obj):
+        return format_html('<pre style="font-size: 11px">{}</pre>', obj.call_tree)
+
+    @admin.display(description='SQL')
+    def sql_table(self, obj):
+        rows = format_html_join('', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>', (
+            (group['count'], group['total_ms'], group['max_ms'], group['rows'], group['sql'])
+            for group in obj.sql
+        ))
+        return format_html(
+            '<table><tr><th>Count</th><th>Total ms</th><th>Max ms</th><th>Rows</th><th>Statement</th></tr>{}</table>',
+            rows
+        )
+
+
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(ReadOnlyAdmin):
+    """Reconciliation runs, newest first, linking to their discrepancies."""
+
+    list_display = ('started_at', 'status', 'workers', 'loans_checked', 'discrepancy_link', 'finished_at')
+    ordering = ('-started_at',)
+
+    @admin.display(description='Discrepancies')
+    def discrepancy_link(self, obj):
+        url = reverse('admin:loans_loandiscrepancy_changelist') + f'?run__run_id__exact={obj.run_id}'
+        return format_html('<a href="{}">{}</a>', url, obj.discrepancy_count)
+
+
+@admin.register(LoanDiscrepancy)
+class LoanDiscrepancyAdmin(ReadOnlyAdmin):
+    """Discrepancies of every run, filterable by run and kind."""
+
+    list_display = ('loan_id', 'kind', 'expected', 'actual', 'reference', 'run')
+    list_filter = ('kind', 'run')
+    search_fields = ('loan__loan_id', 'reference')
+    list_select_related = ('run',)
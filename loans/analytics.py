@@ -0,0 +1,232 @@
+"""
+Portfolio analytics backed by pre-aggregated counters.
+
+Book-level numbers are kept in ``PortfolioMetric`` rows, one per (metric,
+key), each holding a count and an amount:
+
+    loans_by_status        key: loan status, amount: principal outstanding
+    loans_by_score_band    key: credit score band, active loans only,
+                           amount: principal outstanding
+    bills_by_status        key: bill status, amount: total due
+    payments_by_day        key: YYYY-MM-DD, amount: amount paid
+    interest_by_day        key: YYYY-MM-DD, amount: interest accrued
+
+The loan, payment, billing, sweeper and scoring paths adjust the counters as
+they write, so reports read a few hundred rows however large the book is
+and however long it has been running.
+``rebuild_metrics`` recomputes everything from the base tables.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Loan, Bill, Payment, DailyInterestAccrual, PortfolioMetric
+from .utils import credit_score_band
+
+LOANS_BY_STATUS = 'loans_by_status'
+LOANS_BY_SCORE_BAND = 'loans_by_score_band'
+BILLS_BY_STATUS = 'bills_by_status'
+PAYMENTS_BY_DAY = 'payments_by_day'
+INTEREST_BY_DAY = 'interest_by_day'
+
+
+def bump(metric, key='', count=0, amount=0):
+    """Add to a counter, creating it on first use."""
+    if not count and not amount:
+        return
+    for _ in range(2):
+        updated = PortfolioMetric.objects.filter(metric=metric, key=key).update(
+            count=F('count') + count, amount=F('amount') + amount
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                PortfolioMetric.objects.create(metric=metric, key=key, count=count, amount=amount)
+            return
+        except IntegrityError:
+            # Created concurrently; the update will find it now
+            continue
+
+
+def move(metric, old_key, new_key, count=1, amount=0):
+    """Move a count and amount from one key of a metric to another."""
+    if old_key == new_key:
+        return
+    bump(metric, old_key, -count, -amount)
+    bump(metric, new_key, count, amount)
+
+
+def loan_created(loan, credit_score):
+    """Count a newly disbursed loan."""
+    bump(LOANS_BY_STATUS, loan.status, 1, loan.principal_balance)
+    bump(LOANS_BY_SCORE_BAND, credit_score_band(credit_score), 1, loan.principal_balance)
+
+
+def payment_recorded(loan, payment, old_principal, old_status, bill=None, old_bill_status=None):
+    """Count a payment and the principal, loan and bill changes it caused."""
+    bump(PAYMENTS_BY_DAY, timezone.localdate(payment.payment_date).isoformat(), 1, payment.amount)
+
+    principal_change = loan.principal_balance - old_principal
+    band = credit_score_band(loan.user.credit_score)
+    if loan.status != old_status:
+        move(LOANS_BY_STATUS, old_status, loan.status, 1, old_principal)
+        bump(LOANS_BY_STATUS, loan.status, 0, principal_change)
+        if old_status == 'ACTIVE':
+            bump(LOANS_BY_SCORE_BAND, band, -1, -old_principal)
+    else:
+        bump(LOANS_BY_STATUS, loan.status, 0, principal_change)
+        if loan.status == 'ACTIVE':
+            bump(LOANS_BY_SCORE_BAND, band, 0, principal_change)
+
+    if bill is not None:
+        move(BILLS_BY_STATUS, old_bill_status, bill.status, 1, bill.total_due_amount)
+
+
+def bills_generated(bills):
+    """Count a batch of newly generated bills."""
+    bump(BILLS_BY_STATUS, 'GENERATED', len(bills), sum(bill.total_due_amount for bill in bills))
+
+
+def bills_moved(old_status, new_status, count, amount):
+    """Count a bulk status change of bills."""
+    if count:
+        move(BILLS_BY_STATUS, old_status, new_status, count, amount)
+
+
+def interest_accrued(day, count, amount):
+    """Count a day's interest accruals."""
+    bump(INTEREST_BY_DAY, day.isoformat(), count, amount)
+
+
+def credit_score_changed(user, old_score):
+    """Move a rescored user's active loans to their new score band."""
+    old_band = credit_score_band(old_score)
+    new_band = credit_score_band(user.credit_score)
+    if old_band == new_band:
+        return
+    totals = Loan.objects.filter(user=user, status='ACTIVE').aggregate(
+        count=Count('loan_id'), amount=Sum('principal_balance')
+    )
+    if totals['count']:
+        move(LOANS_BY_SCORE_BAND, old_band, new_band, totals['count'], totals['amount'])
+
+
+def credit_scores_changed(changes):
+    """
+    Move the active loans of many rescored users to their new score bands.
+
+    Args:
+        changes: (unique_user_id, old_score, new_score) tuples
+    """
+    band_changes = {
+        user_id: (credit_score_band(old_score), credit_score_band(new_score))
+        for user_id, old_score, new_score in changes
+        if credit_score_band(old_score) != credit_score_band(new_score)
+    }
+    if not band_changes:
+        return
+    moves = {}
+    active_loans = Loan.objects.filter(user_id__in=list(band_changes), status='ACTIVE').values('user_id').annotate(
+        count=Count('loan_id'), amount=Sum('principal_balance')
+    )
+    for row in active_loans:
+        totals = moves.setdefault(band_changes[row['user_id']], [0, Decimal(0)])
+        totals[0] += row['count']
+        totals[1] += row['amount'] or 0
+    for (old_band, new_band), (count, amount) in moves.items():
+        move(LOANS_BY_SCORE_BAND, old_band, new_band, count, amount)
+
+
+def rebuild_metrics():
+    """
+    Recompute every counter from the base tables.
+
+    Returns:
+        Number of counter rows written
+    """
+    metrics = []
+
+    for row in Loan.objects.values('status').annotate(count=Count('loan_id'), amount=Sum('principal_balance')):
+        metrics.append(PortfolioMetric(metric=LOANS_BY_STATUS, key=row['status'],
+                                       count=row['count'], amount=row['amount'] or 0))
+
+    bands = {}
+    active_loans = Loan.objects.filter(status='ACTIVE').values('user__credit_score').annotate(
+        count=Count('loan_id'), amount=Sum('principal_balance')
+    )
+    for row in active_loans:
+        band = bands.setdefault(credit_score_band(row['user__credit_score']), [0, Decimal(0)])
+        band[0] += row['count']
+        band[1] += row['amount'] or 0
+    for key, (count, amount) in bands.items():
+        metrics.append(PortfolioMetric(metric=LOANS_BY_SCORE_BAND, key=key, count=count, amount=amount))
+
+    for row in Bill.objects.values('status').annotate(count=Count('bill_id'), amount=Sum('total_due_amount')):
+        metrics.append(PortfolioMetric(metric=BILLS_BY_STATUS, key=row['status'],
+                                       count=row['count'], amount=row['amount'] or 0))
+
+    payments = Payment.objects.annotate(day=TruncDate('payment_date')).values('day').annotate(
+        count=Count('payment_id'), amount=Sum('amount')
+    )
+    for row in payments:
+        metrics.append(PortfolioMetric(metric=PAYMENTS_BY_DAY, key=row['day'].isoformat(),
+                                       count=row['count'], amount=row['amount'] or 0))
+
+    accruals = DailyInterestAccrual.objects.values('accrual_date').annotate(
+        count=Count('id'), amount=Sum('interest_amount')
+    )
+    for row in accruals:
+        metrics.append(PortfolioMetric(metric=INTEREST_BY_DAY, key=row['accrual_date'].isoformat(),
+                                       count=row['count'], amount=row['amount'] or 0))
+
+    with transaction.atomic():
+        PortfolioMetric.objects.all().delete()
+        PortfolioMetric.objects.bulk_create(metrics, batch_size=1000)
+    return len(metrics)
+
+
+def portfolio_summary(today, days=30):
+    """
+    Assemble the portfolio report from the counters.
+
+    Args:
+        today: Date the month-to-date and daily figures are relative to
+        days: Number of most recent days of payments to include
+
+    Returns:
+        Dict ready to be returned by the API
+    """
+    month_start = today.replace(day=1).isoformat()
+    first_day = (today - timedelta(days=days - 1)).isoformat()
+    last_day = today.isoformat()
+
+    report = {
+        LOANS_BY_STATUS: {},
+        LOANS_BY_SCORE_BAND: {},
+        BILLS_BY_STATUS: {},
+        "payments_per_day": [],
+        "interest_accrued_mtd": Decimal(0),
+    }
+    # Only the days in the report are read, through the (metric, key) index
+    rows = PortfolioMetric.objects.filter(
+        Q(metric__in=(LOANS_BY_STATUS, LOANS_BY_SCORE_BAND, BILLS_BY_STATUS))
+        | Q(metric=PAYMENTS_BY_DAY, key__gte=first_day, key__lte=last_day)
+        | Q(metric=INTEREST_BY_DAY, key__gte=month_start, key__lte=last_day)
+    )
+    for metric, key, count, amount in rows.order_by('metric', 'key').values_list('metric', 'key', 'count', 'amount'):
+        if metric == PAYMENTS_BY_DAY:
+            report["payments_per_day"].append({"date": key, "count": count, "amount": amount})
+        elif metric == INTEREST_BY_DAY:
+            report["interest_accrued_mtd"] += amount
+        elif count:
+            report[metric][key] = {"count": count, "amount": amount}
+
+    active = report[LOANS_BY_STATUS].get('ACTIVE', {})
+    report["outstanding_principal"] = active.get("amount", Decimal(0))
+    return report
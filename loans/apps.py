@@ -0,0 +1,21 @@
+"""
+App configuration for the loans application.
+"""
+
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class LoansConfig(AppConfig):
+    """App config that runs the startup phase, see ``loans/startup.py``."""
+
+    name = 'loans'
+
+    def ready(self):
+        from . import startup
+
+        startup.run(getattr(settings, 'LOANS_STARTUP_MODE', startup.LAZY))
+        if settings.PROFILING_ENABLED:
+            from . import profiling
+
+            profiling.connect_task_signals()
@@ -0,0 +1,18 @@
+"""
+URL configuration for the async loans API.
+"""
+
+from django.urls import path
+from .async_views import (
+    AsyncRegisterUserView, AsyncApplyLoanView,
+    AsyncMakePaymentView, AsyncPrepayLoanView, AsyncForecloseLoanView, AsyncGetStatementView
+)
+
+urlpatterns = [
+    path('register-user/', AsyncRegisterUserView.as_view(), name='async-register-user'),
+    path('apply-loan/', AsyncApplyLoanView.as_view(), name='async-apply-loan'),
+    path('make-payment/', AsyncMakePaymentView.as_view(), name='async-make-payment'),
+    path('prepay-loan/', AsyncPrepayLoanView.as_view(), name='async-prepay-loan'),
+    path('foreclose-loan/', AsyncForecloseLoanView.as_view(), name='async-foreclose-loan'),
+    path('get-statement/', AsyncGetStatementView.as_view(), name='async-get-statement'),
+]
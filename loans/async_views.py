@@ -0,0 +1,339 @@
+"""
+Async views for the loans application.
+
+These mirror the views in ``views.py`` endpoint for endpoint and return the
+same payloads, but use Django's async ORM so an in-flight request does not
+hold a worker thread while it waits on the database. Work without an async
+API (the transactions CSV, ``transaction.atomic`` blocks) runs through
+``sync_to_async``. Serve them with an ASGI server, see ``creditservice/asgi.py``.
+"""
+
+import asyncio
+import io
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from creditservice.routers import use_read_replica
+
+from . import entity_cache, payment_queue, scoring_service, statement_versions
+from .models import User, Loan, Payment, EMISchedule
+from .renderers import FastJSONRenderer, fast_json_enabled
+from .validators import (
+    RegisterUserSchema, LoanApplicationSchema,
+    PaymentSchema, ForeclosureSchema, StatementSchema
+)
+from .services import (
+    validation_error_message, score_from_totals,
+    check_loan_eligibility, create_loan, check_payment, record_payment,
+    record_prepayment, statement_transactions
+)
+from .views import prepayment_response
+
+
+def json_response(data, status=status.HTTP_200_OK, renderer_class=JSONRenderer):
+    """Render a payload exactly like the DRF views do."""
+    return HttpResponse(
+        renderer_class().render(data), status=status, content_type='application/json'
+    )
+
+
+def fast_json_response(data, status=status.HTTP_200_OK):
+    """Render a payload with FastJSONRenderer when it is enabled."""
+    return json_response(data, status, FastJSONRenderer if fast_json_enabled() else JSONRenderer)
+
+
+def request_data(request):
+    """
+    Parse a JSON or form-encoded request body.
+
+    Raises:
+        ParseError: if a JSON body is malformed, with the message the sync views give
+    """
+    if request.content_type == 'application/json':
+        if not request.body:
+            return {}
+        return JSONParser().parse(io.BytesIO(request.body))
+    return request.POST
+
+
+def parse_error_response(exc):
+    """The 400 the sync views answer a malformed body with."""
+    return json_response({"detail": exc.detail}, status=exc.status_code)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncRegisterUserView(View):
+    """
+    Async API view for user registration.
+    """
+
+    async def post(self, request):
+        try:
+            body = request_data(request)
+        except ParseError as exc:
+            return parse_error_response(exc)
+        data, errors = RegisterUserSchema.validate(body)
+        if errors:
+            return json_response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Extract validated data
+        aadhar_id = data.get('aadhar_id')
+        name = data.get('name')
+        email = data.get('email_id')
+        annual_income = data.get('annual_income')
+
+        # Check if user with the same Aadhar ID already exists
+        if await User.objects.filter(aadhar_id=aadhar_id).aexists():
+            return json_response({"error": "User with this Aadhar ID already exists."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Check if user with the same email already exists
+        if await User.objects.filter(email=email).aexists():
+            return json_response({"error": "User with this email already exists."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Create new user
+        user = await User.objects.acreate(
+            aadhar_id=aadhar_id,
+            name=name,
+            email=email,
+            annual_income=annual_income
+        )
+
+        # Calculate credit score. The ingested balance is read with the async
+        # ORM; only a fallback to the transactions index leaves the event loop.
+        try:
+            totals = await scoring_service.atransaction_totals([aadhar_id])
+            user.credit_score, user.credit_score_model = score_from_totals(aadhar_id, totals)
+            await user.asave()
+        except Exception as e:
+            # Log the error but continue
+            print(f"Error calculating credit score: {str(e)}")
+
+        # Return success response
+        return json_response({
+            "error": None,
+            "unique_user_id": user.unique_user_id
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncApplyLoanView(View):
+    """
+    Async API view for loan application.
+    """
+
+    async def post(self, request):
+        try:
+            body = request_data(request)
+        except ParseError as exc:
+            return parse_error_response(exc)
+        data, errors = LoanApplicationSchema.validate(body)
+        if errors:
+            return json_response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Extract validated data
+        unique_user_id = data.get('unique_user_id')
+        loan_type = data.get('loan_type')
+        loan_amount = data.get('loan_amount')
+        interest_rate = data.get('interest_rate')
+        term_period = data.get('term_period')
+        disbursement_date = data.get('disbursement_date')
+
+        try:
+            # Get user, preferring the replica for the eligibility checks
+            try:
+                with use_read_replica():
+                    user = await entity_cache.aget_user(unique_user_id)
+            except User.DoesNotExist:
+                user = await entity_cache.aget_user(unique_user_id)
+
+            check_loan_eligibility(user, loan_amount, interest_rate)
+
+            # The loan and its schedule are created in one transaction
+            loan, due_dates = await sync_to_async(create_loan)(
+                user, loan_type, loan_amount, interest_rate, term_period, disbursement_date
+            )
+
+            # Return success response with loan details
+            return json_response({
+                "error": None,
+                "loan_id": loan.loan_id,
+                "due_dates": due_dates
+            })
+
+        except User.DoesNotExist:
+            return json_response({
+                "error": "User not found."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return json_response({
+                "error": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncMakePaymentView(View):
+    """
+    Async API view for processing loan payments.
+    """
+
+    async def post(self, request):
+        try:
+            body = request_data(request)
+        except ParseError as exc:
+            return parse_error_response(exc)
+        data, errors = PaymentSchema.validate(body)
+        if errors:
+            return fast_json_response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Extract validated data
+        loan_id = data.get('loan_id')
+        amount = data.get('amount')
+
+        try:
+            # Get loan
+            loan = await entity_cache.aget_loan(loan_id, with_user=True)
+
+            # Get the earliest EMI that is not paid
+            earliest_unpaid_emi = None
+            if loan.status == 'ACTIVE':
+                earliest_unpaid_emi = await EMISchedule.objects.filter(
+                    loan=loan,
+                    is_paid=False
+                ).order_by('due_date').afirst()
+
+            check_payment(loan, amount, earliest_unpaid_emi)
+
+            # Process payment with atomic transaction, or in the writer's next batch
+            if settings.PAYMENT_WRITE_QUEUE:
+                await asyncio.wrap_future(payment_queue.submit(loan, amount))
+            else:
+                await sync_to_async(record_payment)(loan, amount, earliest_unpaid_emi)
+
+            # Return success response
+            return fast_json_response({
+                "error": None,
+                "message": f"Payment of ₹{amount} recorded successfully."
+            })
+
+        except Loan.DoesNotExist:
+            return fast_json_response({
+                "error": "Loan not found."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return fast_json_response({
+                "error": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPrepayLoanView(View):
+    """
+    Async API view for prepaying part of a loan, which recomputes its remaining EMIs.
+    """
+
+    schema = PaymentSchema
+    foreclose = False
+
+    async def post(self, request):
+        try:
+            body = request_data(request)
+        except ParseError as exc:
+            return parse_error_response(exc)
+        data, errors = self.schema.validate(body)
+        if errors:
+            return fast_json_response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            loan = await entity_cache.aget_loan(data.get('loan_id'), with_user=True)
+            payment, schedule = await sync_to_async(record_prepayment)(
+                loan, None if self.foreclose else data.get('amount')
+            )
+            return fast_json_response(prepayment_response(payment, schedule, self.foreclose, loan))
+
+        except Loan.DoesNotExist:
+            return fast_json_response({
+                "error": "Loan not found."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return fast_json_response({
+                "error": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncForecloseLoanView(AsyncPrepayLoanView):
+    """
+    Async API view for paying a loan off in full at its foreclosure amount.
+    """
+
+    schema = ForeclosureSchema
+    foreclose = True
+
+
+class AsyncGetStatementView(View):
+    """
+    Async API view for fetching loan statements.
+    """
+
+    async def get(self, request):
+        data, errors = StatementSchema.validate(request.GET)
+        if errors:
+            return fast_json_response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Extract validated data
+        loan_id = data.get('loan_id')
+
+        try:
+            with use_read_replica():
+                etag = await statement_versions.aetag(loan_id)
+                not_modified = statement_versions.not_modified(request, etag)
+                if not_modified is not None:
+                    return not_modified
+                response = await self.build_statement(loan_id)
+            if etag is not None and response.status_code == status.HTTP_200_OK:
+                statement_versions.tag(response, etag)
+            return response
+        except Exception as e:
+            return fast_json_response({
+                "error": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    async def build_statement(self, loan_id):
+        """Assemble the statement payload for a loan."""
+        # Get loan
+        try:
+            loan = await entity_cache.aget_loan(loan_id)
+        except Loan.DoesNotExist:
+            raise Exception("No Loan matches the given query.")
+
+        # Check if loan is closed
+        if loan.status == 'CLOSED':
+            return fast_json_response({
+                "error": "Loan does not exist or has been closed."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        emis = EMISchedule.objects.filter(loan=loan).order_by('due_date')
+        paid_emis = [emi async for emi in emis.filter(is_paid=True)]
+        unpaid_emis = [emi async for emi in emis.filter(is_paid=False)]
+        first_payment = await Payment.objects.filter(
+            loan=loan
+        ).order_by('payment_date').afirst()
+
+        past_transactions, upcoming_transactions = statement_transactions(
+            loan, paid_emis, unpaid_emis, first_payment
+        )
+
+        # Return success response
+        return fast_json_response({
+            "error": None,
+            "past_transactions": past_transactions,
+            "upcoming_transactions": upcoming_transactions
+        })
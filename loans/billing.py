@@ -0,0 +1,177 @@
+"""
+Daily interest accrual and billing.
+
+Interest accrues on every active loan every day, so ``accrue_interest`` is a
+bulk pass: it reads active loans a chunk at a time in primary key order,
+computes each loan's day of interest and bulk-inserts the accruals with
+their ledger entries. Loans that already accrued that day are skipped, so
+rerunning it is harmless.
+
+Only about one loan in thirty bills on a given day. Each loan carries its
+``next_billing_date``, a billing cycle after disbursement and moved a cycle
+on by every bill, and ``generate_bills`` selects just the active loans due
+by the day through the (status, next_billing_date) index. Billing is a bulk
+pass too: a chunk of due loans has its latest bills and its interest since
+them read in one query each, and its bills, ledger entries and next billing
+dates written in bulk.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from . import analytics, entity_cache, ledger
+from .models import Loan, Bill, DailyInterestAccrual
+from .utils import calculate_daily_interest
+
+
+def accrue_interest(day, chunk_size=2000):
+    """
+    Accrue a day's interest on every active loan that hasn't accrued it yet.
+
+    Args:
+        day: Accrual date
+        chunk_size: Loans read and written per transaction
+
+    Returns:
+        Number of loans accrued
+    """
+    accrued = 0
+    last_pk = None
+    while True:
+        loans = Loan.objects.filter(status='ACTIVE').order_by('pk')
+        if last_pk is not None:
+            loans = loans.filter(pk__gt=last_pk)
+        rows = list(loans.values_list('loan_id', 'principal_balance', 'interest_rate')[:chunk_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        done = set(DailyInterestAccrual.objects.filter(
+            loan_id__in=[loan_id for loan_id, _, _ in rows], accrual_date=day
+        ).values_list('loan_id', flat=True))
+        rows = [row for row in rows if row[0] not in done]
+        if not rows:
+            continue
+
+        accruals = [
+            DailyInterestAccrual(
+                loan_id=loan_id,
+                accrual_date=day,
+                interest_amount=calculate_daily_interest(principal, rate),
+                principal_balance=principal
+            )
+            for loan_id, principal, rate in rows
+        ]
+        with transaction.atomic():
+            DailyInterestAccrual.objects.bulk_create(accruals, batch_size=1000)
+            ledger.interest_accrued(accruals)
+            analytics.interest_accrued(
+                day, len(accruals), sum((accrual.interest_amount for accrual in accruals), Decimal('0.00'))
+            )
+        accrued += len(accruals)
+
+    return accrued
+
+
+def _latest_bills(loan_ids):
+    """Each loan's most recent bill, by loan ID, in one query."""
+    latest = Bill.objects.filter(loan_id=OuterRef('loan_id')).order_by('-billing_date').values('billing_date')[:1]
+    bills = Bill.objects.filter(loan_id__in=loan_ids, billing_date=Subquery(latest))
+    return {bill.loan_id: bill for bill in bills}
+
+
+def _interest_since_last_bill(loan_ids, day):
+    """
+    Interest each loan accrued since its last bill, or since disbursement if
+    it was never billed, up to and including a day, in one grouped query.
+    """
+    last_billed = Bill.objects.filter(loan_id=OuterRef('loan_id')).order_by('-billing_date').values('billing_date')[:1]
+    accruals = DailyInterestAccrual.objects.filter(
+        loan_id__in=loan_ids, accrual_date__lte=day, accrual_date__gte=F('loan__disbursement_date')
+    ).alias(last_billed=Subquery(last_billed)).filter(
+        Q(last_billed__isnull=True) | Q(accrual_date__gt=F('last_billed'))
+    )
+    return dict(accruals.values('loan_id').annotate(total=Sum('interest_amount')).values_list('loan_id', 'total'))
+
+
+def build_bill(loan, day, latest_bill, interest_accrued):
+    """
+    The bill of a loan for the cycle ending on a day, not yet saved.
+
+    Args:
+        loan: The loan being billed
+        day: Last day of the cycle
+        latest_bill: The loan's previous bill, or None
+        interest_accrued: Interest accrued over the cycle
+    """
+    # Calculate minimum due amount
+    min_due = loan.calculate_min_due(interest_accrued)
+
+    # Check for past due amount
+    past_due_amount = Decimal('0.00')
+    if latest_bill and latest_bill.status != 'PAID':
+        past_due_amount = latest_bill.total_due_amount - latest_bill.amount_paid
+
+    return Bill(
+        loan=loan,
+        billing_date=day,
+        due_date=day + timedelta(days=15),  # Due date is 15 days from billing date
+        principal_due=loan.principal_balance,
+        interest_accrued=interest_accrued,
+        min_due_amount=min_due,
+        past_due_amount=past_due_amount,
+        total_due_amount=min_due + past_due_amount,
+        status='GENERATED'
+    )
+
+
+def generate_bills(day, chunk_size=2000):
+    """
+    Bill every active loan whose billing date has come, including any the job missed.
+
+    Each chunk of due loans takes a fixed number of queries: the loans, their
+    latest bills, their interest sums, and bulk writes of the bills, ledger
+    entries and next billing dates, in one transaction.
+
+    Args:
+        day: Last day of the billing cycle
+        chunk_size: Loans read and written per transaction
+
+    Returns:
+        Number of bills generated
+    """
+    generated = 0
+    last_pk = None
+    next_billing_date = day + timedelta(days=Loan.BILLING_CYCLE_DAYS)
+    while True:
+        due = Loan.objects.filter(status='ACTIVE', next_billing_date__lte=day).order_by('pk')
+        if last_pk is not None:
+            due = due.filter(pk__gt=last_pk)
+        loans = list(due[:chunk_size])
+        if not loans:
+            break
+        last_pk = loans[-1].pk
+        loan_ids = [loan.loan_id for loan in loans]
+
+        with transaction.atomic():
+            latest_bills = _latest_bills(loan_ids)
+            interest = _interest_since_last_bill(loan_ids, day)
+            bills = [
+                build_bill(loan, day, latest_bills.get(loan.loan_id), interest.get(loan.loan_id) or Decimal('0.00'))
+                for loan in loans
+            ]
+            Bill.objects.bulk_create(bills, batch_size=1000)
+            Loan.objects.filter(loan_id__in=loan_ids).update(
+                next_billing_date=next_billing_date, updated_at=timezone.now(),
+                statement_version=F('statement_version') + 1  # see statement_versions.bump
+            )
+            ledger.bills_generated(bills)
+            analytics.bills_generated(bills)
+            entity_cache.invalidate_loans(loan_ids)
+        generated += len(bills)
+
+    return generated
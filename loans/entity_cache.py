@@ -0,0 +1,162 @@
+"""
+Read-through cache of hot User and Loan rows.
+
+Payment, statement and loan application requests all start by fetching one
+User or Loan by its UUID, and the same few rows are fetched over and over.
+``get_user`` and ``get_loan`` serve them from the ``entities`` cache (see
+``CACHES`` in settings), which bounds the number of entries and expires them
+after a TTL. Lookups that miss read the database with whatever routing is in
+effect and fill the cache; rows that don't exist are not cached.
+
+Every path that writes a User or Loan calls ``invalidate_user`` or
+``invalidate_loan``. The entry is dropped when the transaction commits, so a
+concurrent reader cannot put the old row back afterwards. With the default
+per-process LocMemCache, other processes only see a change once their entry
+expires; point the ``entities`` alias at a shared cache such as Redis to
+invalidate everywhere at once. A miss served by a lagging read replica can
+cache a row that is behind the primary for up to the TTL. Cached rows are for
+reads and checks; code that updates a row re-reads the fields it changes
+inside its transaction, and bulk ``update()`` calls must invalidate the rows
+they touch themselves.
+"""
+
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import User, Loan
+
+CACHE_ALIAS = 'entities'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(kind, event):
+    with _stats_lock:
+        _stats[(kind, event)] += 1
+
+
+def _key(kind, pk):
+    return f'{kind}:{pk}'
+
+
+def _get(kind, model, lookup, pk):
+    cache = caches[CACHE_ALIAS]
+    key = _key(kind, pk)
+    instance = cache.get(key)
+    if instance is not None:
+        _count(kind, 'hits')
+        return instance
+    _count(kind, 'misses')
+    instance = model.objects.get(**{lookup: pk})
+    cache.set(key, instance)
+    return instance
+
+
+async def _aget(kind, model, lookup, pk):
+    cache = caches[CACHE_ALIAS]
+    key = _key(kind, pk)
+    instance = await cache.aget(key)
+    if instance is not None:
+        _count(kind, 'hits')
+        return instance
+    _count(kind, 'misses')
+    instance = await model.objects.aget(**{lookup: pk})
+    await cache.aset(key, instance)
+    return instance
+
+
+def _invalidate(kind, pk):
+    _count(kind, 'invalidations')
+    key = _key(kind, pk)
+    transaction.on_commit(lambda: caches[CACHE_ALIAS].delete(key))
+
+
+def _invalidate_many(kind, pks):
+    keys = [_key(kind, pk) for pk in pks]
+    with _stats_lock:
+        _stats[(kind, 'invalidations')] += len(keys)
+    transaction.on_commit(lambda: caches[CACHE_ALIAS].delete_many(keys))
+
+
+def get_user(unique_user_id):
+    """
+    Fetch a user through the cache.
+
+    Raises:
+        User.DoesNotExist: if there is no such user
+    """
+    return _get('user', User, 'unique_user_id', unique_user_id)
+
+
+def get_loan(loan_id, with_user=False):
+    """
+    Fetch a loan through the cache, optionally with its user attached.
+
+    Raises:
+        Loan.DoesNotExist: if there is no such loan
+    """
+    loan = _get('loan', Loan, 'loan_id', loan_id)
+    if with_user:
+        loan.user = get_user(loan.user_id)
+    return loan
+
+
+async def aget_user(unique_user_id):
+    """Async version of ``get_user``."""
+    return await _aget('user', User, 'unique_user_id', unique_user_id)
+
+
+async def aget_loan(loan_id, with_user=False):
+    """Async version of ``get_loan``."""
+    loan = await _aget('loan', Loan, 'loan_id', loan_id)
+    if with_user:
+        loan.user = await aget_user(loan.user_id)
+    return loan
+
+
+def invalidate_user(unique_user_id):
+    """Drop a user from the cache once the current transaction commits."""
+    _invalidate('user', unique_user_id)
+
+
+def invalidate_loan(loan_id):
+    """Drop a loan from the cache once the current transaction commits."""
+    _invalidate('loan', loan_id)
+
+
+def invalidate_loans(loan_ids):
+    """Drop a batch of loans from the cache once the current transaction commits."""
+    _invalidate_many('loan', loan_ids)
+
+
+def stats():
+    """
+    Hit, miss and invalidation counts of this process.
+
+    Returns:
+        Dict keyed by 'user' and 'loan', each with hits, misses,
+        invalidations and hit_rate
+    """
+    with _stats_lock:
+        counts = dict(_stats)
+    report = {}
+    for kind in ('user', 'loan'):
+        hits = counts.get((kind, 'hits'), 0)
+        misses = counts.get((kind, 'misses'), 0)
+        report[kind] = {
+            "hits": hits,
+            "misses": misses,
+            "invalidations": counts.get((kind, 'invalidations'), 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return report
+
+
+def reset_stats():
+    """Zero the hit, miss and invalidation counts."""
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,174 @@
+"""
+Bulk export of loan statements for the whole book.
+
+Statements are produced by merge-joining three streams that are all sorted by
+loan ID: active loans, their EMIs ordered by due date, and their payments
+ordered by payment date. Each stream is read with a chunked server-side
+iterator, so memory stays flat however many loans are exported. The book is
+split into loan-ID ranges of roughly equal size that are exported in
+parallel worker processes and concatenated in order.
+"""
+
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import attrgetter
+
+from django.db import connections
+from rest_framework.utils.encoders import JSONEncoder
+
+from creditservice.routers import use_read_replica
+
+from .models import Loan, Payment, EMISchedule
+from .services import statement_transactions
+
+FORMATS = ('csv', 'jsonl')
+CSV_COLUMNS = ['loan_id', 'section', 'date', 'principal_due', 'interest', 'amount_paid', 'amount_due']
+
+
+def loan_id_ranges(parts, status='ACTIVE'):
+    """
+    Split the loans with a status into contiguous loan-ID ranges of similar size.
+
+    Args:
+        parts: Number of ranges wanted
+        status: Loan status to split, or None for every loan
+
+    Returns:
+        List of (first, last) loan IDs covering first <= loan_id < last;
+        ``None`` leaves that end unbounded
+    """
+    loans = Loan.objects.all() if status is None else Loan.objects.filter(status=status)
+    loans = loans.order_by('loan_id').values_list('loan_id', flat=True)
+    total = loans.count()
+    parts = max(1, min(parts, total))
+    boundaries = [loans[total * part // parts] for part in range(1, parts)]
+    starts = [None] + boundaries
+    ends = boundaries + [None]
+    return list(zip(starts, ends))
+
+
+def in_range(queryset, field, first, last):
+    """Filter a queryset to ``first <= field < last``; either bound may be None."""
+    if first is not None:
+        queryset = queryset.filter(**{f'{field}__gte': first})
+    if last is not None:
+        queryset = queryset.filter(**{f'{field}__lt': last})
+    return queryset
+
+
+def iter_statements(first=None, last=None, chunk_size=2000):
+    """
+    Yield (loan, past_transactions, upcoming_transactions) for active loans
+    with ``first <= loan_id < last``, in loan-ID order.
+    """
+    loans = in_range(Loan.objects.filter(status='ACTIVE'), 'loan_id', first, last).order_by('loan_id')
+    emis = in_range(
+        EMISchedule.objects.filter(loan__status='ACTIVE'), 'loan_id', first, last
+    ).order_by('loan_id', 'due_date').only('loan_id', 'due_date', 'amount_due', 'is_paid')
+    payments = in_range(
+        Payment.objects.filter(loan__status='ACTIVE'), 'loan_id', first, last
+    ).order_by('loan_id', 'payment_date').only('loan_id', 'amount', 'payment_date')
+
+    emi_groups = groupby(emis.iterator(chunk_size=chunk_size), key=attrgetter('loan_id'))
+    payment_groups = groupby(payments.iterator(chunk_size=chunk_size), key=attrgetter('loan_id'))
+    emi_group = next(emi_groups, None)
+    payment_group = next(payment_groups, None)
+
+    for loan in loans.iterator(chunk_size=chunk_size):
+        # Advance each stream to this loan; all three are sorted by loan ID
+        while emi_group is not None and emi_group[0] < loan.loan_id:
+            emi_group = next(emi_groups, None)
+        while payment_group is not None and payment_group[0] < loan.loan_id:
+            payment_group = next(payment_groups, None)
+
+        paid_emis, unpaid_emis = [], []
+        if emi_group is not None and emi_group[0] == loan.loan_id:
+            for emi in emi_group[1]:
+                (paid_emis if emi.is_paid else unpaid_emis).append(emi)
+            emi_group = next(emi_groups, None)
+
+        first_payment = None
+        if payment_group is not None and payment_group[0] == loan.loan_id:
+            first_payment = next(payment_group[1])
+            payment_group = next(payment_groups, None)
+
+        yield (loan, *statement_transactions(loan, paid_emis, unpaid_emis, first_payment))
+
+
+def write_statements(output, fmt, first=None, last=None, chunk_size=2000, header=True):
+    """
+    Write the statements of one loan-ID range to ``output``.
+
+    Returns:
+        Number of rows written (statement lines for CSV, loans for JSONL)
+    """
+    rows = 0
+    with open(output, 'w', newline='', encoding='utf-8') as out, use_read_replica():
+        if fmt == 'csv':
+            writer = csv.writer(out)
+            if header:
+                writer.writerow(CSV_COLUMNS)
+            for loan, past, upcoming in iter_statements(first, last, chunk_size):
+                for line in past:
+                    writer.writerow([loan.loan_id, 'past', line['date'], line['principal_due'],
+                                     line['interest'], line['amount_paid'], ''])
+                for line in upcoming:
+                    writer.writerow([loan.loan_id, 'upcoming', line['date'], '', '', '', line['amount_due']])
+                rows += len(past) + len(upcoming)
+        else:
+            for loan, past, upcoming in iter_statements(first, last, chunk_size):
+                out.write(json.dumps({
+                    "loan_id": loan.loan_id,
+                    "past_transactions": past,
+                    "upcoming_transactions": upcoming
+                }, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')))
+                out.write('\n')
+                rows += 1
+    return rows
+
+
+def _export_part(args):
+    output, fmt, first, last, chunk_size, header = args
+    try:
+        return write_statements(output, fmt, first, last, chunk_size, header)
+    finally:
+        connections.close_all()
+
+
+def export_statements(output, fmt='csv', workers=1, chunk_size=2000):
+    """
+    Export statements for every active loan to a CSV or JSONL file.
+
+    Returns:
+        Tuple of (rows written, seconds taken)
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Export format must be one of: {', '.join(FORMATS)}")
+
+    start = time.perf_counter()
+    ranges = loan_id_ranges(workers)
+    if len(ranges) == 1:
+        rows = write_statements(output, fmt, chunk_size=chunk_size)
+        return rows, time.perf_counter() - start
+
+    parts = [
+        (f'{output}.part{number}', fmt, first, last, chunk_size, number == 0)
+        for number, (first, last) in enumerate(ranges)
+    ]
+    # Forked workers must open their own database connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=len(parts), mp_context=multiprocessing.get_context('fork')) as pool:
+        rows = sum(pool.map(_export_part, parts))
+
+    with open(output, 'wb') as out:
+        for part in parts:
+            with open(part[0], 'rb') as part_file:
+                shutil.copyfileobj(part_file, out)
+            os.remove(part[0])
+    return rows, time.perf_counter() - start
@@ -0,0 +1,121 @@
+"""
+Incremental ingestion of the append-only transactions feed.
+
+The feed only ever grows, so each run seeks to the byte offset recorded by
+the previous run, parses just the complete lines appended since, and adds
+their totals to the per-user ``UserBalance`` rows with one bulk upsert. A
+feed that got shorter has been replaced rather than appended to, and is
+re-ingested from the start. Scoring reads the balances of ingested users
+instead of the transactions index (see ``scoring_service.transaction_totals``).
+"""
+
+import io
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import UserBalance, TransactionFeedState
+
+COLUMNS = ['AADHARID', 'Date', 'Amount', 'Transaction_type']
+CENT = Decimal('0.01')
+
+
+def read_appended(csv_path, offset):
+    """
+    Read the complete lines appended to the feed after ``offset``.
+
+    Returns:
+        Tuple of (data, new_offset), where ``data`` holds whole CSV rows only
+    """
+    with open(csv_path, 'rb') as feed:
+        if offset == 0:
+            # Skip the header row
+            header = feed.readline()
+            if not header.endswith(b'\n'):
+                return b'', 0
+            offset = len(header)
+        feed.seek(offset)
+        data = feed.read()
+
+    # A writer may be half-way through the last line; leave it for next time
+    end = data.rfind(b'\n') + 1
+    return data[:end], offset + end
+
+
+def summarize(data):
+    """
+    Total up a chunk of CSV rows per Aadhar ID.
+
+    Returns:
+        DataFrame indexed by Aadhar ID with credits, debits, last_date and rows
+    """
+    import pandas as pd
+
+    df = pd.read_csv(io.BytesIO(data), names=COLUMNS, header=None,
+                     dtype={'AADHARID': 'str', 'Amount': 'float64', 'Transaction_type': 'str'})
+    df['credit'] = df['Amount'].where(df['Transaction_type'] == 'CREDIT', 0.0)
+    df['debit'] = df['Amount'].where(df['Transaction_type'] == 'DEBIT', 0.0)
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    return df.groupby('AADHARID').agg(
+        credits=('credit', 'sum'),
+        debits=('debit', 'sum'),
+        last_date=('Date', 'max'),
+        rows=('Amount', 'size'),
+    )
+
+
+def ingest_transactions(csv_path=None):
+    """
+    Apply newly appended feed rows to the per-user running balances.
+
+    Returns:
+        Tuple of (rows ingested, Aadhar IDs whose balance changed)
+    """
+    csv_path = csv_path or settings.TRANSACTIONS_CSV_PATH
+    if not os.path.exists(csv_path):
+        return 0, []
+
+    with transaction.atomic():
+        state, _ = TransactionFeedState.objects.select_for_update().get_or_create(source=csv_path)
+
+        if os.path.getsize(csv_path) < state.byte_offset:
+            # The feed was replaced; rebuild every balance from scratch
+            UserBalance.objects.all().delete()
+            state.byte_offset = 0
+            state.rows_consumed = 0
+
+        data, new_offset = read_appended(csv_path, state.byte_offset)
+        if not data.strip():
+            if new_offset != state.byte_offset:
+                state.byte_offset = new_offset
+                state.save()
+            return 0, []
+
+        totals = summarize(data)
+        existing = UserBalance.objects.in_bulk(list(totals.index), field_name='aadhar_id')
+
+        balances = []
+        for aadhar_id, row in totals.iterrows():
+            balance = existing.get(aadhar_id) or UserBalance(aadhar_id=aadhar_id)
+            balance.credit_total = Decimal(balance.credit_total) + Decimal(repr(row.credits)).quantize(CENT)
+            balance.debit_total = Decimal(balance.debit_total) + Decimal(repr(row.debits)).quantize(CENT)
+            if balance.last_txn_date is None or row.last_date > balance.last_txn_date:
+                balance.last_txn_date = row.last_date
+            balances.append(balance)
+
+        UserBalance.objects.bulk_create(
+            balances,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['aadhar_id'],
+            update_fields=['credit_total', 'debit_total', 'last_txn_date', 'updated_at'],
+        )
+
+        rows = int(totals['rows'].sum())
+        state.byte_offset = new_offset
+        state.rows_consumed += rows
+        state.save()
+
+    return rows, list(totals.index)
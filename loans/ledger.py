@@ -0,0 +1,218 @@
+"""
+Append-only loan ledger with periodic balance snapshots.
+
+Every change to a loan's balances is also written as a ``LoanLedgerEntry``
+in the same transaction as the change itself. Each entry records the
+amounts by which it moves four running balances:
+
+    DISBURSEMENT  principal += loan amount
+    ACCRUAL       accrued interest += a day's interest
+    BILL          accrued interest -= interest billed, amount due += minimum due
+    PAYMENT       principal -= principal repaid, amount due -= amount,
+                  amount paid += amount
+    CLOSURE       marks the loan closed
+
+EMIs can be paid before they are billed, so the amount due goes negative
+when payments run ahead of bills. Entries are never updated.
+
+A ``LoanBalanceSnapshot`` holds the sums of a loan's entries dated up to a
+day, written by ``take_snapshots`` for days that are over, so later entries
+can't land before it. ``balance_as_of`` reads the latest snapshot at or
+before the requested day and adds the entries dated after it, so the
+current balance or the balance on any past day costs one snapshot row and
+a short tail of entries.
+"""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import Loan, LoanLedgerEntry, LoanBalanceSnapshot
+
+CENT = Decimal('0.01')
+BALANCES = ('principal', 'accrued_interest', 'amount_due', 'amount_paid')
+DELTAS = dict(zip(BALANCES, ('principal_delta', 'interest_delta', 'due_delta', 'paid_delta')))
+
+
+def loan_disbursed(loan):
+    """Record the disbursement of a new loan."""
+    LoanLedgerEntry.objects.create(
+        loan=loan, entry_type='DISBURSEMENT', entry_date=loan.disbursement_date,
+        amount=loan.loan_amount, principal_delta=loan.loan_amount
+    )
+
+
+def interest_accrued(accruals):
+    """Record a batch of daily interest accruals."""
+    LoanLedgerEntry.objects.bulk_create([
+        LoanLedgerEntry(
+            loan_id=accrual.loan_id, entry_type='ACCRUAL', entry_date=accrual.accrual_date,
+            amount=accrual.interest_amount, interest_delta=accrual.interest_amount
+        )
+        for accrual in accruals
+    ], batch_size=1000)
+
+
+def bills_generated(bills):
+    """Record a batch of bills, each moving its accrued interest into the amount due."""
+    LoanLedgerEntry.objects.bulk_create([
+        LoanLedgerEntry(
+            loan_id=bill.loan_id, entry_type='BILL', entry_date=bill.billing_date,
+            amount=bill.min_due_amount, interest_delta=-bill.interest_accrued,
+            due_delta=bill.min_due_amount, reference=str(bill.bill_id)
+        )
+        for bill in bills
+    ], batch_size=1000)
+
+
+def payment_recorded(loan, payment, old_principal, old_status):
+    """Record a payment, and the closure of the loan if it paid the loan off."""
+    day = timezone.localdate(payment.payment_date)
+    LoanLedgerEntry.objects.create(
+        loan=loan, entry_type='PAYMENT', entry_date=day, amount=payment.amount,
+        principal_delta=loan.principal_balance - old_principal, due_delta=-payment.amount,
+        paid_delta=payment.amount, reference=str(payment.payment_id)
+    )
+    if loan.status == 'CLOSED' and old_status != 'CLOSED':
+        LoanLedgerEntry.objects.create(loan=loan, entry_type='CLOSURE', entry_date=day, amount=0)
+
+
+def _sum_entries(entries):
+    """Sum the deltas of a queryset of entries, and count them by type."""
+    totals = {"count": 0, "types": set(), **{balance: Decimal('0.00') for balance in BALANCES}}
+    rows = entries.order_by().values_list('entry_type').annotate(
+        Count('id'), *(Sum(delta) for delta in DELTAS.values())
+    )
+    for entry_type, count, *sums in rows:
+        totals['count'] += count
+        totals['types'].add(entry_type)
+        for balance, amount in zip(BALANCES, sums):
+            totals[balance] += amount
+    return totals
+
+
+def balance_as_of(loan_id, as_of=None):
+    """
+    Compute a loan's balances at the end of a day from the ledger.
+
+    Args:
+        loan_id: Loan to compute the balances of
+        as_of: Day to compute them for, by default today
+
+    Returns:
+        Dict of principal, accrued_interest, amount_due and amount_paid, the
+        loan status on that day (NOT_DISBURSED, ACTIVE or CLOSED), and the
+        snapshot day and number of tail entries the balances were built from
+    """
+    as_of = as_of or timezone.localdate()
+    snapshot = LoanBalanceSnapshot.objects.filter(
+        loan_id=loan_id, as_of__lte=as_of
+    ).order_by('-as_of').first()
+
+    entries = LoanLedgerEntry.objects.filter(loan_id=loan_id, entry_date__lte=as_of)
+    if snapshot is not None:
+        entries = entries.filter(entry_date__gt=snapshot.as_of)
+    tail = _sum_entries(entries)
+
+    balances = {
+        balance: (tail[balance] + (getattr(snapshot, balance) if snapshot else 0)).quantize(CENT)
+        for balance in BALANCES
+    }
+    if (snapshot and snapshot.closed) or 'CLOSURE' in tail['types']:
+        loan_status = 'CLOSED'
+    elif snapshot or 'DISBURSEMENT' in tail['types']:
+        loan_status = 'ACTIVE'
+    else:
+        loan_status = 'NOT_DISBURSED'
+
+    return {
+        "as_of": as_of,
+        **balances,
+        "status": loan_status,
+        "snapshot_as_of": snapshot.as_of if snapshot else None,
+        "tail_entries": tail['count'],
+    }
+
+
+def take_snapshots(as_of=None, chunk_size=500):
+    """
+    Snapshot the balances of every loan with ledger entries since its last snapshot.
+
+    Args:
+        as_of: Day to snapshot, by default yesterday; must be a day that is over
+        chunk_size: Loans handled per batch of queries
+
+    Returns:
+        Dict with the snapshot day and the number of loans scanned and snapshotted
+    """
+    start = time.perf_counter()
+    as_of = as_of or timezone.localdate() - timedelta(days=1)
+    if as_of >= timezone.localdate():
+        raise ValueError("Balances can only be snapshotted for days that are over.")
+
+    scanned = created = 0
+    last_pk = None
+    while True:
+        loans = Loan.objects.order_by('pk')
+        if last_pk is not None:
+            loans = loans.filter(pk__gt=last_pk)
+        loan_ids = list(loans.values_list('loan_id', flat=True)[:chunk_size])
+        if not loan_ids:
+            break
+        last_pk = loan_ids[-1]
+        scanned += len(loan_ids)
+
+        latest = dict(
+            LoanBalanceSnapshot.objects.filter(loan_id__in=loan_ids, as_of__lte=as_of)
+            .values('loan_id').annotate(as_of=Max('as_of')).values_list('loan_id', 'as_of')
+        )
+        previous = {
+            snapshot.loan_id: snapshot
+            for snapshot in LoanBalanceSnapshot.objects.filter(
+                loan_id__in=loan_ids, as_of__in=set(latest.values())
+            )
+            if latest.get(snapshot.loan_id) == snapshot.as_of
+        }
+
+        entries = LoanLedgerEntry.objects.filter(loan_id__in=loan_ids, entry_date__lte=as_of)
+        if len(latest) == len(loan_ids):
+            entries = entries.filter(entry_date__gt=min(latest.values()))
+        tails = {}
+        for entry in entries.values('id', 'loan_id', 'entry_type', 'entry_date', *DELTAS.values()):
+            snapshot = previous.get(entry['loan_id'])
+            if snapshot is not None and entry['entry_date'] <= snapshot.as_of:
+                continue
+            tail = tails.setdefault(entry['loan_id'], {
+                "count": 0, "last_entry_id": 0, "closed": False,
+                **{balance: Decimal('0.00') for balance in BALANCES},
+            })
+            tail['count'] += 1
+            tail['last_entry_id'] = max(tail['last_entry_id'], entry['id'])
+            tail['closed'] = tail['closed'] or entry['entry_type'] == 'CLOSURE'
+            for balance, delta in DELTAS.items():
+                tail[balance] += entry[delta]
+
+        snapshots = []
+        for loan_id, tail in tails.items():
+            snapshot = previous.get(loan_id)
+            snapshots.append(LoanBalanceSnapshot(
+                loan_id=loan_id,
+                as_of=as_of,
+                last_entry_id=tail['last_entry_id'],
+                entry_count=tail['count'] + (snapshot.entry_count if snapshot else 0),
+                closed=tail['closed'] or bool(snapshot and snapshot.closed),
+                **{balance: (tail[balance] + (getattr(snapshot, balance) if snapshot else 0)).quantize(CENT)
+                   for balance in BALANCES}
+            ))
+        LoanBalanceSnapshot.objects.bulk_create(snapshots)
+        created += len(snapshots)
+
+    return {
+        "as_of": as_of,
+        "scanned": scanned,
+        "snapshots": created,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,27 @@
+"""
+Management command to build the columnar transactions cache.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from loans.transactions import build_cache
+
+
+class Command(BaseCommand):
+    help = "Convert the transactions CSV into the memory-mapped columnar cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--csv', default=settings.TRANSACTIONS_CSV_PATH,
+                            help="Transactions CSV to convert")
+        parser.add_argument('--cache-dir', default=settings.TRANSACTIONS_CACHE_DIR,
+                            help="Directory to write the cache to")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        path = build_cache(options['csv'], options['cache_dir'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Transactions cache at {path} ({time.perf_counter() - start:.2f}s)"
+        ))
@@ -0,0 +1,50 @@
+"""
+Management command to check endpoints and tasks against their query budgets.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from loans.query_budgets import BUDGETS, SIZES, check, scratch_transactions
+
+
+class Command(BaseCommand):
+    help = ("Run each endpoint and task on seeded data in a throwaway test database and "
+            "check its queries and rows against its budget.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help="Only check budgets whose name contains one of these")
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES),
+                            help=f"Input sizes to run each budget at (default: {' '.join(map(str, SIZES))})")
+        parser.add_argument('--verbose', action='store_true',
+                            help="Show the queries of every run, not only those over budget")
+
+    def handle(self, *args, **options):
+        budgets = [budget for budget in BUDGETS
+                   if not options['names'] or any(name in budget.name for name in options['names'])]
+        if not budgets:
+            raise CommandError("No budget matches " + ', '.join(options['names']))
+
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        over = 0
+        try:
+            with scratch_transactions():
+                for budget in budgets:
+                    self.stdout.write(budget.name + (f" (size: {budget.scale})" if budget.scale else ""))
+                    for result in check(budget, sorted(options['sizes'])):
+                        failed = result['diff'] is not None
+                        over += failed
+                        line = (f"  size {result['size']:>4}: {result['queries']:>4} queries "
+                                f"(max {result['max_queries']}), {result['rows']:>5} rows (max {result['max_rows']})")
+                        self.stdout.write(self.style.ERROR(line + "  OVER BUDGET") if failed else line)
+                        if failed or options['verbose']:
+                            self.stdout.write(result['diff'] or result['lines'])
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+
+        if over:
+            raise CommandError(f"{over} runs over budget")
+        self.stdout.write(self.style.SUCCESS(f"All {len(budgets)} budgets met"))
@@ -0,0 +1,18 @@
+"""
+Management command to ingest newly appended transactions.
+"""
+
+from django.core.management.base import BaseCommand
+
+from loans.tasks import ingest_transactions
+
+
+class Command(BaseCommand):
+    help = "Apply rows appended to the transactions feed since the last run to UserBalance."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rescore', action='store_true',
+                            help="Queue credit score recalculation for users whose balance changed")
+
+    def handle(self, *args, **options):
+        self.stdout.write(ingest_transactions(rescore=options['rescore']))
@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the portfolio analytics counters.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from loans.analytics import rebuild_metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute the portfolio analytics counters from loans, bills, payments and accruals."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = rebuild_metrics()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} portfolio metrics in {time.perf_counter() - start:.2f}s"
+        ))
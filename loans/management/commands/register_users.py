@@ -0,0 +1,50 @@
+"""
+Management command to register a partner's batch of users from a file.
+"""
+
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.onboarding import register_users
+
+FORMATS = ('csv', 'jsonl')
+RESULT_COLUMNS = ['row', 'error', 'unique_user_id', 'credit_score']
+
+
+class Command(BaseCommand):
+    help = "Register users from a CSV or JSONL file with aadhar_id, name, email_id and annual_income."
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File of users to register")
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--results', help="CSV file to write the result of every row to")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Rows checked and inserted per batch of queries")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['input'], newline='') as source:
+                if options['format'] == 'csv':
+                    rows = list(csv.DictReader(source))
+                else:
+                    rows = [json.loads(line) for line in source if line.strip()]
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Can't read {options['input']}: {exc}")
+
+        result = register_users(rows, chunk_size=options['chunk_size'])
+
+        if options['results']:
+            with open(options['results'], 'w', newline='') as out:
+                writer = csv.DictWriter(out, fieldnames=RESULT_COLUMNS)
+                writer.writeheader()
+                writer.writerows(result['results'])
+        else:
+            for row in result['results']:
+                if row['error']:
+                    self.stdout.write(f"Row {row['row']}: {row['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered {result['created']} users, rejected {result['rejected']} rows "
+            f"in {result['seconds']:.1f}s"
+        ))
@@ -0,0 +1,34 @@
+"""
+Management command to run a Celery worker for one or more task queues.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Run a Celery worker on task queues, sized by TASK_QUEUE_WORKERS."
+
+    def add_arguments(self, parser):
+        parser.add_argument('queues', nargs='+', choices=sorted(settings.TASK_QUEUE_WORKERS),
+                            help="Queues to consume")
+        parser.add_argument('--concurrency', type=int,
+                            help="Worker processes (default: the sum over the queues)")
+        parser.add_argument('--loglevel', default='info')
+
+    def handle(self, *args, **options):
+        from creditservice.celery import app
+
+        queues = options['queues']
+        sizes = [settings.TASK_QUEUE_WORKERS[queue] for queue in queues]
+        concurrency = options['concurrency'] or sum(size['concurrency'] for size in sizes)
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        app.worker_main(argv=[
+            'worker',
+            '--queues', ','.join(queues),
+            '--concurrency', str(concurrency),
+            '--prefetch-multiplier', str(min(size['prefetch_multiplier'] for size in sizes)),
+            '--hostname', f"{'+'.join(queues)}@%h",
+            '--loglevel', options['loglevel'],
+        ])
@@ -0,0 +1,28 @@
+"""
+Management command to run the local scoring service.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from loans.scoring_service import ScoringServiceError, serve
+
+
+class Command(BaseCommand):
+    help = "Serve transaction totals for credit scoring from a preforked pool on a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=settings.SCORING_SERVICE_ADDRESS,
+                            help="Unix socket to listen on (default: CREDITSERVICE_SCORING_SOCKET)")
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Number of worker processes")
+
+    def handle(self, *args, **options):
+        if not options['address']:
+            raise CommandError("Set CREDITSERVICE_SCORING_SOCKET or pass --address.")
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1.")
+        try:
+            serve(options['address'], options['workers'])
+        except ScoringServiceError as exc:
+            raise CommandError(str(exc))
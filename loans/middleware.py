@@ -0,0 +1,97 @@
+"""
+Middleware for the loans application.
+"""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import profiling, startup
+
+
+class FirstRequestTimingMiddleware:
+    """
+    Report the latency of the first request a process serves.
+
+    Goes first in MIDDLEWARE so the timing covers the whole middleware stack
+    and the view. After the first request it only forwards calls.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pending = True
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.pending:
+            return self.get_response(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not self.pending:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, elapsed):
+        self.pending = False
+        startup.record_first_request(request.method, request.path, elapsed)
+
+
+class ProfilingMiddleware:
+    """
+    Profile the requests that ask for it, see ``loans/profiling.py``.
+
+    Not installed unless PROFILING_ENABLED is set. Other requests pay for a
+    header lookup and, every PROFILING_TRIGGER_POLL_SECONDS, one read of the
+    armed triggers. A profiled response carries the stored profile's ID in
+    ``X-Profile-Id``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (profiling.might_want_profile(request) and profiling.wants_profile(request)):
+            return self.get_response(request)
+        with profiling.Profiler() as profiler:
+            response = self.get_response(request)
+        return self._tag(response, profiler.save('REQUEST', self._name(request)))
+
+    async def __acall__(self, request):
+        if not (profiling.might_want_profile(request) and await sync_to_async(profiling.wants_profile)(request)):
+            return await self.get_response(request)
+        with profiling.Profiler() as profiler:
+            response = await self.get_response(request)
+        return self._tag(response, await sync_to_async(profiler.save)('REQUEST', self._name(request)))
+
+    @staticmethod
+    def _name(request):
+        return f"{request.method} {request.get_full_path()}"
+
+    @staticmethod
+    def _tag(response, profile):
+        response['X-Profile-Id'] = str(profile.profile_id)
+        return response
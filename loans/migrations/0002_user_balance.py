@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionFeedState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500, unique=True)),
+                ('byte_offset', models.BigIntegerField(default=0)),
+                ('rows_consumed', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aadhar_id', models.CharField(max_length=12, unique=True)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('debit_total', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('last_txn_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_user_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanDelinquency',
+            fields=[
+                ('loan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='delinquency', serialize=False, to='loans.loan')),
+                ('overdue_bill_count', models.IntegerField()),
+                ('overdue_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('oldest_due_date', models.DateField()),
+                ('days_past_due', models.IntegerField()),
+                ('dpd_bucket', models.CharField(choices=[('1-30', '1-30 days past due'), ('31-60', '31-60 days past due'), ('61-90', '61-90 days past due'), ('90+', 'Over 90 days past due')], db_index=True, max_length=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['status', 'due_date'], name='loans_bill_status_11d468_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_portfolio_metric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='credit_score_model',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ENTRY_ORDER = {'DISBURSEMENT': 0, 'ACCRUAL': 1, 'BILL': 2, 'PAYMENT': 3, 'CLOSURE': 4}
+
+
+def backfill_ledger(apps, schema_editor):
+    """Write ledger entries for the loans, accruals, bills and payments that already exist."""
+    from loans import money
+
+    Loan = apps.get_model('loans', 'Loan')
+    LoanLedgerEntry = apps.get_model('loans', 'LoanLedgerEntry')
+
+    for loan in Loan.objects.iterator(chunk_size=500):
+        entries = [LoanLedgerEntry(
+            loan=loan, entry_type='DISBURSEMENT', entry_date=loan.disbursement_date,
+            amount=loan.loan_amount, principal_delta=loan.loan_amount
+        )]
+        for accrual in loan.interest_accruals.all():
+            entries.append(LoanLedgerEntry(
+                loan=loan, entry_type='ACCRUAL', entry_date=accrual.accrual_date,
+                amount=accrual.interest_amount, interest_delta=accrual.interest_amount
+            ))
+        for bill in loan.bills.all():
+            entries.append(LoanLedgerEntry(
+                loan=loan, entry_type='BILL', entry_date=bill.billing_date, amount=bill.min_due_amount,
+                interest_delta=-bill.interest_accrued, due_delta=bill.min_due_amount, reference=str(bill.bill_id)
+            ))
+
+        # Replay the principal reductions the payments made
+        principal = money.to_paise(loan.loan_amount)
+        payments = []
+        for payment in loan.payments.filter(status='COMPLETED').order_by('payment_date'):
+            new_principal = principal
+            if principal > 0:
+                new_principal = money.principal_after_payment(
+                    principal, money.to_paise(payment.amount), money.to_basis_points(loan.interest_rate)
+                )
+            payments.append(LoanLedgerEntry(
+                loan=loan, entry_type='PAYMENT', entry_date=payment.payment_date.date(), amount=payment.amount,
+                principal_delta=money.from_paise(new_principal - principal), due_delta=-payment.amount,
+                paid_delta=payment.amount, reference=str(payment.payment_id)
+            ))
+            principal = new_principal
+        # Keep the ledger in step with the stored balance if the replay differs
+        drift = money.from_paise(money.to_paise(loan.principal_balance) - principal)
+        if drift:
+            (payments[-1] if payments else entries[0]).principal_delta += drift
+        entries.extend(payments)
+
+        if loan.status == 'CLOSED':
+            entries.append(LoanLedgerEntry(
+                loan=loan, entry_type='CLOSURE', entry_date=loan.updated_at.date(), amount=0
+            ))
+        entries.sort(key=lambda entry: (entry.entry_date, ENTRY_ORDER[entry.entry_type]))
+        LoanLedgerEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0005_user_credit_score_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('last_entry_id', models.BigIntegerField()),
+                ('entry_count', models.IntegerField()),
+                ('principal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('accrued_interest', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount_due', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('closed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='loans.loan')),
+            ],
+            options={
+                'unique_together': {('loan', 'as_of')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LoanLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('DISBURSEMENT', 'Disbursement'), ('ACCRUAL', 'Interest accrual'), ('BILL', 'Bill'), ('PAYMENT', 'Payment'), ('CLOSURE', 'Closure')], max_length=12)),
+                ('entry_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('principal_delta', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('interest_delta', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('due_delta', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('paid_delta', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('reference', models.CharField(blank=True, default='', max_length=36)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='loans.loan')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['loan', 'entry_date'], name='loans_loanl_loan_id_d90a9e_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
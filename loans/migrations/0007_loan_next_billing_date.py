@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:30
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_next_billing_date(apps, schema_editor):
+    """Set each loan's next billing date 30 days after its last bill, or after disbursement."""
+    Loan = apps.get_model('loans', 'Loan')
+
+    loans = []
+    for loan in Loan.objects.annotate(last_billing_date=Max('bills__billing_date')).iterator(chunk_size=2000):
+        loan.next_billing_date = (loan.last_billing_date or loan.disbursement_date) + timedelta(days=30)
+        loans.append(loan)
+    Loan.objects.bulk_update(loans, ['next_billing_date'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0006_loan_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='next_billing_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'next_billing_date'], name='loans_loan_status_0b757d_idx'),
+        ),
+        migrations.RunPython(backfill_next_billing_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0007_loan_next_billing_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='statement_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
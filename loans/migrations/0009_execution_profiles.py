@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:57
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0008_loan_statement_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilingTrigger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=200)),
+                ('query_contains', models.CharField(blank=True, max_length=200)),
+                ('remaining', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExecutionProfile',
+            fields=[
+                ('profile_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('REQUEST', 'Request'), ('TASK', 'Task')], max_length=10)),
+                ('name', models.CharField(max_length=300)),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('query_count', models.IntegerField()),
+                ('sql_ms', models.FloatField()),
+                ('call_tree', models.TextField()),
+                ('sql', models.JSONField(default=list)),
+                ('stats', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-started_at'], name='loans_execu_started_d6c483_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:13
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0009_execution_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('run_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('workers', models.IntegerField(default=1)),
+                ('loans_checked', models.BigIntegerField(default=0)),
+                ('discrepancy_count', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LoanDiscrepancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('PRINCIPAL', 'Principal balance differs from its payments'), ('LOAN_STATUS', 'Status differs from its principal and unpaid EMIs'), ('EMIS_PAID', 'More EMIs paid than payments made'), ('BILLS_PAID', 'Bills credited with more than the payments made'), ('BILL_STATUS', 'Bill status differs from its amount paid')], max_length=12)),
+                ('expected', models.CharField(max_length=40)),
+                ('actual', models.CharField(max_length=40)),
+                ('reference', models.CharField(blank=True, default='', max_length=36)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discrepancies', to='loans.loan')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discrepancies', to='loans.reconciliationrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['run', 'kind'], name='loans_loand_run_id_1db3e1_idx')],
+            },
+        ),
+    ]
@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 from django.db import models
 from django.utils import timezone
 
+from .utils import calculate_daily_interest, calculate_minimum_due
+
 
 class User(models.Model):
     """User model to store user details."""
@@ -18,6 +20,7 @@ class User(models.Model):
     email = models.EmailField(unique=True)
     annual_income = models.DecimalField(max_digits=12, decimal_places=2)
     credit_score = models.IntegerField(null=True, blank=True)
+    credit_score_model = models.CharField(max_length=20, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -38,6 +41,8 @@ class Loan(models.Model):
         ('CREDIT_CARD', 'Credit Card Loan'),
     )
     
+    BILLING_CYCLE_DAYS = 30
+    
     loan_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='loans')
     loan_type = models.CharField(max_length=20, choices=LOAN_TYPE_CHOICES)
@@ -47,9 +52,16 @@ class Loan(models.Model):
     disbursement_date = models.DateField()
     status = models.CharField(max_length=10, choices=LOAN_STATUS_CHOICES, default='ACTIVE')
     principal_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    next_billing_date = models.DateField(null=True, blank=True)  # A cycle after disbursement or the last bill
+    statement_version = models.PositiveIntegerField(default=1)  # Bumped whenever the loan's statement changes
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_billing_date']),
+        ]
+
     def __str__(self):
         return f"Loan {self.loan_id} - {self.user.name}"
 
@@ -57,10 +69,13 @@ class Loan(models.Model):
         """Calculate daily interest rate from annual interest rate."""
         return round(self.interest_rate / Decimal('365'), 3)
 
+    def calculate_daily_interest(self):
+        """Calculate one day of interest on the principal balance, rounded to the paisa."""
+        return calculate_daily_interest(self.principal_balance, self.interest_rate)
+
     def calculate_min_due(self, interest_accrued):
         """Calculate minimum due amount for a billing cycle."""
-        principal_portion = self.principal_balance * Decimal('0.03')  # 3% of principal
-        return principal_portion + interest_accrued
+        return calculate_minimum_due(self.principal_balance, interest_accrued)
 
 
 class Payment(models.Model):
@@ -108,6 +123,11 @@ class Bill(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'due_date']),
+        ]
+
     def __str__(self):
         return f"Bill {self.bill_id} for Loan {self.loan.loan_id}"
 
@@ -143,3 +163,211 @@ class EMISchedule(models.Model):
 
     def __str__(self):
         return f"EMI for Loan {self.loan.loan_id} due on {self.due_date}"
+
+
+class UserBalance(models.Model):
+    """Running credit and debit totals per Aadhar ID from the transactions feed."""
+    
+    aadhar_id = models.CharField(max_length=12, unique=True)
+    credit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    debit_total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    last_txn_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def balance(self):
+        return self.credit_total - self.debit_total
+
+    def __str__(self):
+        return f"Balance for {self.aadhar_id}"
+
+
+class TransactionFeedState(models.Model):
+    """How far the append-only transactions feed has been ingested."""
+    
+    source = models.CharField(max_length=500, unique=True)
+    byte_offset = models.BigIntegerField(default=0)
+    rows_consumed = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} at byte {self.byte_offset}"
+
+
+class LoanDelinquency(models.Model):
+    """Per-loan delinquency summary maintained by the overdue bill sweeper."""
+    
+    DPD_BUCKET_CHOICES = (
+        ('1-30', '1-30 days past due'),
+        ('31-60', '31-60 days past due'),
+        ('61-90', '61-90 days past due'),
+        ('90+', 'Over 90 days past due'),
+    )
+    
+    loan = models.OneToOneField(Loan, on_delete=models.CASCADE, primary_key=True, related_name='delinquency')
+    overdue_bill_count = models.IntegerField()
+    overdue_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    oldest_due_date = models.DateField()
+    days_past_due = models.IntegerField()
+    dpd_bucket = models.CharField(max_length=5, choices=DPD_BUCKET_CHOICES, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Loan {self.loan_id} {self.days_past_due} days past due"
+
+
+class PortfolioMetric(models.Model):
+    """Pre-aggregated book-level counter, kept current by the write paths."""
+    
+    metric = models.CharField(max_length=40)
+    key = models.CharField(max_length=40, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=18, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('metric', 'key')
+
+    def __str__(self):
+        return f"{self.metric}[{self.key}] = {self.count} / {self.amount}"
+
+
+class LoanLedgerEntry(models.Model):
+    """Append-only record of one change to a loan's balances, see ``ledger.py``."""
+    
+    ENTRY_TYPE_CHOICES = (
+        ('DISBURSEMENT', 'Disbursement'),
+        ('ACCRUAL', 'Interest accrual'),
+        ('BILL', 'Bill'),
+        ('PAYMENT', 'Payment'),
+        ('CLOSURE', 'Closure'),
+    )
+    
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=12, choices=ENTRY_TYPE_CHOICES)
+    entry_date = models.DateField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    principal_delta = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    interest_delta = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    due_delta = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    paid_delta = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    reference = models.CharField(max_length=36, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['loan', 'entry_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} on Loan {self.loan_id} ({self.entry_date})"
+
+
+class LoanBalanceSnapshot(models.Model):
+    """A loan's balances summed over every ledger entry up to a date."""
+    
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='balance_snapshots')
+    as_of = models.DateField()
+    last_entry_id = models.BigIntegerField()
+    entry_count = models.IntegerField()
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    accrued_interest = models.DecimalField(max_digits=12, decimal_places=2)
+    amount_due = models.DecimalField(max_digits=12, decimal_places=2)
+    amount_paid = models.DecimalField(max_digits=14, decimal_places=2)
+    closed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('loan', 'as_of')
+
+    def __str__(self):
+        return f"Balance of Loan {self.loan_id} as of {self.as_of}"
+
+
+class ProfilingTrigger(models.Model):
+    """Profile the next requests to a path, switched on from the admin."""
+    
+    path = models.CharField(max_length=200)  # e.g. /api/get-statement/
+    query_contains = models.CharField(max_length=200, blank=True)  # e.g. loan_id=<uuid>
+    remaining = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Profile {self.remaining} requests to {self.path}"
+
+
+class ExecutionProfile(models.Model):
+    """A cProfile and SQL profile of one request or Celery task."""
+    
+    KIND_CHOICES = (
+        ('REQUEST', 'Request'),
+        ('TASK', 'Task'),
+    )
+    
+    profile_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    name = models.CharField(max_length=300)  # Method and path, or task name
+    started_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    query_count = models.IntegerField()
+    sql_ms = models.FloatField()
+    call_tree = models.TextField()
+    sql = models.JSONField(default=list)  # Per statement: count, total and slowest ms
+    stats = models.BinaryField()  # Marshalled pstats, as written by cProfile.dump_stats
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} at {self.started_at:%Y-%m-%d %H:%M:%S} ({self.duration_ms:.0f} ms)"
+
+
+class ReconciliationRun(models.Model):
+    """A reconciliation of every loan's balances, see ``reconciliation.py``."""
+    
+    STATUS_CHOICES = (
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    )
+    
+    run_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='RUNNING')
+    workers = models.IntegerField(default=1)
+    loans_checked = models.BigIntegerField(default=0)
+    discrepancy_count = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Reconciliation {self.started_at:%Y-%m-%d %H:%M}: {self.status}, {self.discrepancy_count} discrepancies"
+
+
+class LoanDiscrepancy(models.Model):
+    """A loan whose stored balances disagree with its payments, EMIs or bills."""
+    
+    KIND_CHOICES = (
+        ('PRINCIPAL', 'Principal balance differs from its payments'),
+        ('LOAN_STATUS', 'Status differs from its principal and unpaid EMIs'),
+        ('EMIS_PAID', 'More EMIs paid than payments made'),
+        ('BILLS_PAID', 'Bills credited with more than the payments made'),
+        ('BILL_STATUS', 'Bill status differs from its amount paid'),
+    )
+    
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name='discrepancies')
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='discrepancies')
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    expected = models.CharField(max_length=40)
+    actual = models.CharField(max_length=40)
+    reference = models.CharField(max_length=36, blank=True, default='')  # Bill ID for bill checks
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run', 'kind']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} on Loan {self.loan_id}: expected {self.expected}, found {self.actual}"
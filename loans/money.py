@@ -0,0 +1,180 @@
+"""
+Integer-paise money arithmetic for hot paths.
+
+Amounts are carried as ``int`` paise and interest rates as ``int`` basis
+points (hundredths of a percent), so schedule generation, billing and
+payment allocation do plain integer arithmetic instead of ``Decimal``.
+Intermediate results that are not whole paise are kept as an exact
+numerator over a known denominator and rounded exactly once, by
+``div_round``.
+
+Rounding rules:
+    * Amounts stored on models are rounded to the paisa, half to even, which
+      is how Django quantizes DecimalField values read back from the database.
+    * EMI installments are rounded to the whole rupee, half to even.
+    * The daily interest rate is rounded to 0.001 percent, half to even.
+
+Only paths that loop over many amounts use this module: EMI schedules,
+which carry the remaining principal from month to month, and the NumPy
+variants for whole chunks of loans (paise fit comfortably in int64, as a
+10-digit DecimalField is at most 10**10 paise). Convert with
+``to_paise``/``from_paise`` once, on the way in and out of the loop. A
+single amount read from a model and stored back stays ``Decimal`` (see the
+helpers in ``utils.py``): the C decimal module does one multiply and
+quantize faster than the round trip through paise. The scalar functions
+here define the same rules exactly, and the tests check that the Decimal
+helpers agree with them.
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+
+PAISE_PER_RUPEE = 100
+BASIS_POINTS_PER_PERCENT = 100
+DAYS_PER_YEAR = 365
+MONTHS_PER_YEAR = 12
+
+# Minimum due and EMI principal are 3% of principal
+PRINCIPAL_PERCENT = 3
+
+# A monthly interest amount is principal * bp / MONTHLY_INTEREST_DIVISOR
+MONTHLY_INTEREST_DIVISOR = BASIS_POINTS_PER_PERCENT * 100 * MONTHS_PER_YEAR
+
+
+def div_round(numerator, denominator):
+    """Divide an integer by a positive integer, rounding half to even."""
+    quotient, remainder = divmod(numerator, denominator)
+    remainder += remainder
+    if remainder > denominator or (remainder == denominator and quotient & 1):
+        return quotient + 1
+    return quotient
+
+
+def to_paise(amount):
+    """Convert a rupee amount (Decimal, int or str) to integer paise."""
+    if type(amount) is int:
+        return amount * PAISE_PER_RUPEE
+    amount = Decimal(amount).scaleb(2)
+    if amount == amount.to_integral_value():
+        # Model values have at most two places, so this is the usual case
+        return int(amount)
+    return int(amount.to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_paise(paise):
+    """Convert integer paise to a two-place rupee Decimal."""
+    return Decimal(paise).scaleb(-2)
+
+
+def to_basis_points(rate):
+    """Convert an annual percentage rate such as Decimal('15.50') to basis points."""
+    return to_paise(rate)
+
+
+def monthly_interest(principal_paise, rate_bp):
+    """One month of interest on a principal, in paise."""
+    return div_round(principal_paise * rate_bp, MONTHLY_INTEREST_DIVISOR)
+
+
+def principal_portion(principal_paise):
+    """The 3% of principal due each cycle, in paise."""
+    return div_round(principal_paise * PRINCIPAL_PERCENT, 100)
+
+
+def daily_rate_millipercent(rate_bp):
+    """The daily interest rate in thousandths of a percent."""
+    return div_round(rate_bp * 1000, BASIS_POINTS_PER_PERCENT * DAYS_PER_YEAR)
+
+
+def daily_interest(principal_paise, rate_bp):
+    """One day of interest on a principal at the rounded daily rate, in paise."""
+    return div_round(principal_paise * div_round(rate_bp * 1000, 36500), 100000)
+
+
+def div_round_array(numerators, denominator):
+    """Element-wise ``div_round`` over an int64 array."""
+    import numpy as np
+
+    quotients, remainders = np.divmod(numerators, denominator)
+    remainders = remainders * 2
+    return quotients + ((remainders > denominator) | ((remainders == denominator) & (quotients & 1 == 1)))
+
+
+def minimum_due(principal_paise, interest_paise):
+    """Minimum due for a billing cycle: 3% of principal plus interest, in paise."""
+    return div_round(principal_paise * PRINCIPAL_PERCENT + interest_paise * 100, 100)
+
+
+def emi_schedule(loan_paise, rate_bp, term_period):
+    """
+    Installment amounts for a loan, in whole rupees.
+
+    Each installment is 3% of the original principal plus a month of interest
+    on the remaining principal; the last one clears whatever principal is
+    left. The exact amount is rounded to the rupee once.
+
+    Returns:
+        List of ``term_period`` integer rupee amounts
+    """
+    # All terms are over a common denominator of paise * 12,000,000
+    denominator = 100 * MONTHLY_INTEREST_DIVISOR * PAISE_PER_RUPEE
+    installments = []
+    for month in range(term_period):
+        remaining = loan_paise * (100 - PRINCIPAL_PERCENT * month)
+        if month == term_period - 1:
+            numerator = remaining * (MONTHLY_INTEREST_DIVISOR + rate_bp)
+        else:
+            numerator = (loan_paise * PRINCIPAL_PERCENT * MONTHLY_INTEREST_DIVISOR
+                         + remaining * rate_bp)
+        installments.append(div_round(numerator, denominator))
+    return installments
+
+
+def principal_after_payment(principal_paise, payment_paise, rate_bp):
+    """
+    Principal left after a payment, in paise.
+
+    The payment first covers a month of interest on the current principal;
+    the rest reduces principal, which never goes below zero.
+    """
+    remaining = div_round(
+        (principal_paise - payment_paise) * MONTHLY_INTEREST_DIVISOR + principal_paise * rate_bp,
+        MONTHLY_INTEREST_DIVISOR
+    )
+    return max(0, remaining)
+
+
+def principal_after_payment_array(principals_paise, payments_paise, rates_bp):
+    """``principal_after_payment`` for many loans at once, over int64 arrays."""
+    import numpy as np
+
+    principals_paise = np.asarray(principals_paise, dtype=np.int64)
+    remaining = div_round_array(
+        (principals_paise - np.asarray(payments_paise, dtype=np.int64)) * MONTHLY_INTEREST_DIVISOR
+        + principals_paise * np.asarray(rates_bp, dtype=np.int64),
+        MONTHLY_INTEREST_DIVISOR
+    )
+    return np.maximum(remaining, 0)
+
+
+def foreclosure_amount(principal_paise, rate_bp):
+    """
+    The payment that leaves no principal, in paise: the principal plus the
+    month of interest ``principal_after_payment`` takes out first.
+    """
+    return principal_paise + monthly_interest(principal_paise, rate_bp)
+
+
+def payment_split(payment_paise, loan_paise, rate_bp):
+    """
+    Split a payment into principal and interest for a statement, in paise.
+
+    Interest is a month at the loan's rate on the original loan amount.
+
+    Returns:
+        Tuple of (principal, interest)
+    """
+    interest = monthly_interest(loan_paise, rate_bp)
+    principal = div_round(
+        payment_paise * MONTHLY_INTEREST_DIVISOR - loan_paise * rate_bp, MONTHLY_INTEREST_DIVISOR
+    )
+    return principal, interest
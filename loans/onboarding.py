@@ -0,0 +1,148 @@
+"""
+Bulk user registration for partner onboarding batches.
+
+``register_users`` takes the same fields as the register-user endpoint for a
+whole batch of users. Every row is validated with ``RegisterUserSchema``.
+Aadhar IDs and emails that are already registered are fetched with one ``IN``
+lookup per chunk of rows, and duplicates are then found with set lookups,
+both against the database and against earlier rows of the batch. New users
+are scored from a single vectorized pass over the transactions index
+(``scoring.score_table``), or from their ingested balances where there are
+any, as single registrations are, and inserted with ``bulk_create``, already
+carrying their score.
+
+Each row gets its own result, in input order, with the error that rejected it
+or the new user's ID.
+"""
+
+import time
+
+from django.db import IntegrityError, transaction
+
+from . import scoring
+from .models import User
+from .services import validation_error_message
+from .validators import RegisterUserSchema
+
+AADHAR_EXISTS = "User with this Aadhar ID already exists."
+EMAIL_EXISTS = "User with this email already exists."
+AADHAR_REPEATED = "Aadhar ID appears in an earlier row of this batch."
+EMAIL_REPEATED = "Email appears in an earlier row of this batch."
+
+
+def _existing(field, values):
+    """Values of a unique User field that are already registered."""
+    return set(User.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+
+
+def _insert(users):
+    """
+    Insert a chunk of new users in one transaction.
+
+    If another registration took one of their Aadhar IDs or emails since the
+    duplicate check, the chunk is inserted again row by row.
+
+    Returns:
+        Dict of user to the error that rejected it, for the users that weren't inserted
+    """
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+        return {}
+    except IntegrityError:
+        pass
+
+    rejected = {}
+    for user in users:
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            exists = User.objects.filter(aadhar_id=user.aadhar_id).exists()
+            rejected[user] = AADHAR_EXISTS if exists else EMAIL_EXISTS
+    return rejected
+
+
+def register_users(rows, chunk_size=5000):
+    """
+    Register a batch of users.
+
+    Rows are accepted or rejected exactly as if each had been sent to the
+    register-user endpoint in order; a row that clashes with an earlier row
+    of the batch gets its own message.
+
+    Args:
+        rows: Dicts with aadhar_id, name, email_id and annual_income, as sent to
+            the register-user endpoint
+        chunk_size: Rows looked up and inserted per query
+
+    Returns:
+        Dict with the number of users created and rejected, the seconds taken,
+        and a list of per-row results: the row number, the error or None, and
+        for new users their unique_user_id and credit score
+    """
+    start = time.perf_counter()
+    results = []
+    valid = []
+    for number, row in enumerate(rows):
+        data, errors = RegisterUserSchema.validate(row)
+        result = {"row": number, "error": validation_error_message(errors) if errors else None}
+        results.append(result)
+        if not errors:
+            valid.append((result, data))
+
+    registered_aadhar_ids = set()
+    registered_emails = set()
+    for offset in range(0, len(valid), chunk_size):
+        chunk = valid[offset:offset + chunk_size]
+        registered_aadhar_ids |= _existing('aadhar_id', [data['aadhar_id'] for _, data in chunk])
+        registered_emails |= _existing('email', [data['email_id'] for _, data in chunk])
+
+    accepted = []
+    batch_aadhar_ids = set()
+    batch_emails = set()
+    for result, data in valid:
+        if data['aadhar_id'] in batch_aadhar_ids:
+            result['error'] = AADHAR_REPEATED
+        elif data['aadhar_id'] in registered_aadhar_ids:
+            result['error'] = AADHAR_EXISTS
+        elif data['email_id'] in batch_emails:
+            result['error'] = EMAIL_REPEATED
+        elif data['email_id'] in registered_emails:
+            result['error'] = EMAIL_EXISTS
+        else:
+            batch_aadhar_ids.add(data['aadhar_id'])
+            batch_emails.add(data['email_id'])
+            accepted.append((result, data))
+
+    model = scoring.get_model()
+    table = scoring.score_table(model) if accepted else None
+    for offset in range(0, len(accepted), chunk_size):
+        chunk = accepted[offset:offset + chunk_size]
+        scores = scoring.lookup_scores(model, table, [data['aadhar_id'] for _, data in chunk])
+        users = [
+            User(
+                aadhar_id=data['aadhar_id'],
+                name=data['name'],
+                email=data['email_id'],
+                annual_income=data['annual_income'],
+                credit_score=credit_score,
+                credit_score_model=model.version
+            )
+            for (_, data), credit_score in zip(chunk, scores)
+        ]
+        rejected = _insert(users)
+        for (result, _), user in zip(chunk, users):
+            if user in rejected:
+                result['error'] = rejected[user]
+            else:
+                result['unique_user_id'] = user.unique_user_id
+                result['credit_score'] = user.credit_score
+
+    created = sum(1 for result in results if result['error'] is None)
+    return {
+        "created": created,
+        "rejected": len(results) - created,
+        "seconds": round(time.perf_counter() - start, 3),
+        "results": results,
+    }
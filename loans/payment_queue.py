@@ -0,0 +1,123 @@
+"""
+Group-commit write queue for payments.
+
+On SQLite every write transaction takes the database-wide write lock, so
+concurrent payment requests each wait for the lock and commit in turn, and
+under bursts give up with "database is locked". With PAYMENT_WRITE_QUEUE on,
+the payment views validate a request and hand it to ``submit`` instead of
+writing it themselves. One writer thread per process takes every queued
+payment, up to PAYMENT_QUEUE_BATCH_SIZE, and records them in a single
+transaction. While a batch commits the next one queues up, so batches grow
+with the load.
+
+Each payment is recorded in its own savepoint, so a payment that fails a
+business rule rolls back alone. A payment is checked against its loan's
+earliest unpaid EMI as of the write, which accounts for earlier payments in
+the same batch. Each request's future is resolved with its own payment or
+error once the batch has committed. If the batch fails on a database error,
+its payments are retried one transaction each.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+
+from .models import EMISchedule
+from .services import record_payment
+
+_lock = threading.Lock()
+_pending = None
+_pid = None
+
+
+def submit(loan, amount):
+    """
+    Queue a validated payment for this process's writer thread.
+
+    Args:
+        loan: Loan being paid
+        amount: Payment amount, already checked against the due EMI
+
+    Returns:
+        Future resolved with the created Payment once it has committed, or with
+        the exception that rejected it
+    """
+    global _pending, _pid
+
+    with _lock:
+        if _pid != os.getpid():  # first use, or a forked child without the writer
+            _pending = queue.SimpleQueue()
+            threading.Thread(target=_run, args=(_pending,), name='payment-writer', daemon=True).start()
+            _pid = os.getpid()
+    future = Future()
+    _pending.put((future, loan, amount))
+    return future
+
+
+def _record(loan, amount):
+    """Record a payment against the earliest EMI still unpaid in this transaction."""
+    earliest_unpaid_emi = EMISchedule.objects.filter(
+        loan=loan, is_paid=False
+    ).order_by('due_date').first()
+    return record_payment(loan, amount, earliest_unpaid_emi)
+
+
+def _write_batch(batch):
+    """
+    Record a batch of payments in one transaction.
+
+    Returns:
+        List of (future, payment, exception) outcomes, to resolve after the commit
+    """
+    outcomes = []
+    with transaction.atomic():
+        for future, loan, amount in batch:
+            try:
+                with transaction.atomic():
+                    outcomes.append((future, _record(loan, amount), None))
+            except DatabaseError:
+                raise
+            except Exception as exc:
+                outcomes.append((future, None, exc))
+    return outcomes
+
+
+def _write_one(future, loan, amount):
+    """Record a payment in a transaction of its own."""
+    try:
+        with transaction.atomic():
+            return [(future, _record(loan, amount), None)]
+    except Exception as exc:
+        return [(future, None, exc)]
+
+
+def _run(pending):
+    """Writer loop: commit queued payments in batches, then resolve their futures."""
+    while True:
+        batch = [pending.get()]
+        while len(batch) < settings.PAYMENT_QUEUE_BATCH_SIZE:
+            try:
+                batch.append(pending.get_nowait())
+            except queue.Empty:
+                break
+
+        close_old_connections()
+        try:
+            try:
+                outcomes = _write_batch(batch)
+            except DatabaseError as exc:
+                print(f"Payment batch of {len(batch)} failed ({exc}), retrying one by one")
+                outcomes = [outcome for item in batch for outcome in _write_one(*item)]
+            for future, payment, exc in outcomes:
+                if exc is None:
+                    future.set_result(payment)
+                else:
+                    future.set_exception(exc)
+        except Exception as exc:
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
@@ -0,0 +1,235 @@
+"""
+On-demand profiling of single requests and Celery tasks.
+
+With PROFILING_ENABLED, one execution at a time can be profiled:
+
+    requests  a request carrying ``X-Profile: <PROFILING_TOKEN>``, or matching
+              a ``ProfilingTrigger`` switched on in the admin
+              (``ProfilingMiddleware`` in ``loans/middleware.py``)
+    tasks     a task sent with ``send_profiled(task, ...)``, which sets the
+              ``profile`` message header
+
+The execution runs under cProfile with every SQL statement timed, and is
+stored as an ``ExecutionProfile``: a call tree pruned to the calls that
+took a noticeable share of the time, the statements grouped with their
+counts and timings, and the raw stats. The admin shows them and downloads
+the stats as a ``.prof`` file for ``python -m pstats`` or snakeviz.
+
+cProfile is deterministic and slows the profiled execution down, two to
+three times for ORM-heavy code, so compare a profile's shares rather than
+its absolute times; storing the profile adds some tens of milliseconds.
+Only the calling thread is seen: async views are profiled on the event
+loop, without the ORM work they hand to other threads. With profiling
+disabled the middleware is not installed and the task signals are not
+connected.
+"""
+
+import cProfile
+import hmac
+import logging
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ExecutionProfile, ProfilingTrigger
+from .query_log import QueryLog, normalize
+
+HEADER = 'HTTP_X_PROFILE'
+TASK_HEADER = 'profile'
+
+logger = logging.getLogger(__name__)
+
+_running_tasks = {}
+_triggers = []
+_triggers_read_at = None
+_triggers_lock = threading.Lock()
+
+
+class Profiler:
+    """Context manager that profiles the code inside it and records its SQL."""
+
+    def __enter__(self):
+        self.log = QueryLog()
+        self._capture = self.log.capture()
+        self._capture.__enter__()
+        self.started_at = timezone.now()
+        self._start = time.perf_counter()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self._capture.__exit__(*exc_info)
+        return False
+
+    def save(self, kind, name):
+        """Store the profile and return it."""
+        stats = pstats.Stats(self.profile)
+        return ExecutionProfile.objects.create(
+            kind=kind,
+            name=name[:300],
+            started_at=self.started_at,
+            duration_ms=self.duration_ms,
+            query_count=len(self.log.queries),
+            sql_ms=sum(entry['ms'] for entry in self.log.queries),
+            call_tree=call_tree(stats),
+            sql=sql_summary(self.log.queries),
+            stats=marshal.dumps(stats.stats),
+        )
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # a builtin
+    for prefix in ('site-packages' + os.sep, str(settings.BASE_DIR) + os.sep):
+        if prefix in filename:
+            filename = filename.split(prefix, 1)[1]
+            break
+    return f"{name}  {filename}:{line}"
+
+
+def call_tree(stats, min_share=None, max_depth=60):
+    """
+    Render a profile's call tree as text, heaviest calls first.
+
+    Args:
+        stats: pstats.Stats of the profile
+        min_share: Calls taking less than this share of the total time are
+            left out; defaults to the PROFILING_MIN_CALL_SHARE setting
+
+    Returns:
+        One line per call: cumulative ms, share of the outermost call, number
+        of calls and the function, indented under its caller. cProfile only
+        keeps caller-callee pairs, so a line counts every call of the function
+        from that caller, wherever in the tree the caller itself was called
+    """
+    if min_share is None:
+        min_share = settings.PROFILING_MIN_CALL_SHARE
+    children = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, calls, _, cumulative) in callers.items():
+            children[caller].append((cumulative, calls, func))
+    # Entry points: functions with calls that came from outside the profile
+    roots = [
+        (cumulative, calls, func) for func, (_, calls, _, cumulative, callers) in stats.stats.items()
+        if calls > sum(edge[1] for edge in callers.values())
+    ]
+    total = max([value[3] for value in stats.stats.values()] + [1e-9])
+
+    lines = []
+
+    def walk(cumulative, calls, func, depth, path):
+        lines.append(f"{cumulative * 1000:10.1f} ms {cumulative / total:6.1%} {calls:>7}x  {'  ' * depth}{_label(func)}")
+        if depth == max_depth:
+            return
+        for child in sorted(children[func], reverse=True):
+            if child[0] >= total * min_share and child[2] not in path:
+                walk(*child, depth + 1, path | {child[2]})
+
+    for root in sorted(roots, reverse=True):
+        if root[0] >= total * min_share:
+            walk(*root, 0, {root[2]})
+    return '\n'.join(lines)
+
+
+def sql_summary(queries):
+    """Group statements by their normalized SQL, slowest total first."""
+    groups = {}
+    for entry in queries:
+        group = groups.setdefault(normalize(entry['sql']), {
+            'sql': normalize(entry['sql']), 'alias': entry['alias'], 'count': 0,
+            'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        group['rows'] += entry['read'] + entry['written']
+    for group in groups.values():
+        group['total_ms'] = round(group['total_ms'], 3)
+        group['max_ms'] = round(group['max_ms'], 3)
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+
+def _triggers_due():
+    return _triggers_read_at is None or time.monotonic() - _triggers_read_at >= settings.PROFILING_TRIGGER_POLL_SECONDS
+
+
+def _active_triggers():
+    """The armed triggers, re-read at most every PROFILING_TRIGGER_POLL_SECONDS."""
+    global _triggers, _triggers_read_at
+
+    if _triggers_due():
+        with _triggers_lock:
+            if _triggers_due():
+                _triggers = list(ProfilingTrigger.objects.filter(remaining__gt=0).values_list(
+                    'pk', 'path', 'query_contains'
+                ))
+                _triggers_read_at = time.monotonic()
+    return _triggers
+
+
+def might_want_profile(request):
+    """
+    Cheap first check, without database access: False unless the request has
+    a profile header, matches an armed trigger's path, or triggers are due to
+    be re-read.
+    """
+    return HEADER in request.META or _triggers_due() or any(path == request.path for _, path, _ in _triggers)
+
+
+def wants_profile(request):
+    """Whether a request asked to be profiled, by token header or admin trigger."""
+    token = request.META.get(HEADER)
+    if token:
+        return bool(settings.PROFILING_TOKEN) and hmac.compare_digest(token, settings.PROFILING_TOKEN)
+    query = request.META.get('QUERY_STRING', '')
+    for pk, path, query_contains in _active_triggers():
+        if request.path == path and query_contains in query:
+            # Another process may have used up the last one
+            if ProfilingTrigger.objects.filter(pk=pk, remaining__gt=0).update(remaining=F('remaining') - 1):
+                return True
+    return False
+
+
+def send_profiled(task, *args, **kwargs):
+    """Queue a Celery task so that the worker profiles its execution."""
+    return task.apply_async(args, kwargs, headers={TASK_HEADER: True})
+
+
+def _task_flagged(task):
+    request = task.request
+    return bool(getattr(request, TASK_HEADER, None) or (request.headers or {}).get(TASK_HEADER))
+
+
+def _start_task(sender=None, task_id=None, task=None, **kwargs):
+    if _task_flagged(task):
+        profiler = Profiler()
+        _running_tasks[task_id] = profiler
+        profiler.__enter__()
+
+
+def _finish_task(sender=None, task_id=None, task=None, **kwargs):
+    profiler = _running_tasks.pop(task_id, None)
+    if profiler is not None:
+        profiler.__exit__(None, None, None)
+        profile = profiler.save('TASK', task.name)
+        logger.info("Profiled task %s [%s]: %.0f ms, %d queries, profile %s", task.name, task_id,
+                    profiler.duration_ms, len(profiler.log.queries), profile.profile_id)
+
+
+def connect_task_signals():
+    """Profile flagged tasks in this worker; called at startup when profiling is enabled."""
+    from celery.signals import task_postrun, task_prerun
+
+    task_prerun.connect(_start_task, weak=False, dispatch_uid='loans.profiling.start')
+    task_postrun.connect(_finish_task, weak=False, dispatch_uid='loans.profiling.finish')
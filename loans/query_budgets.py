@@ -0,0 +1,328 @@
+"""
+Query budgets for the API endpoints and Celery tasks.
+
+Each ``Budget`` seeds data of a given size (EMIs on a loan, loans on the
+book, rows in a batch), runs one endpoint or task against it and counts the
+SQL it executes, with the number of rows each statement read or wrote. The
+rows allowed are a function of the size, but the queries allowed are a fixed
+number: no endpoint or batch job may issue a query per EMI, loan or row, so
+an accidental per-row query goes over budget as soon as the size grows.
+
+``check`` runs a budget at several sizes on a flushed database with an empty
+entity cache, so the counts are those of a cold request. When a run is over
+budget, the report diffs its queries against the run at the smallest size:
+each distinct statement with its literals collapsed and the number of times
+it ran, which points straight at the statement that grew.
+
+Queries are counted on every database alias of the calling thread. Work
+handed to another thread, such as the async views or the payment write
+queue, isn't seen.
+"""
+
+import difflib
+import os
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import Client
+from django.utils import timezone
+
+from creditservice.routers import reset_write_pin
+
+from . import billing, tasks
+from .models import Loan, User
+from .query_log import QueryLog, normalize
+from .services import create_loan, record_payment
+
+SIZES = (1, 5, 25)
+
+
+def query_lines(log):
+    """The distinct statements of a run with their counts, in order of first execution."""
+    counts = Counter(normalize(entry['sql']) for entry in log.queries)
+    return [f"{count:>5} x {sql}" for sql, count in counts.items()]
+
+
+class Budget:
+    """
+    An endpoint or task, how to seed data for it and what it may cost.
+
+    ``seed(size)`` creates the data and returns what ``run`` needs;
+    ``queries`` is the number of queries allowed at any size and
+    ``rows(size)`` the rows allowed. A budget without a ``scale`` doesn't
+    depend on size and runs once.
+    """
+
+    __slots__ = ('name', 'scale', 'seed', 'run', 'queries', 'rows')
+
+    def __init__(self, name, seed, run, queries, rows, scale=None):
+        self.name = name
+        self.scale = scale
+        self.seed = seed
+        self.run = run
+        self.queries = queries
+        self.rows = rows
+
+
+def _users(count):
+    return User.objects.bulk_create([
+        User(aadhar_id=f"{i:012d}", name=f"User {i}", email=f"user{i}@example.com",
+             annual_income=Decimal('900000'), credit_score=700)
+        for i in range(count)
+    ])
+
+
+def _loans(count, term_period=12, paid=0, disbursed=date(2025, 1, 1)):
+    """Loans through ``create_loan``, one per user, each with its first EMIs paid."""
+    loans = []
+    for user in _users(count):
+        loan, _ = create_loan(user, 'CREDIT_CARD', Decimal('5000'), Decimal('15'), term_period, disbursed)
+        for emi in loan.emi_schedule.order_by('due_date')[:paid]:
+            record_payment(loan, emi.amount_due, emi)
+        loans.append(loan)
+    return loans
+
+
+def _write_transactions(count):
+    """Write a transactions feed with a credit and a debit for the first ``count`` users."""
+    with open(settings.TRANSACTIONS_CSV_PATH, 'w') as feed:
+        feed.write('AADHARID,Date,Amount,Transaction_type\n')
+        for i in range(count):
+            feed.write(f"{i:012d},2023-01-05,{1000 + i},CREDIT\n{i:012d},2023-01-09,{400 + i},DEBIT\n")
+
+
+def _billed(count, days_overdue=0):
+    """Loans whose billing cycle ends today, or that were billed and are now overdue."""
+    today = timezone.now().date()
+    _loans(count, disbursed=today - timedelta(days=Loan.BILLING_CYCLE_DAYS + days_overdue))
+    if days_overdue:
+        billing.generate_bills(today - timedelta(days=days_overdue))
+    return today
+
+
+def _get(path, **params):
+    return Client().get(path, params)
+
+
+def _post(path, payload):
+    return Client().post(path, payload, content_type='application/json')
+
+
+def _registration(i):
+    return {'aadhar_id': f"{i:012d}", 'name': f"User {i}", 'email_id': f"user{i}@example.com",
+            'annual_income': '900000'}
+
+
+def _paid_half(term_period):
+    loan, = _loans(1, term_period=term_period, paid=term_period // 2)
+    return loan
+
+
+def _export(_):
+    tasks.export_statements(os.path.join(os.path.dirname(settings.TRANSACTIONS_CSV_PATH), 'statements.csv'))
+
+
+BUDGETS = [
+    Budget(
+        'POST /api/register-user/',
+        seed=lambda n: _write_transactions(1),
+        run=lambda _: _post('/api/register-user/', _registration(0)),
+        queries=5,
+        rows=lambda n: 2,
+    ),
+    Budget(
+        'POST /api/register-users/', scale='users in the batch',
+        seed=lambda n: _write_transactions(n) or [_registration(i) for i in range(n)],
+        run=lambda rows: _post('/api/register-users/', {'users': rows}),
+        queries=5,
+        rows=lambda n: n,
+    ),
+    Budget(
+        'POST /api/apply-loan/', scale='months in the term',
+        seed=lambda n: (str(_users(1)[0].unique_user_id), n),
+        run=lambda args: _post('/api/apply-loan/', {
+            'unique_user_id': args[0], 'loan_type': 'CREDIT_CARD', 'loan_amount': '5000',
+            'interest_rate': '15', 'term_period': args[1], 'disbursement_date': '2025-01-01',
+        }),
+        queries=13,
+        rows=lambda n: n + 5,
+    ),
+    Budget(
+        'POST /api/make-payment/', scale='EMIs on the loan',
+        seed=lambda n: _loans(1, term_period=n)[0],
+        run=lambda loan: _post('/api/make-payment/', {
+            'loan_id': str(loan.loan_id),
+            'amount': str(loan.emi_schedule.order_by('due_date').first().amount_due),
+        }),
+        queries=18,
+        rows=lambda n: 13,
+    ),
+    Budget(
+        'POST /api/prepay-loan/', scale='EMIs on the loan',
+        seed=lambda n: _loans(1, term_period=n + 1)[0],  # N EMIs left to recompute
+        run=lambda loan: _post('/api/prepay-loan/', {'loan_id': str(loan.loan_id), 'amount': '1000'}),
+        queries=17,
+        rows=lambda n: 2 * n + 12,
+    ),
+    Budget(
+        'POST /api/foreclose-loan/', scale='EMIs on the loan',
+        seed=lambda n: _loans(1, term_period=n)[0],
+        run=lambda loan: _post('/api/foreclose-loan/', {'loan_id': str(loan.loan_id)}),
+        queries=24,
+        rows=lambda n: 2 * n + 13,
+    ),
+    Budget(
+        'GET /api/get-statement/', scale='EMIs on the loan',
+        seed=_paid_half,
+        run=lambda loan: _get('/api/get-statement/', loan_id=loan.loan_id),
+        queries=5,
+        rows=lambda n: n + 3,
+    ),
+    Budget(
+        'GET /api/get-balance/', scale='EMIs paid on the loan',
+        seed=lambda n: _loans(1, term_period=n, paid=n)[0],
+        run=lambda loan: _get('/api/get-balance/', loan_id=loan.loan_id),
+        queries=3,
+        rows=lambda n: 4,
+    ),
+    Budget(
+        'GET /api/portfolio/', scale='loans on the book',
+        seed=lambda n: _loans(n, paid=1),
+        run=lambda _: _get('/api/portfolio/'),
+        queries=1,
+        rows=lambda n: 10,
+    ),
+    Budget(
+        'calculate_credit_score',
+        seed=lambda n: _write_transactions(1) or _users(1)[0],
+        run=lambda user: tasks.calculate_credit_score(
+            str(user.unique_user_id), user.aadhar_id),
+        queries=4,
+        rows=lambda n: 3,
+    ),
+    Budget(
+        'process_daily_billing, no loans due', scale='active loans',
+        seed=lambda n: _loans(n, disbursed=timezone.now().date()),
+        run=lambda _: tasks.process_daily_billing(),
+        queries=11,
+        rows=lambda n: 3 * n + 1,
+    ),
+    Budget(
+        'process_daily_billing, all loans due', scale='loans due',
+        seed=_billed,
+        run=lambda _: tasks.process_daily_billing(),
+        queries=22,
+        rows=lambda n: 8 * n + 2,
+    ),
+    Budget(
+        'sweep_overdue_bills', scale='overdue loans',
+        seed=lambda n: _billed(n, days_overdue=20),
+        run=lambda _: tasks.sweep_overdue_bills(),
+        queries=12,
+        rows=lambda n: 3 * n + 3,
+    ),
+    Budget(
+        'export_statements', scale='active loans',
+        seed=lambda n: _loans(n, paid=3),
+        run=_export,
+        queries=4,
+        rows=lambda n: 16 * n + 1,
+    ),
+    Budget(
+        'snapshot_loan_balances', scale='loans with new entries',
+        seed=lambda n: _loans(n, paid=2),
+        run=lambda _: tasks.snapshot_loan_balances(),
+        queries=6,
+        rows=lambda n: 3 * n,
+    ),
+    Budget(
+        'reconcile_portfolio', scale='loans on the book',
+        seed=lambda n: _loans(n, paid=3),
+        run=lambda _: tasks.reconcile_portfolio(),
+        queries=12,
+        rows=lambda n: 5 * n + 3,
+    ),
+    Budget(
+        'ingest_transactions', scale='users in the feed',
+        seed=_write_transactions,
+        run=lambda _: tasks.ingest_transactions(),
+        queries=8,
+        rows=lambda n: n + 2,
+    ),
+]
+
+
+@contextmanager
+def scratch_transactions():
+    """Point the transactions feed and its cache at a temporary directory."""
+    directory = tempfile.mkdtemp(prefix='creditservice-budgets-')
+    saved = settings.TRANSACTIONS_CSV_PATH, settings.TRANSACTIONS_CACHE_DIR
+    settings.TRANSACTIONS_CSV_PATH = os.path.join(directory, 'transactions.csv')
+    settings.TRANSACTIONS_CACHE_DIR = os.path.join(directory, 'transactions_cache')
+    os.makedirs(settings.TRANSACTIONS_CACHE_DIR)
+    try:
+        yield directory
+    finally:
+        settings.TRANSACTIONS_CSV_PATH, settings.TRANSACTIONS_CACHE_DIR = saved
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def measure(budget, size):
+    """
+    Seed a flushed database and run a budget's endpoint or task once.
+
+    Returns:
+        The QueryLog of the run
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    _write_transactions(0)
+    seeded = budget.seed(size)
+    for cache in settings.CACHES:
+        caches[cache].clear()
+    reset_write_pin()
+    log = QueryLog()
+    with log.capture():
+        budget.run(seeded)
+    return log
+
+
+def check(budget, sizes=SIZES):
+    """
+    Run a budget at each size and compare the cost with what it allows.
+
+    Returns:
+        List of dicts with the size, queries, rows, the allowed queries and
+        rows, the run's statements with their counts, and for runs over
+        budget a diff of those against the first run
+    """
+    results = []
+    baseline = None
+    for size in (sizes if budget.scale else sizes[:1]):
+        log = measure(budget, size)
+        lines = query_lines(log)
+        if baseline is None:
+            baseline = (size, lines)
+        result = {
+            'size': size,
+            'queries': len(log.queries),
+            'rows': log.rows,
+            'max_queries': budget.queries,
+            'max_rows': budget.rows(size),
+            'lines': '\n'.join(lines),
+            'diff': None,
+        }
+        if result['queries'] > result['max_queries'] or result['rows'] > result['max_rows']:
+            result['diff'] = '\n'.join(difflib.unified_diff(
+                baseline[1] if baseline[0] != size else [], lines,
+                fromfile=f"size {baseline[0]}" if baseline[0] != size else 'no queries',
+                tofile=f"size {size}", lineterm='', n=len(lines)
+            ))
+        results.append(result)
+    return results
@@ -0,0 +1,80 @@
+"""
+Record the SQL a piece of code runs.
+
+``QueryLog.capture`` installs an execute wrapper on every database alias of
+the calling thread and records each statement with its time and the rows it
+read or wrote. ``normalize`` collapses a statement's literals so that repeats
+of it compare equal. Used by the query budgets and the profiler.
+"""
+
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryLog:
+    """
+    Record the SQL executed on every database alias while active.
+
+    Each entry is a dict with the alias, the SQL, the milliseconds it took
+    to execute and the rows it read (fetched by the caller) or wrote (the
+    cursor's row count).
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def _count_fetches(self, cursor):
+        """Make the cursor add the rows its caller fetches to its current entry."""
+        if getattr(cursor, '_query_log_entry', None) is None:
+            for name in ('fetchone', 'fetchmany', 'fetchall'):
+                setattr(cursor, name, self._counted(cursor, getattr(cursor, name), name == 'fetchone'))
+
+    @staticmethod
+    def _counted(cursor, fetch, single):
+        def counted(*args, **kwargs):
+            rows = fetch(*args, **kwargs)
+            cursor._query_log_entry['read'] += (rows is not None) if single else len(rows)
+            return rows
+        return counted
+
+    def _record(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            entry = {'alias': alias, 'sql': sql, 'ms': 0.0, 'read': 0, 'written': 0}
+            self.queries.append(entry)
+            cursor = context['cursor']
+            self._count_fetches(cursor)
+            cursor._query_log_entry = entry
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                entry['ms'] = (time.perf_counter() - start) * 1000
+                if not is_read(sql):
+                    entry['written'] = max(cursor.rowcount, 0)
+        return wrapper
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self._record(alias)))
+            yield self
+
+    @property
+    def rows(self):
+        return sum(entry['read'] + entry['written'] for entry in self.queries)
+
+
+def is_read(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH', 'PRAGMA'))
+
+
+def normalize(sql):
+    """Collapse a statement's column list, IN lists and VALUES rows, so repeats of it compare equal."""
+    sql = re.sub(r'^SELECT .+? FROM ', 'SELECT ... FROM ', sql.strip(), flags=re.S)
+    sql = re.sub(r'%s(, %s)+', '%s, ...', sql)
+    sql = re.sub(r'SAVEPOINT "\w+"', 'SAVEPOINT "..."', sql)
+    return re.sub(r'(\([^()]*\))(, \1)+', r'\1, ...', sql)
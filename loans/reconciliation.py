@@ -0,0 +1,262 @@
+"""
+Reconciliation of every loan's balances against its payments, EMIs and bills.
+
+Each loan's stored balances are recomputed from the rows they are derived
+from, and every disagreement is written to the report as a
+``LoanDiscrepancy`` of a ``ReconciliationRun``:
+
+    PRINCIPAL    principal_balance against the loan amount with each completed
+                 payment applied in order, by the rule the payment paths use
+    LOAN_STATUS  CLOSED exactly when no principal and no unpaid EMIs are left
+    EMIS_PAID    no more EMIs paid than completed payments; a foreclosure of
+                 principal left after the last EMI pays none
+    BILLS_PAID   the loan's bills credited with no more than its payments
+    BILL_STATUS  PAID exactly when a bill's amount paid covers a nonzero total
+                 due
+
+The book is split into loan-ID ranges of similar size that are reconciled in
+parallel worker processes. Each range is streamed a chunk of loans at a time
+in loan-ID order. A chunk's loans, payments, EMI counts and bills are read in
+one read transaction, so a payment landing mid-run can't show up as a
+discrepancy, and the checks run over NumPy arrays for the whole chunk. On
+SQLite the read transaction is opened with a deferred ``BEGIN`` whatever the
+connection's ``transaction_mode``, so it takes no write lock and never holds
+up payments or the other workers. The principal replay takes one array pass
+per payment position, the first payment of every loan in the chunk, then the
+second, and so on.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from creditservice.routers import replica_alias
+
+from . import money
+from .exports import in_range, loan_id_ranges
+from .models import Bill, EMISchedule, Loan, LoanDiscrepancy, Payment, ReconciliationRun
+
+
+@contextmanager
+def _read_transaction(alias):
+    """
+    A read-only transaction on ``alias`` that doesn't take the write lock.
+
+    ``transaction.atomic`` begins SQLite transactions in the connection's
+    ``transaction_mode``, which is IMMEDIATE under the high_throughput
+    profile. A deferred BEGIN only takes a read lock, or a WAL snapshot, on
+    the first read.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic(using=alias):
+            yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('BEGIN')
+        try:
+            yield
+        finally:
+            cursor.execute('ROLLBACK')  # nothing was written
+
+
+def _read_chunk(alias, first, last, after, chunk_size):
+    """
+    Read the next chunk of loans in a range, with their payments, EMI counts
+    and bills, as one consistent snapshot.
+
+    Returns:
+        Tuple of (loans, payments, emi_counts, bills) value lists, or None
+        past the end of the range
+    """
+    with _read_transaction(alias):
+        loans = in_range(Loan.objects.using(alias), 'loan_id', first, last)
+        if after is not None:
+            loans = loans.filter(loan_id__gt=after)
+        loans = list(loans.order_by('loan_id').values_list(
+            'loan_id', 'loan_amount', 'interest_rate', 'principal_balance', 'status'
+        )[:chunk_size])
+        if not loans:
+            return None
+
+        # Every loan ID between the chunk's first and last is in the chunk
+        span = {'loan_id__gte': loans[0][0], 'loan_id__lte': loans[-1][0]}
+        payments = list(Payment.objects.using(alias).filter(status='COMPLETED', **span).order_by(
+            'loan_id', 'payment_date', 'created_at'
+        ).values_list('loan_id', 'amount'))
+        emi_counts = list(EMISchedule.objects.using(alias).filter(**span).order_by().values('loan_id').annotate(
+            paid=Count('id', filter=Q(is_paid=True)), unpaid=Count('id', filter=Q(is_paid=False))
+        ).values_list('loan_id', 'paid', 'unpaid'))
+        bills = list(Bill.objects.using(alias).filter(**span).values_list(
+            'loan_id', 'bill_id', 'status', 'total_due_amount', 'amount_paid'
+        ))
+    return loans, payments, emi_counts, bills
+
+
+def _paise(amounts):
+    import numpy as np
+
+    return np.fromiter((money.to_paise(amount) for amount in amounts), dtype=np.int64, count=len(amounts))
+
+
+def replay_principal(loan_paise, rates_bp, payment_loans, payment_paise):
+    """
+    Principal left on each loan after its payments.
+
+    Args:
+        loan_paise: int64 array of loan amounts
+        rates_bp: int64 array of annual rates
+        payment_loans: Index into the loan arrays of each payment, ascending
+        payment_paise: int64 array of payment amounts, in order within each loan
+
+    Returns:
+        int64 array of principal balances in paise
+    """
+    import numpy as np
+
+    principal = np.array(loan_paise, dtype=np.int64)
+    if not len(payment_loans):
+        return principal
+    # Position of each payment among its loan's payments
+    positions = np.arange(len(payment_loans)) - np.searchsorted(payment_loans, payment_loans)
+    order = np.argsort(positions, kind='stable')
+    bounds = np.searchsorted(positions[order], np.arange(positions.max() + 2))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        step = order[start:end]  # at most one payment per loan
+        loans = payment_loans[step]
+        principal[loans] = money.principal_after_payment_array(
+            principal[loans], payment_paise[step], rates_bp[loans]
+        )
+    return principal
+
+
+def check_chunk(loans, payments, emi_counts, bills):
+    """
+    Reconcile a chunk of loans.
+
+    Returns:
+        List of (loan_id, kind, expected, actual, reference) discrepancies
+    """
+    import numpy as np
+
+    index = {row[0]: position for position, row in enumerate(loans)}
+    count = len(loans)
+    loan_paise = _paise([row[1] for row in loans])
+    rates_bp = _paise([row[2] for row in loans])
+    principal = _paise([row[3] for row in loans])
+    closed = np.array([row[4] == 'CLOSED' for row in loans])
+    checked = np.array([row[4] in ('ACTIVE', 'CLOSED') for row in loans])
+
+    payment_loans = np.fromiter((index[row[0]] for row in payments), dtype=np.int64, count=len(payments))
+    payment_paise = _paise([row[1] for row in payments])
+    payment_counts = np.bincount(payment_loans, minlength=count)
+    payment_totals = np.zeros(count, dtype=np.int64)
+    np.add.at(payment_totals, payment_loans, payment_paise)
+
+    emis_paid = np.zeros(count, dtype=np.int64)
+    emis_unpaid = np.zeros(count, dtype=np.int64)
+    for loan_id, paid, unpaid in emi_counts:
+        emis_paid[index[loan_id]] = paid
+        emis_unpaid[index[loan_id]] = unpaid
+
+    bill_loans = np.fromiter((index[row[0]] for row in bills), dtype=np.int64, count=len(bills))
+    bill_due = _paise([row[3] for row in bills])
+    bill_paid = _paise([row[4] for row in bills])
+    bill_status_paid = np.array([row[2] == 'PAID' for row in bills], dtype=bool)
+    bill_totals = np.zeros(count, dtype=np.int64)
+    np.add.at(bill_totals, bill_loans, bill_paid)
+
+    expected_principal = replay_principal(loan_paise, rates_bp, payment_loans, payment_paise)
+    should_close = (principal == 0) & (emis_unpaid == 0)
+
+    found = []
+    for position in np.flatnonzero(checked & (principal != expected_principal)):
+        found.append((loans[position][0], 'PRINCIPAL', money.from_paise(int(expected_principal[position])),
+                      money.from_paise(int(principal[position])), ''))
+    for position in np.flatnonzero(checked & (closed != should_close)):
+        found.append((loans[position][0], 'LOAN_STATUS', 'CLOSED' if should_close[position] else 'ACTIVE',
+                      loans[position][4], ''))
+    for position in np.flatnonzero(emis_paid > payment_counts):
+        found.append((loans[position][0], 'EMIS_PAID', f"at most {payment_counts[position]}",
+                      int(emis_paid[position]), ''))
+    for position in np.flatnonzero(bill_totals > payment_totals):
+        found.append((loans[position][0], 'BILLS_PAID', f"at most {money.from_paise(int(payment_totals[position]))}",
+                      money.from_paise(int(bill_totals[position])), ''))
+    # A bill for nothing is only marked PAID by the next payment
+    for position in np.flatnonzero((bill_due > 0) & ((bill_paid >= bill_due) != bill_status_paid)):
+        loan_id, bill_id, status = bills[position][:3]
+        found.append((loan_id, 'BILL_STATUS', 'not PAID' if status == 'PAID' else 'PAID', status, str(bill_id)))
+    return found
+
+
+def reconcile_range(run_id, first=None, last=None, chunk_size=5000):
+    """
+    Reconcile the loans with ``first <= loan_id < last`` and report their discrepancies.
+
+    Returns:
+        Tuple of (loans checked, discrepancies found)
+    """
+    alias = replica_alias()
+    checked = discrepancies = 0
+    after = None
+    while True:
+        chunk = _read_chunk(alias, first, last, after, chunk_size)
+        if chunk is None:
+            break
+        found = check_chunk(*chunk)
+        if found:
+            LoanDiscrepancy.objects.bulk_create([
+                LoanDiscrepancy(run_id=run_id, loan_id=loan_id, kind=kind, expected=str(expected),
+                                actual=str(actual), reference=reference)
+                for loan_id, kind, expected, actual, reference in found
+            ], batch_size=1000)
+        checked += len(chunk[0])
+        discrepancies += len(found)
+        after = chunk[0][-1][0]
+    return checked, discrepancies
+
+
+def _reconcile_part(args):
+    try:
+        return reconcile_range(*args)
+    finally:
+        connections.close_all()
+
+
+def reconcile(workers=1, chunk_size=5000):
+    """
+    Reconcile every loan on the book, in parallel worker processes.
+
+    Args:
+        workers: Number of loan-ID ranges reconciled at once
+        chunk_size: Loans read and checked at a time
+
+    Returns:
+        The finished ReconciliationRun
+    """
+    run = ReconciliationRun.objects.create(workers=workers)
+    try:
+        parts = [(run.run_id, first, last, chunk_size) for first, last in loan_id_ranges(workers, status=None)]
+        if len(parts) == 1:
+            results = [reconcile_range(*parts[0])]
+        else:
+            # Forked workers must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=len(parts), mp_context=multiprocessing.get_context('fork')) as pool:
+                results = list(pool.map(_reconcile_part, parts))
+    except Exception:
+        run.status = 'FAILED'
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'finished_at'])
+        raise
+
+    run.status = 'COMPLETED'
+    run.loans_checked = sum(checked for checked, _ in results)
+    run.discrepancy_count = sum(found for _, found in results)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'loans_checked', 'discrepancy_count', 'finished_at'])
+    return run
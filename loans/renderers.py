@@ -0,0 +1,122 @@
+"""
+Lean JSON rendering for high-traffic endpoints.
+
+``FastJSONRenderer`` produces the same bytes as DRF's ``JSONRenderer`` for
+the payloads this API returns: compact separators, non-ASCII text left
+unescaped, U+2028/U+2029 escaped, ``Decimal`` as a float, ``UUID`` as a
+string and dates in ISO 8601 (UTC datetimes ending in ``Z``). The encoder
+is pluggable through the ``FAST_JSON_ENCODER`` setting:
+
+    ''        disabled; views keep DRF's renderers
+    'auto'    orjson if it is installed, otherwise the standard library
+    'orjson'  orjson (``pip install orjson``)
+    'json'    the standard library with a lean ``default`` hook
+
+orjson writes floats outside [1e-4, 1e16) without Python's exponent padding
+(``1e16`` rather than ``1e+16``) and NaN as ``null``; neither occurs for
+two-place money amounts.
+"""
+
+import json
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(obj):
+    """Encode the types JSON doesn't know, the way DRF's JSONEncoder does."""
+    if type(obj) is Decimal:
+        if not obj.is_finite():
+            raise ValueError("Out of range float values are not JSON compliant")
+        return float(obj)
+    if type(obj) is UUID:
+        return str(obj)
+    return _drf_encoder.default(obj)
+
+
+def _escape_line_separators(content):
+    """Escape U+2028/U+2029 so the output is also valid JavaScript."""
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def json_dumps(data):
+    """Encode with the standard library."""
+    content = json.dumps(data, default=_default, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return _escape_line_separators(content.encode())
+
+
+def orjson_dumps(data):
+    """Encode with orjson, which handles UUIDs and dates natively."""
+    return _escape_line_separators(orjson.dumps(
+        data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    ))
+
+
+ENCODERS = {
+    'json': json_dumps,
+    'orjson': orjson_dumps,
+}
+
+
+def get_encoder(name=None):
+    """
+    Look up an encoder by name.
+
+    Args:
+        name: Key of ``ENCODERS`` or 'auto'; defaults to the FAST_JSON_ENCODER setting
+
+    Returns:
+        Function encoding a payload to bytes
+    """
+    name = name or getattr(settings, 'FAST_JSON_ENCODER', '') or 'auto'
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'json'
+    if name == 'orjson' and orjson is None:
+        raise ImportError("FAST_JSON_ENCODER is 'orjson' but orjson is not installed.")
+    return ENCODERS[name]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with a pluggable fast encoder.
+
+    Requests for indented output, and projects that change DRF's
+    UNICODE_JSON, COMPACT_JSON or STRICT_JSON settings, go through
+    ``JSONRenderer`` unchanged.
+    """
+
+    encoder_name = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if (self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return get_encoder(self.encoder_name)(data)
+
+
+def fast_json_enabled():
+    """Whether the opt-in fast rendering path is switched on."""
+    return bool(getattr(settings, 'FAST_JSON_ENCODER', ''))
+
+
+class FastJSONResponseMixin:
+    """Render an APIView's responses with FastJSONRenderer when it is enabled."""
+
+    def get_renderers(self):
+        if fast_json_enabled():
+            return [FastJSONRenderer()]
+        return super().get_renderers()
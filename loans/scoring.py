@@ -0,0 +1,267 @@
+"""
+Versioned credit score models.
+
+A model turns a user's net transaction balance (credits minus debits) into a
+score. The models are data, defined in ``CREDIT_SCORE_MODELS`` in settings and
+selected with ``CREDIT_SCORE_MODEL``:
+
+    score = min_score + floor(points / resolution) * resolution
+    points = (balance - base_balance) * step_points / step_balance
+
+clipped to [min_score, max_score]. Then the first ``floors`` entry whose
+balance threshold is met raises the score to at least its floor. Users without
+transactions get min_score.
+
+``ScoreModel.score`` scores one balance and ``ScoreModel.score_many`` scores
+a NumPy array of them with the same floating-point operations, so both agree
+exactly. Every score is stored with the version of the model that produced it
+(``User.credit_score_model``), and ``rescore_users`` moves the whole user
+base to a model in one pass over the transactions index. Like single-user
+scoring, the bulk paths score users whose balances were ingested (see
+``ingestion.py``) from those balances rather than the index.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import analytics, entity_cache
+from .models import User
+from .scoring_service import ingested_totals
+
+_models = {}
+
+
+class ScoreModel:
+    """A balance-to-score band table."""
+
+    __slots__ = ('version', 'min_score', 'max_score', 'base_balance', 'step_balance',
+                 'step_points', 'resolution', 'floors')
+
+    def __init__(self, version, min_score, max_score, base_balance, step_balance, step_points,
+                 resolution, floors=()):
+        self.version = version
+        self.min_score = min_score
+        self.max_score = max_score
+        self.base_balance = base_balance
+        self.step_balance = step_balance
+        self.step_points = step_points
+        self.resolution = resolution
+        self.floors = tuple(sorted(((threshold, floor) for threshold, floor in floors), reverse=True))
+
+    def __repr__(self):
+        return f"<ScoreModel {self.version}>"
+
+    def score(self, balance):
+        """
+        Score one balance.
+
+        Args:
+            balance: Net transaction balance in rupees, or None if the user has no transactions
+
+        Returns:
+            Credit score between min_score and max_score
+        """
+        if balance is None:
+            return self.min_score
+        points = (balance - self.base_balance) * self.step_points / self.step_balance
+        score = self.min_score + (points // self.resolution) * self.resolution
+        score = min(max(score, self.min_score), self.max_score)
+        for threshold, floor in self.floors:
+            if balance >= threshold:
+                score = max(score, floor)
+                break
+        return int(score)
+
+    def score_many(self, balances):
+        """
+        Score an array of balances in one vectorized pass.
+
+        Returns:
+            int64 array of credit scores aligned with ``balances``
+        """
+        import numpy as np
+
+        balances = np.asarray(balances, dtype=np.float64)
+        points = (balances - self.base_balance) * self.step_points / self.step_balance
+        scores = self.min_score + (points // self.resolution) * self.resolution
+        scores = np.clip(scores, self.min_score, self.max_score)
+        if self.floors:
+            scores = np.select(
+                [balances >= threshold for threshold, _ in self.floors],
+                [np.maximum(scores, floor) for _, floor in self.floors],
+                scores,
+            )
+        return scores.astype(np.int64)
+
+    def score_totals(self, totals):
+        """Score a (credits, debits) pair, or None for a user without transactions."""
+        if totals is None:
+            return self.min_score
+        credits, debits = totals
+        return self.score(credits - debits)
+
+
+def get_model(version=None):
+    """
+    Return a score model by version, by default the configured one.
+
+    Raises:
+        ValueError: if there is no model with that version
+    """
+    version = version or settings.CREDIT_SCORE_MODEL
+    model = _models.get(version)
+    if model is None:
+        if version not in settings.CREDIT_SCORE_MODELS:
+            raise ValueError(f"Unknown credit score model: {version}")
+        model = _models[version] = ScoreModel(version, **settings.CREDIT_SCORE_MODELS[version])
+    return model
+
+
+def _aadhar_keys(aadhar_ids):
+    """Aadhar IDs as int64 keys of the transactions index; -1 for IDs that aren't numbers."""
+    import numpy as np
+
+    keys = np.empty(len(aadhar_ids), dtype=np.int64)
+    for position, aadhar_id in enumerate(aadhar_ids):
+        try:
+            keys[position] = int(aadhar_id)
+        except (TypeError, ValueError, OverflowError):
+            keys[position] = -1
+    return keys
+
+
+def score_table(model):
+    """
+    Score every user in the transactions index in one vectorized pass.
+
+    Returns:
+        Tuple of (sorted int64 Aadhar IDs, int64 scores); both empty if the
+        transactions CSV doesn't exist
+    """
+    import numpy as np
+    from .transactions import get_index
+
+    index = get_index()
+    if index is None:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    ids, credits, debits = index.totals()
+    return ids, model.score_many(credits - debits)
+
+
+def lookup_scores(model, table, aadhar_ids):
+    """
+    Look up the scores of users from the same totals as single-user scoring
+    (``scoring_service.transaction_totals``): their ingested balances where
+    there are any, read in one query, and their entry in a ``score_table``
+    otherwise.
+
+    Returns:
+        List of scores aligned with ``aadhar_ids``; min_score for users without transactions
+    """
+    import numpy as np
+
+    ids, scores = table
+    if len(ids):
+        keys = _aadhar_keys(aadhar_ids)
+        positions = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+        found = np.where(ids[positions] == keys, scores[positions], model.min_score).tolist()
+    else:
+        found = [model.min_score] * len(aadhar_ids)
+
+    ingested = ingested_totals(aadhar_ids)
+    for position, aadhar_id in enumerate(aadhar_ids):
+        totals = ingested.get(str(aadhar_id))
+        if totals is not None:
+            found[position] = model.score_totals(totals)
+    return found
+
+
+def _write_scores(rows):
+    """
+    Store new scores with a single prepared UPDATE run for every row.
+
+    ``bulk_update`` builds one CASE expression per field over the whole batch,
+    which dominates a rescore of the user base.
+
+    Args:
+        rows: (unique_user_id, credit_score, credit_score_model, updated_at) tuples
+    """
+    connection = connections[router.db_for_write(User)]
+    quote = connection.ops.quote_name
+    fields = [User._meta.get_field(name) for name in ('credit_score', 'credit_score_model', 'updated_at')]
+    primary_key = User._meta.pk
+    sql = (
+        f"UPDATE {quote(User._meta.db_table)} "
+        f"SET {', '.join(f'{quote(field.column)} = %s' for field in fields)} "
+        f"WHERE {quote(primary_key.column)} = %s"
+    )
+    params = [
+        [field.get_db_prep_value(value, connection) for field, value in zip(fields, values)]
+        + [primary_key.get_db_prep_value(user_id, connection)]
+        for user_id, *values in rows
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def rescore_users(version=None, chunk_size=2000, dry_run=False):
+    """
+    Rescore every user with a model in one pass over the transactions index.
+
+    Scores all balances in the index at once, then walks the users in primary
+    key order, scoring ingested users from their balances instead, and writes only those whose score or model version changes,
+    with one batched UPDATE per chunk. Changed users are dropped from the entity
+    cache and their active loans move score band in the portfolio counters.
+
+    Args:
+        version: Score model version, by default the configured one
+        chunk_size: Users read and written per transaction
+        dry_run: Count the changes without writing them
+
+    Returns:
+        Dict with the model version and the number of users scanned and changed
+    """
+    start = time.perf_counter()
+    model = get_model(version)
+    table = score_table(model)
+
+    scanned = changed = 0
+    last_pk = None
+    while True:
+        users = User.objects.order_by('pk')
+        if last_pk is not None:
+            users = users.filter(pk__gt=last_pk)
+        rows = list(users.values_list('unique_user_id', 'aadhar_id', 'credit_score', 'credit_score_model')[:chunk_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        scanned += len(rows)
+
+        new_scores = lookup_scores(model, table, [row[1] for row in rows])
+
+        now = timezone.now()
+        updates, changes = [], []
+        for (user_id, _, old_score, old_version), new_score in zip(rows, new_scores):
+            if old_score == new_score and old_version == model.version:
+                continue
+            updates.append((user_id, new_score, model.version, now))
+            changes.append((user_id, old_score, new_score))
+        changed += len(updates)
+        if dry_run or not updates:
+            continue
+
+        with transaction.atomic(using=router.db_for_write(User)):
+            _write_scores(updates)
+            analytics.credit_scores_changed(changes)
+            for user_id, _, _ in changes:
+                entity_cache.invalidate_user(user_id)
+
+    return {
+        "model": model.version,
+        "scanned": scanned,
+        "changed": changed,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,288 @@
+"""
+Local scoring service shared by every web and Celery worker on a host.
+
+Scoring needs NumPy and the transactions index (see ``transactions.py``).
+Loading them in each web and Celery worker costs every worker the imports
+and its own view of the index. ``serve`` loads the index once, faults its
+pages into memory and then forks a pool of workers. The workers inherit the
+memory-mapped arrays, so the data sits in the page cache once per host, and
+they accept requests on a shared Unix socket (``multiprocessing.connection``,
+authenticated with a key derived from SECRET_KEY).
+
+A request is a list of Aadhar IDs and the reply holds the credit and debit
+totals of each. Callers apply their own scoring rules to the totals.
+``transaction_totals`` reads the running balances of users the feed has
+already been ingested for (see ``ingestion.py``), so rescoring after an
+append doesn't rebuild the index. Only users never ingested are looked up in
+the index: through the service when SCORING_SERVICE_ADDRESS is set, falling
+back to reading the index in-process if the service can't be reached or
+doesn't answer within SCORING_SERVICE_TIMEOUT seconds.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import signal
+import socket
+import struct
+import time
+from multiprocessing.connection import (
+    AuthenticationError, Connection, Listener, answer_challenge, deliver_challenge, wait
+)
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+class ScoringServiceError(Exception):
+    """Raised when the scoring service can't answer a request."""
+
+
+def authkey():
+    """Key clients and the service authenticate each other with."""
+    return hashlib.sha256(f'scoring-service:{settings.SECRET_KEY}'.encode()).digest()
+
+
+def local_totals(aadhar_ids):
+    """
+    Sum credits and debits for each user from the transactions index in this process.
+
+    Returns:
+        List of (credits, debits) tuples aligned with ``aadhar_ids``, with None
+        for users without transactions; None if the transactions CSV doesn't exist
+    """
+    from .transactions import get_index
+
+    index = get_index()
+    if index is None:
+        return None
+    return [index.credits_and_debits(aadhar_id) for aadhar_id in aadhar_ids]
+
+
+def ingested_totals(aadhar_ids):
+    """
+    Credit and debit totals of the users already ingested into ``UserBalance``.
+
+    Returns:
+        Dict of Aadhar ID to (credits, debits) for the ingested users only
+    """
+    return {
+        aadhar_id: (float(credits), float(debits))
+        for aadhar_id, credits, debits in _balance_rows(aadhar_ids)
+    }
+
+
+def _balance_rows(aadhar_ids):
+    """Query for the (Aadhar ID, credits, debits) of the ingested users among ``aadhar_ids``."""
+    from .models import UserBalance
+
+    rows = UserBalance.objects.filter(aadhar_id__in=[str(aadhar_id) for aadhar_id in aadhar_ids])
+    return rows.values_list('aadhar_id', 'credit_total', 'debit_total')
+
+
+def _connect(address, timeout):
+    """
+    Connect to the service and authenticate, giving up after ``timeout`` seconds.
+
+    ``Client`` blocks without a timeout both in ``connect``, while the listen
+    backlog is full, and in the challenge handshake, which waits for a worker
+    to accept. The handshake runs on a blocking socket with kernel send and
+    receive timeouts, so a stalled read fails with an OSError.
+    """
+    deadline = time.monotonic() + timeout
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.settimeout(None)
+        remaining = max(deadline - time.monotonic(), 0.001)
+        timeval = struct.pack('ll', int(remaining), int(remaining % 1 * 1_000_000))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+        conn = Connection(sock.detach())
+    finally:
+        sock.close()
+    try:
+        answer_challenge(conn, authkey())
+        deliver_challenge(conn, authkey())
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+def request_totals(aadhar_ids, address=None, timeout=None):
+    """
+    Ask the scoring service for the totals of each user.
+
+    Returns:
+        Same as ``local_totals``
+
+    Raises:
+        ScoringServiceError: if the service can't be reached or doesn't answer in time
+    """
+    address = address or settings.SCORING_SERVICE_ADDRESS
+    timeout = settings.SCORING_SERVICE_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    try:
+        with _connect(address, timeout) as conn:
+            conn.send(list(aadhar_ids))
+            if not conn.poll(max(0, deadline - time.monotonic())):
+                raise ScoringServiceError(f"no answer within {timeout}s")
+            status, payload = conn.recv()
+    except (BlockingIOError, TimeoutError) as exc:
+        # A connect or handshake that ran into the socket timeouts
+        raise ScoringServiceError(f"no answer within {timeout}s") from exc
+    except (OSError, EOFError, AuthenticationError) as exc:
+        raise ScoringServiceError(str(exc) or type(exc).__name__) from exc
+    if status != 'ok':
+        raise ScoringServiceError(payload)
+    return payload
+
+
+def index_totals(aadhar_ids):
+    """
+    Sum credits and debits for each user from the transactions index, through
+    the scoring service if one is configured. Doesn't touch the database.
+
+    Returns:
+        Same as ``local_totals``
+    """
+    if settings.SCORING_SERVICE_ADDRESS:
+        try:
+            return request_totals(aadhar_ids)
+        except ScoringServiceError as exc:
+            print(f"Scoring service unavailable ({exc}), reading transactions locally")
+    return local_totals(aadhar_ids)
+
+
+def _merge(aadhar_ids, totals, missing, found):
+    """Align ingested totals and those found in the index for the missing users with ``aadhar_ids``."""
+    if found is None and not totals:
+        return None
+    totals.update(zip(missing, found or [None] * len(missing)))
+    return [totals[aadhar_id] for aadhar_id in aadhar_ids]
+
+
+def transaction_totals(aadhar_ids):
+    """
+    Sum credits and debits for each user, from the ingested balances where
+    there are any and otherwise from the index, through the scoring service
+    if one is configured.
+
+    Args:
+        aadhar_ids: Aadhar IDs of the users being scored
+
+    Returns:
+        Same as ``local_totals``
+    """
+    aadhar_ids = [str(aadhar_id) for aadhar_id in aadhar_ids]
+    totals = ingested_totals(aadhar_ids)
+    missing = [aadhar_id for aadhar_id in aadhar_ids if aadhar_id not in totals]
+    return _merge(aadhar_ids, totals, missing, index_totals(missing) if missing else [])
+
+
+async def atransaction_totals(aadhar_ids):
+    """
+    Async version of ``transaction_totals``.
+
+    The ingested balances are read with the async ORM. Only the index lookup,
+    which doesn't touch the database, runs on an executor thread of its own
+    rather than the shared ORM thread.
+    """
+    aadhar_ids = [str(aadhar_id) for aadhar_id in aadhar_ids]
+    totals = {
+        aadhar_id: (float(credits), float(debits))
+        async for aadhar_id, credits, debits in _balance_rows(aadhar_ids)
+    }
+    missing = [aadhar_id for aadhar_id in aadhar_ids if aadhar_id not in totals]
+    found = await sync_to_async(index_totals, thread_sensitive=False)(missing) if missing else []
+    return _merge(aadhar_ids, totals, missing, found)
+
+
+def _serve_connections(listener):
+    """Worker loop: answer requests on accepted connections until terminated."""
+    # The parent stops the pool with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    while True:
+        try:
+            conn = listener.accept()
+        except (OSError, EOFError, AuthenticationError) as exc:
+            print(f"Scoring worker {os.getpid()}: rejected connection ({exc})")
+            continue
+        with conn:
+            try:
+                while True:
+                    aadhar_ids = conn.recv()
+                    try:
+                        conn.send(('ok', local_totals(aadhar_ids)))
+                    except Exception as exc:
+                        conn.send(('error', f"{type(exc).__name__}: {exc}"))
+            except (EOFError, OSError):
+                pass
+
+
+def _remove_stale_socket(address):
+    """Remove a socket file left behind by a service that is no longer running."""
+    if not os.path.exists(address):
+        return
+    probe = socket.socket(socket.AF_UNIX)
+    try:
+        probe.connect(address)
+    except ConnectionRefusedError:
+        os.unlink(address)
+    else:
+        raise ScoringServiceError(f"A scoring service is already listening on {address}")
+    finally:
+        probe.close()
+
+
+def serve(address, workers):
+    """
+    Run the scoring service until interrupted, restarting workers that exit.
+
+    Args:
+        address: Path of the Unix socket to listen on
+        workers: Number of worker processes to fork
+    """
+    from .transactions import get_index
+
+    index = get_index()
+    if index is not None:
+        for column in ('ids', 'offsets', 'amount', 'kind'):
+            getattr(index, column).sum()  # fault the pages in before forking
+        print(f"Scoring service: {len(index)} transactions for {len(index.ids)} users loaded")
+
+    _remove_stale_socket(address)
+    context = multiprocessing.get_context('fork')
+    listener = Listener(address, family='AF_UNIX', backlog=128, authkey=authkey())
+    os.chmod(address, 0o600)
+
+    def start_worker():
+        process = context.Process(target=_serve_connections, args=(listener,), daemon=True)
+        process.start()
+        return process
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    pool = [start_worker() for _ in range(workers)]
+    print(f"Scoring service listening on {address} with {workers} workers")
+    try:
+        while True:
+            wait([process.sentinel for process in pool])
+            for position, process in enumerate(pool):
+                if not process.is_alive():
+                    print(f"Scoring worker {process.pid} exited with {process.exitcode}, restarting")
+                    pool[position] = start_worker()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in pool:
+            process.terminate()
+        for process in pool:
+            process.join()
+        listener.close()
+        print("Scoring service stopped")
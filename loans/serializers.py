@@ -98,12 +98,25 @@ class PaymentSerializer(serializers.Serializer):
         return value
 
 
+class ForeclosureSerializer(serializers.Serializer):
+    """Serializer for loan foreclosure."""
+    
+    loan_id = serializers.UUIDField()
+
+
 class StatementSerializer(serializers.Serializer):
     """Serializer for loan statement."""
     
     loan_id = serializers.UUIDField()
 
 
+class BalanceSerializer(serializers.Serializer):
+    """Serializer for a loan balance from the ledger."""
+    
+    loan_id = serializers.UUIDField()
+    as_of = serializers.DateField(required=False)
+
+
 class PastTransactionSerializer(serializers.Serializer):
     """Serializer for past transaction details."""
     
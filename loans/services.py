@@ -0,0 +1,397 @@
+"""
+Domain operations shared by the synchronous and asynchronous API views.
+"""
+
+from decimal import Decimal
+from datetime import timedelta
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from . import analytics, entity_cache, ledger, money, scoring, scoring_service, statement_versions
+from .models import Loan, Payment, Bill, EMISchedule
+from .utils import calculate_monthly_interest, calculate_payment_split, calculate_principal_after_payment
+
+
+class LoanRejected(Exception):
+    """Raised when a loan application or payment fails a business rule."""
+
+
+def validation_error_message(errors):
+    """Flatten serializer errors into the single-line message the API returns."""
+    error_message = ""
+    for field, field_errors in errors.items():
+        error_message += f"{field}: {' '.join(field_errors)} "
+    return error_message.strip()
+
+
+def score_from_transactions(aadhar_id):
+    """
+    Calculate a credit score from the user's transaction history.
+
+    Args:
+        aadhar_id: Aadhar ID of the user being scored
+
+    Returns:
+        Tuple of (credit score, version of the score model that produced it)
+    """
+    return score_from_totals(aadhar_id, scoring_service.transaction_totals([aadhar_id]))
+
+
+def score_from_totals(aadhar_id, totals):
+    """
+    Calculate a credit score from totals looked up by ``scoring_service``.
+
+    Args:
+        aadhar_id: Aadhar ID of the user being scored
+        totals: ``transaction_totals`` for just that user
+
+    Returns:
+        Same as ``score_from_transactions``
+    """
+    model = scoring.get_model()
+    if totals is None:
+        return model.min_score, model.version  # Default minimum score if CSV doesn't exist
+
+    totals = totals[0]
+    if totals is not None:
+        credits, debits = totals
+        print(f"User {aadhar_id} - Credits: {credits}, Debits: {debits}, Balance: {credits - debits}")
+
+    credit_score = model.score_totals(totals)
+    print(f"Calculated credit score: {credit_score} ({model.version})")
+    return credit_score, model.version
+
+
+def check_loan_eligibility(user, loan_amount, interest_rate):
+    """
+    Apply the credit score, income and EMI affordability rules.
+
+    Raises:
+        LoanRejected: if the user is not eligible for the loan
+    """
+    # Check credit score
+    if not user.credit_score or user.credit_score < 300:
+        raise LoanRejected("Loan application rejected. Credit score is too low.")
+
+    print(f"User credit score: {user.credit_score}")
+
+    # Check annual income
+    if user.annual_income < 150000:  # Rs. 1,50,000
+        raise LoanRejected("Loan application rejected. Annual income is below the minimum requirement.")
+
+    # Calculate monthly income
+    monthly_income = user.annual_income / 12
+
+    # Calculate EMI amount for first month (principal portion + interest)
+    principal_portion = loan_amount * Decimal('0.03')  # 3% of principal
+    monthly_interest = (loan_amount * interest_rate / 100) / 12
+    emi_amount = principal_portion + monthly_interest
+
+    # Check if EMI exceeds 20% of monthly income
+    if emi_amount > (monthly_income * Decimal('0.2')):
+        raise LoanRejected("Loan application rejected. EMI exceeds 20% of monthly income.")
+
+    # Check if monthly interest is at least Rs. 50
+    if monthly_interest < 50:
+        raise LoanRejected("Loan application rejected. Monthly interest is below the minimum requirement.")
+
+
+def build_emi_schedule(loan_amount, interest_rate, term_period, disbursement_date):
+    """
+    Build the EMI schedule for a loan.
+
+    Returns:
+        List of (due_date, amount_due) tuples, one per month of the term
+    """
+    # Installments are computed exactly in integer paise and rounded to the rupee
+    installments = money.emi_schedule(
+        money.to_paise(loan_amount), money.to_basis_points(interest_rate), term_period
+    )
+    return [
+        (disbursement_date + timedelta(days=30 * month), amount_due)
+        for month, amount_due in enumerate(installments, start=1)
+    ]
+
+
+def create_loan(user, loan_type, loan_amount, interest_rate, term_period, disbursement_date):
+    """
+    Create an active loan and its EMI schedule in one transaction.
+
+    Returns:
+        Tuple of the new loan and its due dates as API dicts
+    """
+    with transaction.atomic():
+        loan = Loan.objects.create(
+            user=user,
+            loan_type=loan_type,
+            loan_amount=loan_amount,
+            interest_rate=interest_rate,
+            term_period=term_period,
+            disbursement_date=disbursement_date,
+            principal_balance=loan_amount,
+            status='ACTIVE',
+            next_billing_date=disbursement_date + timedelta(days=Loan.BILLING_CYCLE_DAYS)
+        )
+
+        schedule = build_emi_schedule(loan_amount, interest_rate, term_period, disbursement_date)
+        EMISchedule.objects.bulk_create([
+            EMISchedule(loan=loan, due_date=due_date, amount_due=amount_due)
+            for due_date, amount_due in schedule
+        ])
+        due_dates = [
+            {"date": due_date.strftime('%Y-%m-%d'), "amount_due": amount_due}
+            for due_date, amount_due in schedule
+        ]
+
+        ledger.loan_disbursed(loan)
+        analytics.loan_created(loan, user.credit_score)
+
+    return loan, due_dates
+
+
+def check_payment(loan, amount, earliest_unpaid_emi):
+    """
+    Validate a payment against the loan status and the next unpaid EMI.
+
+    Raises:
+        LoanRejected: if the payment cannot be accepted
+    """
+    # Check if loan is active
+    if loan.status != 'ACTIVE':
+        raise LoanRejected(f"Payment rejected. Loan is not active, current status: {loan.status}.")
+
+    if earliest_unpaid_emi is None:
+        raise LoanRejected("Payment rejected. No pending EMIs found.")
+
+    # Check if payment matches the due amount for the earliest unpaid EMI
+    if amount != earliest_unpaid_emi.amount_due:
+        raise LoanRejected(
+            f"Payment rejected. The amount does not match the due installment of ₹{earliest_unpaid_emi.amount_due}."
+        )
+
+
+def pay_current_bill(loan, amount):
+    """
+    Apply a payment to the loan's latest open bill, if it has one.
+
+    Returns:
+        Tuple of (bill or None, its status before the payment)
+    """
+    current_bill = Bill.objects.filter(
+        loan=loan,
+        status__in=['GENERATED', 'PARTIALLY_PAID', 'OVERDUE']
+    ).order_by('-billing_date').first()
+    if current_bill is None:
+        return None, None
+
+    old_bill_status = current_bill.status
+    # Update bill status; an overdue bill stays overdue until paid off
+    if current_bill.amount_paid + amount >= current_bill.total_due_amount:
+        current_bill.status = 'PAID'
+    elif current_bill.status != 'OVERDUE':
+        current_bill.status = 'PARTIALLY_PAID'
+
+    current_bill.amount_paid += amount
+    current_bill.save()
+    return current_bill, old_bill_status
+
+
+def record_payment(loan, amount, earliest_unpaid_emi):
+    """
+    Record a validated EMI payment and update the EMI, bill and loan.
+
+    Returns:
+        The created payment
+    """
+    with transaction.atomic():
+        # The loan may have come from the entity cache; re-read the fields
+        # this payment changes and check them again before writing
+        loan.refresh_from_db(using=DEFAULT_DB_ALIAS, fields=['principal_balance', 'status'])
+        check_payment(loan, amount, earliest_unpaid_emi)
+        old_principal = loan.principal_balance
+        old_status = loan.status
+
+        # Create payment record
+        payment = Payment.objects.create(
+            loan=loan,
+            amount=amount,
+            payment_date=timezone.now(),
+            status='COMPLETED'
+        )
+
+        # Update EMI schedule
+        earliest_unpaid_emi.is_paid = True
+        earliest_unpaid_emi.save()
+
+        # Update principal balance
+        current_bill, old_bill_status = pay_current_bill(loan, amount)
+
+        # Reduce the principal balance by the principal portion (excluding interest)
+        if loan.principal_balance > 0:
+            # A month of interest comes out of the payment first; never goes below zero
+            loan.principal_balance = calculate_principal_after_payment(
+                loan.principal_balance, amount, loan.interest_rate
+            )
+
+            # If principal balance is zero, check if all EMIs are paid
+            if loan.principal_balance == 0 and not EMISchedule.objects.filter(loan=loan, is_paid=False).exists():
+                loan.status = 'CLOSED'
+
+            # Only the re-read fields: the rest of a cached loan may be stale
+            loan.save(update_fields=['principal_balance', 'status', 'updated_at'])
+
+        statement_versions.bump(loan.loan_id)
+        ledger.payment_recorded(loan, payment, old_principal, old_status)
+        analytics.payment_recorded(
+            loan, payment, old_principal, old_status, current_bill, old_bill_status
+        )
+        entity_cache.invalidate_loan(loan.loan_id)
+
+    return payment
+
+
+def foreclosure_amount(loan):
+    """The amount that pays a loan off today: its principal plus a month of interest."""
+    return loan.principal_balance + calculate_monthly_interest(loan.principal_balance, loan.interest_rate)
+
+
+def check_prepayment(loan, amount, unpaid_emis):
+    """
+    Validate a prepayment against the loan status, its next unpaid EMI and
+    the foreclosure amount.
+
+    Raises:
+        LoanRejected: if the prepayment cannot be accepted
+    """
+    if loan.status != 'ACTIVE':
+        raise LoanRejected(f"Prepayment rejected. Loan is not active, current status: {loan.status}.")
+
+    payoff = foreclosure_amount(loan)
+    if amount > payoff:
+        raise LoanRejected(f"Prepayment rejected. The amount exceeds the foreclosure amount of ₹{payoff}.")
+    if amount == payoff:
+        return  # a foreclosure, even of principal left after the last EMI
+
+    if not unpaid_emis:
+        raise LoanRejected("Prepayment rejected. No pending EMIs found.")
+
+    # A prepayment covers the due installment and reduces principal with the rest
+    if amount < unpaid_emis[0].amount_due:
+        raise LoanRejected(
+            f"Prepayment rejected. The amount is less than the due installment of ₹{unpaid_emis[0].amount_due}."
+        )
+
+    # Without installments left, any principal remaining could never be paid
+    if len(unpaid_emis) == 1:
+        raise LoanRejected(
+            f"Prepayment rejected. The last installment can only be prepaid in full, ₹{payoff}."
+        )
+
+
+def record_prepayment(loan, amount=None):
+    """
+    Record a prepayment, or with no amount a foreclosure, and recompute the
+    remaining EMI schedule in one transaction.
+
+    The amount pays the next unpaid EMI and a month of interest, and the rest
+    reduces principal. The EMIs after it keep their due dates and are
+    recomputed on the new principal, the way ``build_emi_schedule`` computes a
+    new loan's, and written back with a single bulk update. A prepayment that
+    leaves no principal closes the loan and deletes the EMIs it no longer owes;
+    a foreclosure also closes a loan that has paid every EMI with principal
+    still left over from rounding.
+
+    Args:
+        loan: Loan being prepaid, with its user loaded
+        amount: Prepayment amount, or None to pay the foreclosure amount
+
+    Returns:
+        Tuple of the created payment and the remaining EMIs as
+        (due_date, amount_due) tuples
+
+    Raises:
+        LoanRejected: if the prepayment fails a business rule
+    """
+    with transaction.atomic():
+        # The loan may have come from the entity cache; re-read the fields
+        # this prepayment changes before checking it
+        loan.refresh_from_db(using=DEFAULT_DB_ALIAS, fields=['principal_balance', 'status'])
+        unpaid_emis = list(EMISchedule.objects.filter(loan=loan, is_paid=False).order_by('due_date'))
+        if amount is None:
+            amount = foreclosure_amount(loan)
+        check_prepayment(loan, amount, unpaid_emis)
+        old_principal = loan.principal_balance
+        old_status = loan.status
+
+        now = timezone.now()
+        payment = Payment.objects.create(loan=loan, amount=amount, payment_date=now, status='COMPLETED')
+        current_bill, old_bill_status = pay_current_bill(loan, amount)
+
+        loan.principal_balance = calculate_principal_after_payment(loan.principal_balance, amount, loan.interest_rate)
+
+        # Recompute the schedule in memory, then write it in one statement
+        paid_emis, remaining = unpaid_emis[:1], unpaid_emis[1:]
+        for emi in paid_emis:
+            emi.is_paid = True
+            emi.updated_at = now
+        if loan.principal_balance == 0:
+            loan.status = 'CLOSED'
+            EMISchedule.objects.filter(pk__in=[emi.pk for emi in remaining]).delete()
+            remaining = []
+        else:
+            installments = money.emi_schedule(
+                money.to_paise(loan.principal_balance), money.to_basis_points(loan.interest_rate), len(remaining)
+            )
+            for emi, amount_due in zip(remaining, installments):
+                emi.amount_due = Decimal(amount_due)
+                emi.updated_at = now
+        EMISchedule.objects.bulk_update(paid_emis + remaining, ['amount_due', 'is_paid', 'updated_at'])
+
+        loan.save(update_fields=['principal_balance', 'status', 'updated_at'])
+
+        statement_versions.bump(loan.loan_id)
+        ledger.payment_recorded(loan, payment, old_principal, old_status)
+        analytics.payment_recorded(
+            loan, payment, old_principal, old_status, current_bill, old_bill_status
+        )
+        entity_cache.invalidate_loan(loan.loan_id)
+
+    return payment, [(emi.due_date, emi.amount_due) for emi in remaining]
+
+
+def statement_transactions(loan, paid_emis, unpaid_emis, first_payment):
+    """
+    Build the past and upcoming transaction lists of a loan statement.
+
+    Args:
+        loan: Loan the statement is for
+        paid_emis: Paid EMIs ordered by due date
+        unpaid_emis: Unpaid EMIs ordered by due date
+        first_payment: Earliest payment on the loan, or None
+
+    Returns:
+        Tuple of (past_transactions, upcoming_transactions)
+    """
+    past_transactions = []
+    if first_payment:
+        # Principal is the payment amount minus a month of interest on the loan amount
+        principal_portion, monthly_interest = calculate_payment_split(
+            first_payment.amount, loan.loan_amount, loan.interest_rate
+        )
+
+        for emi in paid_emis:
+            past_transactions.append({
+                "date": emi.due_date.strftime('%Y-%m-%d'),
+                "principal_due": principal_portion,
+                "interest": monthly_interest,
+                "amount_paid": round(first_payment.amount, 2)
+            })
+
+    upcoming_transactions = []
+    for emi in unpaid_emis:
+        upcoming_transactions.append({
+            "date": emi.due_date.strftime('%Y-%m-%d'),
+            "amount_due": round(emi.amount_due, 2)
+        })
+
+    return past_transactions, upcoming_transactions
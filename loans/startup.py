@@ -0,0 +1,145 @@
+"""
+Startup phase for API and worker processes.
+
+``LoansConfig.ready`` calls ``run`` with the LOANS_STARTUP_MODE setting:
+
+    eager  Warm up before serving: import the URLconf, views and the modules
+           they pull in (NumPy, DRF, the validators), and load the
+           transactions index, rebuilding its cache from the CSV if it is
+           stale, unless a scoring service holds it. The WSGI and ASGI
+           entrypoints default to this mode.
+    lazy   Do nothing up front; each piece loads when first used. This is the
+           default, and suits Celery workers and management commands that
+           never score anyone.
+
+Either way the timings are recorded. Server processes, whose WSGI and ASGI
+entrypoints call ``report_ready``, log how long they took to become ready
+and the latency of the first request they serve, as timed by
+``FirstRequestTimingMiddleware``, which is where lazy loading shows up.
+Management commands and Celery workers stay quiet, so nothing is written to
+output another tool may consume, such as ``manage.py dumpdata``.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+EAGER = 'eager'
+LAZY = 'lazy'
+MODES = (EAGER, LAZY)
+
+# Imported by the eager warm-up, in order
+PRELOAD_MODULES = (
+    'numpy',
+    'rest_framework.views',
+    'loans.transactions',
+    'loans.services',
+    'loans.validators',
+    'loans.renderers',
+)
+
+logger = logging.getLogger(__name__)
+
+_report = {}
+_first_request_lock = threading.Lock()
+
+
+def process_age():
+    """Seconds since this process started, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/stat') as stat:
+            start_ticks = int(stat.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as uptime:
+            seconds_since_boot = float(uptime.read().split()[0])
+        return seconds_since_boot - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def warm_up():
+    """
+    Load the heavy modules and data caches ahead of the first request.
+
+    Returns:
+        Dict of step name to milliseconds taken
+    """
+    from django.urls import get_resolver
+
+    steps = {}
+
+    start = time.perf_counter()
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    steps['modules'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    get_resolver().url_patterns  # imports every view module
+    steps['urlconf'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    from .validators import EmailField
+
+    # Django compiles the email patterns on first use
+    EmailField.email_validator('warm-up@example.com')
+    steps['validators'] = (time.perf_counter() - start) * 1000
+
+    if settings.SCORING_SERVICE_ADDRESS:
+        return steps  # the scoring service holds the transactions index
+
+    start = time.perf_counter()
+    from .transactions import get_index
+
+    index = get_index()
+    if index is not None:
+        # Fault in the ID lookup arrays every scoring call searches
+        index.ids.sum()
+        index.offsets.sum()
+    steps['transactions_index'] = (time.perf_counter() - start) * 1000
+    return steps
+
+
+def run(mode):
+    """Run the startup phase for ``mode`` and record how long startup took."""
+    if mode not in MODES:
+        raise ValueError(f"LOANS_STARTUP_MODE must be one of: {', '.join(MODES)}")
+
+    steps = warm_up() if mode == EAGER else {}
+    _report.update({
+        "mode": mode,
+        "ready_at": time.perf_counter(),
+        "warm_up_ms": {step: round(ms, 1) for step, ms in steps.items()},
+        "ready_after_s": process_age(),
+        "first_request": None,
+    })
+
+
+def report_ready():
+    """Log how long this server process took to become ready, and later its first request."""
+    if "mode" not in _report:
+        return
+    _report["server"] = True
+    steps = _report["warm_up_ms"]
+    age = _report["ready_after_s"]
+    logger.info("Startup (%s): %s%s", _report["mode"],
+                f"warm-up {sum(steps.values()):.0f} ms, " if steps else "",
+                f"ready {age:.2f} s after process start" if age is not None else "ready")
+
+
+def record_first_request(method, path, elapsed):
+    """Record the first request a process serves; later calls are ignored."""
+    with _first_request_lock:
+        if _report.get("first_request") is not None:
+            return
+        since_ready = time.perf_counter() - _report["ready_at"] if "ready_at" in _report else None
+        _report["first_request"] = {
+            "method": method,
+            "path": path,
+            "latency_ms": round(elapsed * 1000, 1),
+        }
+    if _report.get("server"):
+        logger.info("First request %s %s took %.0f ms%s", method, path, elapsed * 1000,
+                    f", {since_ready:.2f} s after startup" if since_ready is not None else "")
@@ -0,0 +1,71 @@
+"""
+Conditional GET support for loan statements.
+
+Each loan carries a ``statement_version`` that every write changing its
+statement bumps: a payment marks an EMI paid, may set the first payment and
+may close the loan, and a prepayment recomputes the EMIs left. Generating a
+bill bumps it too, in the same bulk UPDATE that moves the next billing date,
+so a client polling the statement learns of a new bill. The statement views
+send the version as the ``ETag`` of the payload. A client that sends it back
+in ``If-None-Match`` gets a 304 after one primary-key read of the version,
+without the EMIs and payments being loaded or the statement rebuilt.
+
+The version is read with the same database routing as the statement, so a
+lagging read replica serves a matching older version and payload. Responses
+are marked ``private, no-cache``: clients keep the statement but revalidate
+it on every use.
+"""
+
+from django.db.models import F
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Loan
+
+
+def bump(loan_id):
+    """
+    Mark a loan's statement as changed, so clients holding its ETag re-fetch it.
+
+    Call inside the transaction that changes the statement.
+    """
+    Loan.objects.filter(loan_id=loan_id).update(statement_version=F('statement_version') + 1)
+
+
+def _etag(version):
+    return None if version is None else f'"{version}"'
+
+
+def etag(loan_id):
+    """
+    ETag of a loan's current statement.
+
+    Returns:
+        The quoted ETag, or None if the loan doesn't exist
+    """
+    return _etag(Loan.objects.filter(loan_id=loan_id).values_list('statement_version', flat=True).first())
+
+
+async def aetag(loan_id):
+    """Async version of ``etag``."""
+    return _etag(await Loan.objects.filter(loan_id=loan_id).values_list('statement_version', flat=True).afirst())
+
+
+def tag(response, etag):
+    """Set a statement's ETag and caching headers on a response."""
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified(request, etag):
+    """
+    Answer the request's conditional headers for a statement.
+
+    Returns:
+        A 304 response if ``If-None-Match`` matches the ETag (or a 412 if
+        ``If-Match`` doesn't), otherwise None
+    """
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    return None if response is None else tag(response, etag)
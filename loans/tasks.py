@@ -2,17 +2,27 @@
 Celery tasks for the loans application.
 """
 
-import pandas as pd
-from datetime import datetime, timedelta
-from decimal import Decimal
-import os
-from django.conf import settings
+from datetime import datetime
 from django.db import transaction
-from django.db.models import Sum, F
+from django.db.models import Count, Sum, F
 from django.utils import timezone
 from celery import shared_task
 
-from .models import User, Loan, Bill, DailyInterestAccrual
+from . import analytics, billing, entity_cache, ledger, reconciliation, scoring, scoring_service
+from .models import User, Bill, LoanDelinquency
+from .exports import export_statements as write_statement_export
+from .ingestion import ingest_transactions as ingest_balances
+from .utils import days_past_due_bucket
+
+
+def _store_score(user, credit_score, version):
+    """Save a user's new credit score and move their active loans to its score band."""
+    old_score = user.credit_score
+    user.credit_score = credit_score
+    user.credit_score_model = version
+    user.save()
+    entity_cache.invalidate_user(user.unique_user_id)
+    analytics.credit_score_changed(user, old_score)
 
 
 @shared_task
@@ -24,51 +34,20 @@ def calculate_credit_score(user_id, aadhar_id):
         # Get the user
         user = User.objects.get(unique_user_id=user_id)
         
-        # Read the transactions CSV file
-        csv_path = settings.TRANSACTIONS_CSV_PATH
-        if not os.path.exists(csv_path):
-            user.credit_score = 300  # Default minimum score if CSV doesn't exist
-            user.save()
+        model = scoring.get_model()
+        totals = scoring_service.transaction_totals([aadhar_id])
+        if totals is None:
+            _store_score(user, model.min_score, model.version)  # Default minimum score if CSV doesn't exist
             return f"CSV file not found. Set default credit score for user {user_id}."
         
-        df = pd.read_csv(csv_path)
-        
-        # Filter transactions for the specific user
-        user_transactions = df[df['AADHARID'] == aadhar_id]
-        
-        if user_transactions.empty:
-            user.credit_score = 300  # Default minimum score if no transactions
-            user.save()
+        totals = totals[0]
+        if totals is None:
+            _store_score(user, model.min_score, model.version)  # Default minimum score if no transactions
             return f"No transactions found for user {user_id}. Set default credit score."
         
-        # Calculate account balance (CREDIT - DEBIT)
-        user_transactions['Amount'] = user_transactions['Amount'].astype(float)
-        
-        # Calculate net balance by transaction type
-        balance = 0
-        for _, row in user_transactions.iterrows():
-            if row['Transaction_type'] == 'CREDIT':
-                balance += row['Amount']
-            elif row['Transaction_type'] == 'DEBIT':
-                balance -= row['Amount']
-        
-        # Calculate credit score based on account balance
-        credit_score = 0
-        if balance >= 1000000:  # Rs. 10,00,000
-            credit_score = 900
-        elif balance <= 100000:  # Rs. 1,00,000
-            credit_score = 300
-        else:
-            # Score adjusts by 10 points for every Rs. 15,000 change in balance
-            excess_balance = balance - 100000
-            credit_score = 300 + (excess_balance // 15000) * 10
-            
-            # Cap at 900
-            credit_score = min(900, credit_score)
-        
-        # Update user's credit score
-        user.credit_score = int(credit_score)
-        user.save()
+        # Calculate credit score from the account balance (CREDIT - DEBIT)
+        credit_score = model.score_totals(totals)
+        _store_score(user, credit_score, model.version)
         
         return f"Credit score calculated successfully for user {user_id}: {credit_score}"
         
@@ -78,84 +57,153 @@ def calculate_credit_score(user_id, aadhar_id):
         return f"Error calculating credit score: {str(e)}"
 
 
+@shared_task
+def rescore_changed_user(user_id, aadhar_id):
+    """
+    Celery task to rescore a user whose balance changed in an ingest. Runs
+    calculate_credit_score, but on the bulk queue and rate limited.
+    """
+    return calculate_credit_score(user_id, aadhar_id)
+
+
 @shared_task
 def process_daily_billing():
     """
-    Celery task to process daily billing for all active loans.
+    Celery task to accrue a day's interest on every active loan and bill the
+    loans whose billing cycle ends today.
     """
     today = timezone.now().date()
     
-    # Get all active loans
-    active_loans = Loan.objects.filter(status='ACTIVE')
+    accrued = billing.accrue_interest(today)
+    bills = billing.generate_bills(today)
     
-    for loan in active_loans:
-        # Calculate days since disbursement
-        days_since_disbursement = (today - loan.disbursement_date).days
-        
-        # Check if this is a billing date (30 days after account creation or last billing)
-        latest_bill = Bill.objects.filter(loan=loan).order_by('-billing_date').first()
-        
-        if latest_bill:
-            days_since_last_billing = (today - latest_bill.billing_date).days
-            is_billing_date = days_since_last_billing >= 30
+    return f"Daily billing process completed: accrued interest on {accrued} active loans, generated {bills} bills."
+
+
+@shared_task
+def ingest_transactions(rescore=False):
+    """
+    Celery task to ingest newly appended transactions into running balances.
+    
+    With rescore, credit scores are recalculated only for registered users
+    whose balance changed.
+    """
+    rows, changed = ingest_balances()
+    
+    rescored = 0
+    if rescore and changed:
+        for user_id, aadhar_id in User.objects.filter(aadhar_id__in=changed).values_list('unique_user_id', 'aadhar_id'):
+            rescore_changed_user.delay(str(user_id), aadhar_id)
+            rescored += 1
+    
+    return f"Ingested {rows} transactions for {len(changed)} users; queued {rescored} rescores."
+
+
+@shared_task
+def sweep_overdue_bills():
+    """
+    Celery task to mark past-due bills OVERDUE and refresh the per-loan
+    delinquency summary.
+    """
+    today = timezone.now().date()
+    
+    # Flip every unpaid bill past its due date in one statement
+    past_due = Bill.objects.filter(
+        due_date__lt=today,
+        status__in=['GENERATED', 'PARTIALLY_PAID'],
+        amount_paid__lt=F('total_due_amount')
+    )
+    with transaction.atomic():
+        moved = past_due.values('status').annotate(count=Count('bill_id'), amount=Sum('total_due_amount'))
+        for row in moved:
+            analytics.bills_moved(row['status'], 'OVERDUE', row['count'], row['amount'])
+        flipped = past_due.update(status='OVERDUE', updated_at=timezone.now())
+    
+    # Summarize delinquent loans. Each bill rolls the unpaid balance of the
+    # previous one into its total, so a loan is delinquent when its most
+    # recently due bill is overdue. The amount overdue is what remains on that
+    # bill, and the days past due count from the oldest bill in the unbroken
+    # run of overdue bills before it.
+    sweep_started = timezone.now()
+    due_bills = Bill.objects.filter(
+        due_date__lt=today,
+        loan_id__in=Bill.objects.filter(status='OVERDUE').values('loan_id')
+    ).order_by('loan_id', '-due_date').values_list(
+        'loan_id', 'due_date', 'status', 'total_due_amount', 'amount_paid'
+    )
+    
+    summaries = {}
+    closed_runs = set()
+    for loan_id, due_date, bill_status, total_due_amount, amount_paid in due_bills.iterator(chunk_size=2000):
+        if loan_id in closed_runs:
+            continue
+        summary = summaries.get(loan_id)
+        if bill_status != 'OVERDUE':
+            closed_runs.add(loan_id)
+        elif summary is None:
+            summaries[loan_id] = LoanDelinquency(
+                loan_id=loan_id,
+                overdue_bill_count=1,
+                overdue_amount=total_due_amount - amount_paid,
+                oldest_due_date=due_date
+            )
         else:
-            # First billing should be 30 days after disbursement
-            is_billing_date = days_since_disbursement >= 30
-        
-        # Process daily interest accrual
-        daily_interest_rate = loan.calculate_daily_interest_rate()
-        daily_interest = loan.principal_balance * (daily_interest_rate / 100)
-        
-        # Record daily interest accrual
-        DailyInterestAccrual.objects.create(
-            loan=loan,
-            accrual_date=today,
-            interest_amount=daily_interest,
-            principal_balance=loan.principal_balance
+            summary.overdue_bill_count += 1
+            summary.oldest_due_date = due_date
+    
+    for summary in summaries.values():
+        summary.days_past_due = (today - summary.oldest_due_date).days
+        summary.dpd_bucket = days_past_due_bucket(summary.days_past_due)
+    
+    with transaction.atomic():
+        LoanDelinquency.objects.bulk_create(
+            summaries.values(),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['loan'],
+            update_fields=[
+                'overdue_bill_count', 'overdue_amount', 'oldest_due_date',
+                'days_past_due', 'dpd_bucket', 'updated_at'
+            ]
         )
-        
-        # If this is a billing date, create a new bill
-        if is_billing_date:
-            with transaction.atomic():
-                # Calculate billing period
-                if latest_bill:
-                    billing_period_start = latest_bill.billing_date + timedelta(days=1)
-                else:
-                    billing_period_start = loan.disbursement_date
-                
-                billing_period_end = today
-                
-                # Calculate interest accrued for the billing period
-                interest_accrued = DailyInterestAccrual.objects.filter(
-                    loan=loan,
-                    accrual_date__gte=billing_period_start,
-                    accrual_date__lte=billing_period_end
-                ).aggregate(total_interest=Sum('interest_amount'))['total_interest'] or 0
-                
-                # Calculate minimum due amount
-                min_due = loan.calculate_min_due(interest_accrued)
-                
-                # Check for past due amount
-                past_due_amount = 0
-                if latest_bill and latest_bill.status != 'PAID':
-                    past_due_amount = latest_bill.total_due_amount - latest_bill.amount_paid
-                
-                # Calculate total due amount
-                total_due = min_due + past_due_amount
-                
-                # Create new bill
-                due_date = today + timedelta(days=15)  # Due date is 15 days from billing date
-                
-                Bill.objects.create(
-                    loan=loan,
-                    billing_date=today,
-                    due_date=due_date,
-                    principal_due=loan.principal_balance,
-                    interest_accrued=interest_accrued,
-                    min_due_amount=min_due,
-                    past_due_amount=past_due_amount,
-                    total_due_amount=total_due,
-                    status='GENERATED'
-                )
+        # Loans this sweep did not find delinquent have caught up
+        cured = LoanDelinquency.objects.filter(updated_at__lt=sweep_started).delete()[0]
     
-    return f"Daily billing process completed for {active_loans.count()} active loans."
+    return f"Marked {flipped} bills overdue; {len(summaries)} delinquent loans, {cured} cured."
+
+
+@shared_task
+def export_statements(output, fmt='csv', workers=1):
+    """
+    Celery task to export statements for every active loan to a file.
+    
+    Prefork pool workers are daemonic and cannot start the export's own
+    worker processes; use workers > 1 only on a threads or solo pool.
+    """
+    rows, seconds = write_statement_export(output, fmt=fmt, workers=workers)
+    return f"Exported {rows} rows to {output} in {seconds:.1f}s ({rows / max(seconds, 1e-9):.0f} rows/s)."
+
+
+@shared_task
+def snapshot_loan_balances(as_of=None):
+    """
+    Celery task to snapshot the ledger balances of loans with new entries,
+    by default as of yesterday.
+    """
+    result = ledger.take_snapshots(datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None)
+    return f"Snapshotted {result['snapshots']} of {result['scanned']} loans as of {result['as_of']} in {result['seconds']:.1f}s."
+
+
+@shared_task
+def reconcile_portfolio(workers=1):
+    """
+    Celery task to reconcile every loan's balances against its payments,
+    EMIs and bills, and report the discrepancies.
+    
+    Prefork pool workers are daemonic and cannot start the reconciliation's
+    own worker processes; use workers > 1 only on a threads or solo pool.
+    """
+    run = reconciliation.reconcile(workers=workers)
+    seconds = (run.finished_at - run.started_at).total_seconds()
+    return (f"Reconciled {run.loans_checked} loans in {seconds:.1f}s: "
+            f"{run.discrepancy_count} discrepancies (run {run.run_id}).")
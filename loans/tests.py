@@ -0,0 +1,763 @@
+"""
+Tests for the loans application.
+"""
+
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from multiprocessing.connection import Listener
+from unittest import mock
+
+from asgiref.sync import AsyncToSync, SyncToAsync, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.utils import load_backend
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from creditservice.routers import reset_write_pin, use_read_replica
+from creditservice.settings import SQLITE_PROFILES, sqlite_replica
+
+from . import (analytics, billing, entity_cache, ledger, money, onboarding, query_budgets, reconciliation, scoring,
+               scoring_service, tasks, transactions, utils)
+from .ingestion import ingest_transactions
+from .query_log import QueryLog
+from .models import (Bill, DailyInterestAccrual, EMISchedule, Loan, LoanDelinquency, LoanLedgerEntry, PortfolioMetric,
+                     User, UserBalance)
+from .services import LoanRejected, create_loan, foreclosure_amount, record_payment, record_prepayment
+
+
+class TransactionsFeedMixin:
+    """Point the transactions feed and its cache at a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp(prefix='creditservice-tests-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.csv_path = os.path.join(directory, 'transactions.csv')
+        feed_settings = override_settings(
+            TRANSACTIONS_CSV_PATH=self.csv_path,
+            TRANSACTIONS_CACHE_DIR=os.path.join(directory, 'cache'),
+            SCORING_SERVICE_ADDRESS='',
+        )
+        feed_settings.enable()
+        self.addCleanup(feed_settings.disable)
+        transactions._index = None
+        self.addCleanup(setattr, transactions, '_index', None)
+        self.write_feed('AADHARID,Date,Amount,Transaction_type\n')
+
+    def write_feed(self, rows, mode='w'):
+        with open(self.csv_path, mode) as feed:
+            feed.write(rows)
+
+
+class LoanBookMixin:
+    """Users and loans created through the service layer."""
+
+    def make_loan(self, number=1, amount='5000', term_period=12, disbursed=date(2025, 1, 1)):
+        user = User.objects.create(aadhar_id=f"{number:012d}", name=f"User {number}",
+                                   email=f"user{number}@example.com", annual_income=900000, credit_score=700)
+        loan, _ = create_loan(user, 'CREDIT_CARD', Decimal(amount), Decimal('15'), term_period, disbursed)
+        return loan
+
+
+class RescoreFromBalancesTests(TransactionsFeedMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(aadhar_id='123456789012', name='A', email='a@example.com',
+                                        annual_income=900000)
+
+    def test_rescore_after_append_reads_balances_without_rebuilding_index(self):
+        self.write_feed('123456789012,2023-01-05,200000,CREDIT\n', mode='a')
+        ingest_transactions()
+        self.write_feed('123456789012,2023-02-05,600000,CREDIT\n'
+                        '123456789012,2023-02-09,100000,DEBIT\n', mode='a')
+        self.assertEqual(ingest_transactions(), (2, ['123456789012']))
+
+        with mock.patch('loans.transactions.build_cache') as build_cache:
+            result = tasks.rescore_changed_user(str(self.user.unique_user_id), self.user.aadhar_id)
+        build_cache.assert_not_called()
+
+        self.user.refresh_from_db()
+        with mock.patch('loans.scoring_service.ingested_totals', return_value={}):
+            transactions._index = None
+            tasks.calculate_credit_score(str(self.user.unique_user_id), self.user.aadhar_id)
+        expected = User.objects.get(pk=self.user.pk).credit_score
+        self.assertIn(f": {self.user.credit_score}", result)
+        self.assertEqual(self.user.credit_score, expected)
+
+    def test_user_never_ingested_falls_back_to_index(self):
+        self.write_feed('123456789012,2023-01-05,800000,CREDIT\n', mode='a')
+        self.assertFalse(UserBalance.objects.exists())
+
+        with mock.patch('loans.transactions.build_cache', wraps=transactions.build_cache) as build_cache:
+            tasks.calculate_credit_score(str(self.user.unique_user_id), self.user.aadhar_id)
+        build_cache.assert_called_once()
+        self.user.refresh_from_db()
+        self.assertGreater(self.user.credit_score, 300)
+
+
+class AsyncRegistrationScoringTests(TransactionsFeedMixin, TestCase):
+    REGISTRATION = {'name': 'A', 'annual_income': '900000'}
+
+    async def register(self, aadhar_id, email):
+        response = await AsyncClient().post('/api/async/register-user/', {
+            **self.REGISTRATION, 'aadhar_id': aadhar_id, 'email_id': email,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return await User.objects.aget(unique_user_id=response.json()['unique_user_id'])
+
+    async def test_ingested_user_is_scored_without_the_index(self):
+        await UserBalance.objects.acreate(aadhar_id='223456789012', credit_total=800000, debit_total=0)
+        with mock.patch('loans.scoring_service.index_totals', side_effect=AssertionError('index read')):
+            user = await self.register('223456789012', 'b@example.com')
+        self.assertEqual(user.credit_score, scoring.get_model().score_totals((800000.0, 0.0)))
+
+    async def test_user_never_ingested_is_scored_from_the_index(self):
+        self.write_feed('323456789012,2023-01-05,800000,CREDIT\n', mode='a')
+        user = await self.register('323456789012', 'c@example.com')
+        self.assertEqual(user.credit_score, scoring.get_model().score_totals((800000.0, 0.0)))
+        self.assertGreater(user.credit_score, 300)
+
+
+class CreditScoreBandTests(LoanBookMixin, TransactionsFeedMixin, TestCase):
+    """Rescoring moves a user's active loans between score bands on every path."""
+
+    def setUp(self):
+        super().setUp()
+        self.loan = self.make_loan()
+        self.user = self.loan.user
+
+    def band_counts(self):
+        return dict(PortfolioMetric.objects.filter(metric=analytics.LOANS_BY_SCORE_BAND, count__gt=0)
+                    .values_list('key', 'count'))
+
+    def assert_moved_to_minimum(self):
+        model = scoring.get_model()
+        tasks.calculate_credit_score(str(self.user.unique_user_id), self.user.aadhar_id)
+        self.assertEqual(User.objects.get(pk=self.user.pk).credit_score, model.min_score)
+        self.assertEqual(self.band_counts(), {analytics.credit_score_band(model.min_score): 1})
+
+    def test_user_without_transactions(self):
+        self.assertEqual(self.band_counts(), {analytics.credit_score_band(700): 1})
+        self.assert_moved_to_minimum()
+
+    def test_transactions_csv_missing(self):
+        os.remove(self.csv_path)
+        self.assert_moved_to_minimum()
+
+
+class BulkScoringTests(TransactionsFeedMixin, TestCase):
+    """Bulk onboarding and rescoring score from the same totals as single users."""
+
+    def setUp(self):
+        super().setUp()
+        # The index says 100000 for both; only the first user's feed was ingested, at 800000
+        self.write_feed('400000000001,2023-01-05,100000,CREDIT\n400000000002,2023-01-05,100000,CREDIT\n', mode='a')
+        UserBalance.objects.create(aadhar_id='400000000001', credit_total=800000, debit_total=0)
+        self.model = scoring.get_model()
+        self.expected = {'400000000001': self.model.score_totals((800000.0, 0.0)),
+                         '400000000002': self.model.score_totals((100000.0, 0.0))}
+        self.assertNotEqual(*self.expected.values())
+
+    def single_scores(self):
+        for user in User.objects.all():
+            tasks.calculate_credit_score(str(user.unique_user_id), user.aadhar_id)
+        return dict(User.objects.values_list('aadhar_id', 'credit_score'))
+
+    def test_bulk_registration(self):
+        report = onboarding.register_users([
+            {'aadhar_id': aadhar_id, 'name': 'A', 'email_id': f'{aadhar_id}@example.com', 'annual_income': '900000'}
+            for aadhar_id in self.expected
+        ])
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(dict(User.objects.values_list('aadhar_id', 'credit_score')), self.expected)
+        self.assertEqual(self.single_scores(), self.expected)
+
+    def test_rescore_users(self):
+        for aadhar_id in self.expected:
+            User.objects.create(aadhar_id=aadhar_id, name='A', email=f'{aadhar_id}@example.com',
+                                annual_income=900000, credit_score=500)
+        self.assertEqual(scoring.rescore_users()['changed'], 2)
+        self.assertEqual(dict(User.objects.values_list('aadhar_id', 'credit_score')), self.expected)
+        self.assertEqual(self.single_scores(), self.expected)
+
+
+class ScoringServiceTimeoutTests(TransactionsFeedMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.address = os.path.join(os.path.dirname(self.csv_path), 'scoring.sock')
+        self.write_feed('123456789012,2023-01-05,800000,CREDIT\n', mode='a')
+
+    def stalled_listener(self, accept):
+        """A socket that takes connections into its backlog, accepting them or not, and never speaks."""
+        listener = socket.socket(socket.AF_UNIX)
+        listener.bind(self.address)
+        listener.listen(8)
+        self.addCleanup(listener.close)
+        if accept:
+            accepted = []
+            thread = threading.Thread(target=lambda: accepted.append(listener.accept()[0]), daemon=True)
+            thread.start()
+            self.addCleanup(lambda: [conn.close() for conn in accepted])
+
+    def assert_gives_up_in_time(self, timeout=0.5):
+        start = time.monotonic()
+        with self.assertRaisesMessage(scoring_service.ScoringServiceError, f"no answer within {timeout}s"):
+            scoring_service.request_totals(['123456789012'], self.address, timeout=timeout)
+        self.assertLess(time.monotonic() - start, timeout + 1)
+
+    def test_handshake_times_out_when_no_worker_accepts(self):
+        self.stalled_listener(accept=False)
+        self.assert_gives_up_in_time()
+
+    def test_handshake_times_out_when_worker_never_answers(self):
+        self.stalled_listener(accept=True)
+        self.assert_gives_up_in_time()
+
+    def test_stalled_service_falls_back_to_local_totals(self):
+        self.stalled_listener(accept=False)
+        with override_settings(SCORING_SERVICE_ADDRESS=self.address, SCORING_SERVICE_TIMEOUT=0.5):
+            start = time.monotonic()
+            totals = scoring_service.transaction_totals(['123456789012'])
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(totals, [(800000.0, 0.0)])
+
+    def test_answering_service_replies(self):
+        listener = Listener(self.address, family='AF_UNIX', authkey=scoring_service.authkey())
+        self.addCleanup(listener.close)
+
+        def answer_once():
+            with listener.accept() as conn:
+                conn.send(('ok', scoring_service.local_totals(conn.recv())))
+
+        thread = threading.Thread(target=answer_once, daemon=True)
+        thread.start()
+        self.assertEqual(scoring_service.request_totals(['123456789012'], self.address, timeout=5),
+                         [(800000.0, 0.0)])
+        thread.join(5)
+
+
+class AsyncMalformedBodyTests(TestCase):
+    ENDPOINTS = ('register-user', 'apply-loan', 'make-payment', 'prepay-loan', 'foreclose-loan')
+
+    def test_malformed_json_is_a_400_like_the_sync_views(self):
+        client = Client()
+        for endpoint in self.ENDPOINTS:
+            with self.subTest(endpoint=endpoint):
+                sync = client.post(f'/api/{endpoint}/', b'{"loan_id": ', content_type='application/json')
+                response = client.post(f'/api/async/{endpoint}/', b'{"loan_id": ', content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), sync.json())
+                self.assertTrue(response.json()['detail'].startswith('JSON parse error - '))
+
+
+class AsgiMiddlewareChainTests(SimpleTestCase):
+    def test_chain_runs_without_sync_adapters(self):
+        handler = ASGIHandler()
+        layer, layers = handler._middleware_chain, []
+        while layer is not None:
+            layer = getattr(layer, '__wrapped__', layer)
+            self.assertNotIsInstance(layer, (AsyncToSync, SyncToAsync), f"adapted after {layers}")
+            layers.append(type(layer).__name__)
+            layer = getattr(layer, 'get_response', None)
+        self.assertIn('ReplicaPinMiddleware', layers)
+
+
+@override_settings(DATABASE_REPLICA_ALIAS='replica')
+class ReadReplicaRouterTests(TestCase):
+    """The router against a replica in a second database file, holding a different user."""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp(prefix='creditservice-tests-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        # Installed as a connection without a DATABASES entry, which the test
+        # runner would try to create a test database for
+        replica = connections.configure_settings({
+            'default': connections.settings['default'],
+            'replica': sqlite_replica(os.path.join(directory, 'replica.sqlite3'), SQLITE_PROFILES['high_throughput']),
+        })['replica']
+        connections['replica'] = load_backend(replica['ENGINE']).DatabaseWrapper(replica, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(connections['replica'].close)
+        with connections['replica'].schema_editor() as editor:
+            for model in apps.get_app_config('loans').get_models():
+                editor.create_model(model)
+
+        self.user = User.objects.create(aadhar_id='100000000001', name='Primary', email='p@example.com',
+                                        annual_income=900000)
+        User.objects.using('replica').create(aadhar_id='200000000002', name='Replica', email='r@example.com',
+                                             annual_income=900000)
+        caches['entities'].clear()
+        reset_write_pin()
+
+    def aadhar_ids(self):
+        return list(User.objects.order_by('aadhar_id').values_list('aadhar_id', flat=True))
+
+    def test_replica_settings_leave_out_writer_options(self):
+        options = connections['replica'].settings_dict['OPTIONS']
+        self.assertNotIn('transaction_mode', options)
+        self.assertNotIn('journal_mode', options['init_command'])
+        self.assertIn('mmap_size', options['init_command'])
+        with connections['replica'].cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+
+    def test_opted_in_read_goes_to_replica(self):
+        with use_read_replica():
+            self.assertEqual(self.aadhar_ids(), ['200000000002'])
+        self.assertEqual(self.aadhar_ids(), ['100000000001'])
+
+    def test_write_goes_to_primary_and_keeps_later_reads_there(self):
+        with use_read_replica():
+            User.objects.create(aadhar_id='300000000003', name='New', email='n@example.com', annual_income=900000)
+            self.assertEqual(self.aadhar_ids(), ['100000000001', '300000000003'])
+        self.assertFalse(User.objects.using('replica').filter(aadhar_id='300000000003').exists())
+
+    def loan_on_primary(self):
+        loan, _ = create_loan(self.user, 'CREDIT_CARD', Decimal('5000'), Decimal('15'), 12, date(2025, 1, 1))
+        caches['entities'].clear()
+        return loan, loan.emi_schedule.order_by('due_date').first()
+
+    def test_pin_cookie_sends_reads_to_primary(self):
+        loan, emi = self.loan_on_primary()
+        client = Client()
+
+        # The loan exists only on the primary, so an unpinned read misses it
+        response = client.get('/api/get-balance/', {'loan_id': loan.loan_id})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        response = client.post('/api/make-payment/', {'loan_id': str(loan.loan_id), 'amount': str(emi.amount_due)},
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        caches['entities'].clear()
+        response = client.get('/api/get-balance/', {'loan_id': loan.loan_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['loan_id'], str(loan.loan_id))
+
+    async def test_async_write_sets_pin_cookie(self):
+        loan, emi = await sync_to_async(self.loan_on_primary)()
+        response = await AsyncClient().post(
+            '/api/async/make-payment/', {'loan_id': str(loan.loan_id), 'amount': str(emi.amount_due)},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+class GenerateBillsTests(LoanBookMixin, TestCase):
+    def test_bills_cover_interest_since_last_bill_and_carry_unpaid_dues(self):
+        loans = [self.make_loan(number, amount=str(5000 * number)) for number in (1, 2, 3)]
+        start = date(2025, 1, 1)
+        for offset in range(1, 61):
+            day = start + timedelta(days=offset)
+            billing.accrue_interest(day)
+            self.assertEqual(billing.generate_bills(day), 3 if offset in (30, 60) else 0)
+
+        for loan in loans:
+            first, second = Bill.objects.filter(loan=loan).order_by('billing_date')
+            accrued = {
+                period: sum(DailyInterestAccrual.objects.filter(
+                    loan=loan, accrual_date__range=bounds).values_list('interest_amount', flat=True))
+                for period, bounds in ((1, (start, start + timedelta(days=30))),
+                                       (2, (start + timedelta(days=31), start + timedelta(days=60))))
+            }
+            self.assertEqual(first.interest_accrued, accrued[1])
+            self.assertEqual(first.past_due_amount, 0)
+            self.assertEqual(second.interest_accrued, accrued[2])
+            self.assertEqual(second.past_due_amount, first.total_due_amount)
+            self.assertEqual(second.total_due_amount, second.min_due_amount + first.total_due_amount)
+            loan.refresh_from_db()
+            self.assertEqual(loan.next_billing_date, start + timedelta(days=90))
+        self.assertEqual(LoanLedgerEntry.objects.filter(entry_type='BILL').count(), 6)
+
+
+class LedgerSnapshotTests(LoanBookMixin, TestCase):
+    """A balance built from a snapshot and the entries after it equals a full replay."""
+
+    def test_snapshot_plus_later_entries_equals_full_replay(self):
+        loans = [self.make_loan(number, amount=str(5000 * number)) for number in (1, 2, 3)]
+        start = date(2025, 1, 1)
+        days = [start + timedelta(days=offset) for offset in (0, 10, 20, 30, 45, 60)] + [timezone.localdate()]
+        for offset in range(1, 61):
+            billing.accrue_interest(start + timedelta(days=offset))
+            billing.generate_bills(start + timedelta(days=offset))
+        record_prepayment(loans[0], None)
+        emi = loans[1].emi_schedule.order_by('due_date').first()
+        record_prepayment(loans[1], emi.amount_due + Decimal('1000'))
+
+        def balances():
+            return {(loan.loan_id, day): {key: value for key, value in ledger.balance_as_of(loan.loan_id, day).items()
+                                          if key not in ('snapshot_as_of', 'tail_entries')}
+                    for loan in loans for day in days}
+
+        replayed = balances()
+        self.assertEqual(replayed[loans[0].loan_id, timezone.localdate()]['status'], 'CLOSED')
+
+        self.assertEqual(ledger.take_snapshots(start + timedelta(days=20), chunk_size=2)['snapshots'], 3)
+        self.assertEqual(ledger.take_snapshots(start + timedelta(days=45), chunk_size=2)['snapshots'], 3)
+        self.assertEqual(balances(), replayed)
+
+        latest = ledger.balance_as_of(loans[1].loan_id)
+        self.assertEqual(latest['snapshot_as_of'], start + timedelta(days=45))
+        self.assertLess(latest['tail_entries'], LoanLedgerEntry.objects.filter(loan=loans[1]).count())
+
+
+class PrepaymentTests(LoanBookMixin, TestCase):
+    def unpaid_emis(self, loan):
+        return list(loan.emi_schedule.filter(is_paid=False).order_by('due_date').values_list('due_date', 'amount_due'))
+
+    def test_prepayment_recomputes_remaining_emis_on_new_principal(self):
+        loan = self.make_loan(amount='50000')
+        first_emi, *later = self.unpaid_emis(loan)
+        amount = first_emi[1] + Decimal('10000')
+
+        payment, schedule = record_prepayment(loan, amount)
+
+        loan.refresh_from_db()
+        principal = utils.calculate_principal_after_payment(Decimal('50000'), amount, Decimal('15'))
+        self.assertEqual(loan.principal_balance, principal)
+        self.assertEqual(loan.status, 'ACTIVE')
+        installments = money.emi_schedule(money.to_paise(principal), money.to_basis_points(Decimal('15')), len(later))
+        expected = [(due_date, Decimal(amount_due)) for (due_date, _), amount_due in zip(later, installments)]
+        self.assertEqual(schedule, expected)
+        self.assertEqual(self.unpaid_emis(loan), expected)
+        self.assertLess(sum(amount_due for _, amount_due in expected), sum(amount_due for _, amount_due in later))
+        self.assertTrue(loan.emi_schedule.get(due_date=first_emi[0]).is_paid)
+        self.assertEqual(payment.amount, amount)
+
+    def test_prepayment_of_remaining_principal_closes_loan(self):
+        loan = self.make_loan(amount='50000')
+        amount = foreclosure_amount(loan)
+
+        payment, schedule = record_prepayment(loan, amount)
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.principal_balance, 0)
+        self.assertEqual(loan.status, 'CLOSED')
+        self.assertEqual(schedule, [])
+        self.assertEqual(self.unpaid_emis(loan), [])
+        self.assertEqual(loan.emi_schedule.filter(is_paid=True).count(), 1)
+        with self.assertRaises(LoanRejected):
+            record_prepayment(loan, Decimal('100'))
+
+
+class SweepOverdueBillsTests(LoanBookMixin, TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+
+    def bill(self, loan, days_ago, total_due, status='GENERATED', amount_paid=0):
+        due_date = self.today - timedelta(days=days_ago)
+        return Bill.objects.create(
+            loan=loan, billing_date=due_date - timedelta(days=15), due_date=due_date, principal_due=total_due,
+            interest_accrued=0, min_due_amount=total_due, total_due_amount=total_due,
+            amount_paid=amount_paid, status=status
+        )
+
+    def test_overdue_partial_and_caught_up_loans(self):
+        behind, partial, current = (self.make_loan(number) for number in (1, 2, 3))
+        self.bill(behind, 75, Decimal('200'))
+        self.bill(behind, 45, Decimal('400'))
+        latest = self.bill(behind, 15, Decimal('600'), status='PARTIALLY_PAID', amount_paid=Decimal('50'))
+        self.bill(partial, 40, Decimal('200'), status='PAID', amount_paid=Decimal('200'))
+        self.bill(partial, 10, Decimal('500'), status='PARTIALLY_PAID', amount_paid=Decimal('100'))
+        self.bill(current, -5, Decimal('300'))
+
+        self.assertEqual(tasks.sweep_overdue_bills(), "Marked 4 bills overdue; 2 delinquent loans, 0 cured.")
+        self.assertEqual(Bill.objects.filter(status='OVERDUE').count(), 4)
+        summaries = {summary.loan_id: summary for summary in LoanDelinquency.objects.all()}
+        self.assertEqual(set(summaries), {behind.loan_id, partial.loan_id})
+        self.assertEqual(
+            (summaries[behind.loan_id].overdue_bill_count, summaries[behind.loan_id].overdue_amount,
+             summaries[behind.loan_id].days_past_due, summaries[behind.loan_id].dpd_bucket),
+            (3, Decimal('550'), 75, '61-90')
+        )
+        self.assertEqual(
+            (summaries[partial.loan_id].overdue_bill_count, summaries[partial.loan_id].overdue_amount,
+             summaries[partial.loan_id].days_past_due, summaries[partial.loan_id].dpd_bucket),
+            (1, Decimal('400'), 10, '1-30')
+        )
+
+        # The behind loan pays its latest bill, which carries the earlier ones
+        Bill.objects.filter(pk=latest.pk).update(status='PAID', amount_paid=F('total_due_amount'))
+        self.assertEqual(tasks.sweep_overdue_bills(), "Marked 0 bills overdue; 1 delinquent loans, 1 cured.")
+        self.assertEqual(list(LoanDelinquency.objects.values_list('loan_id', flat=True)), [partial.loan_id])
+
+
+class ReconciliationTests(LoanBookMixin, TransactionTestCase):
+    """Each kind of discrepancy seeded into a consistent book is reported, with one worker or several."""
+
+    def setUp(self):
+        self.loans = [self.make_loan(number, amount=str(5000 * number)) for number in range(1, 8)]
+        for loan in self.loans[:2]:
+            emi = loan.emi_schedule.order_by('due_date').first()
+            record_payment(loan, emi.amount_due, emi)
+        billing.generate_bills(date(2025, 1, 31))
+
+    def reconcile(self, workers):
+        # Forked workers would write to their own copy of the in-memory test
+        # database, so the ranges run one at a time on a thread, which shares
+        # it; concurrent writers on its shared cache fail with "table is locked"
+        with mock.patch('loans.reconciliation.ProcessPoolExecutor',
+                        lambda max_workers, mp_context: ThreadPoolExecutor(1)):
+            run = reconciliation.reconcile(workers=workers, chunk_size=2)
+        found = set(run.discrepancies.values_list('loan_id', 'kind', 'reference'))
+        self.assertEqual((run.status, run.loans_checked, run.discrepancy_count),
+                         ('COMPLETED', len(self.loans), len(found)))
+        return found
+
+    def test_each_kind_of_discrepancy_is_reported(self):
+        self.assertEqual(self.reconcile(workers=1), set())
+
+        principal, status, emis, bills_paid, bill_status, paid, clean = self.loans
+        Loan.objects.filter(pk=principal.pk).update(principal_balance=F('principal_balance') + 1)
+        Loan.objects.filter(pk=status.pk).update(status='CLOSED')
+        EMISchedule.objects.filter(pk=emis.emi_schedule.order_by('due_date').first().pk).update(is_paid=True)
+        Bill.objects.filter(loan=bills_paid).update(amount_paid=Decimal('1.00'))
+        bill = Bill.objects.get(loan=bill_status)
+        Bill.objects.filter(pk=bill.pk).update(status='PAID')
+        Loan.objects.filter(pk=paid.pk).update(principal_balance=principal.loan_amount)
+        expected = {
+            (principal.loan_id, 'PRINCIPAL', ''),
+            (status.loan_id, 'LOAN_STATUS', ''),
+            (emis.loan_id, 'EMIS_PAID', ''),
+            (bills_paid.loan_id, 'BILLS_PAID', ''),
+            (bill_status.loan_id, 'BILL_STATUS', str(bill.bill_id)),
+            (paid.loan_id, 'PRINCIPAL', ''),
+        }
+
+        self.assertEqual(self.reconcile(workers=1), expected)
+        self.assertEqual(self.reconcile(workers=3), expected)
+
+
+class EntityCacheInvalidationTests(LoanBookMixin, TestCase):
+    def setUp(self):
+        self.loan = self.make_loan()
+        caches['entities'].clear()
+        entity_cache.reset_stats()
+        self.addCleanup(entity_cache.reset_stats)
+
+    def test_commit_evicts_stale_user_and_loan(self):
+        user = entity_cache.get_user(self.loan.user_id)
+        loan = entity_cache.get_loan(self.loan.loan_id)
+        emi = loan.emi_schedule.order_by('due_date').first()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.credit_score = 810
+            user.save(update_fields=['credit_score'])
+            entity_cache.invalidate_user(user.unique_user_id)
+            record_payment(loan, emi.amount_due, emi)
+        self.assertEqual(len(callbacks), 2)
+
+        self.assertEqual(entity_cache.get_user(self.loan.user_id).credit_score, 810)
+        self.assertLess(entity_cache.get_loan(self.loan.loan_id).principal_balance, self.loan.principal_balance)
+        self.assertEqual(entity_cache.stats()['loan']['misses'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            billing.generate_bills(self.loan.next_billing_date)
+        self.assertEqual(entity_cache.get_loan(self.loan.loan_id).next_billing_date,
+                         self.loan.next_billing_date + timedelta(days=Loan.BILLING_CYCLE_DAYS))
+
+    def test_rollback_keeps_entries(self):
+        loan = entity_cache.get_loan(self.loan.loan_id)
+        emi = loan.emi_schedule.order_by('due_date').first()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                record_payment(loan, emi.amount_due, emi)
+                raise RuntimeError('roll back')
+        self.assertEqual(callbacks, [])
+
+        cached = entity_cache.get_loan(self.loan.loan_id)
+        self.assertEqual(entity_cache.stats()['loan'], {"hits": 1, "misses": 1, "invalidations": 1, "hit_rate": 0.5})
+        self.assertEqual(cached.principal_balance, Loan.objects.get(pk=self.loan.pk).principal_balance)
+
+
+class StatementETagTests(LoanBookMixin, TestCase):
+    def setUp(self):
+        self.loan = self.make_loan()
+        caches['entities'].clear()
+
+    def get_statement(self, **headers):
+        return self.client.get('/api/get-statement/', {'loan_id': self.loan.loan_id}, **headers)
+
+    def test_matching_if_none_match_returns_304_without_body(self):
+        response = self.get_statement()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.get_statement(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_payment_changes_etag(self):
+        etag = self.get_statement()['ETag']
+        emi = self.loan.emi_schedule.order_by('due_date').first()
+        response = self.client.post('/api/make-payment/', {'loan_id': str(self.loan.loan_id),
+                                                           'amount': str(emi.amount_due)},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        caches['entities'].clear()
+        response = self.get_statement(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['past_transactions']), 1)
+
+    def test_bill_changes_etag(self):
+        etag = self.get_statement()['ETag']
+        self.assertEqual(billing.generate_bills(date(2025, 1, 31)), 1)
+
+        response = self.get_statement(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """Every endpoint and task stays within its budget in ``query_budgets.py``."""
+
+    def test_budgets(self):
+        with query_budgets.scratch_transactions():
+            for budget in query_budgets.BUDGETS:
+                for result in query_budgets.check(budget):
+                    with self.subTest(budget=budget.name, size=result['size']):
+                        self.assertTrue(result['diff'] is None, (
+                            f"{result['queries']} queries (max {result['max_queries']}), "
+                            f"{result['rows']} rows (max {result['max_rows']})\n{result['diff'] or result['lines']}"
+                        ))
+
+
+class PortfolioSummaryTests(TestCase):
+    def test_reads_only_the_days_in_the_report(self):
+        today = date(2025, 6, 15)
+        PortfolioMetric.objects.bulk_create([
+            PortfolioMetric(metric=metric, key=(today - timedelta(days=offset)).isoformat(), count=1, amount=10)
+            for metric in (analytics.PAYMENTS_BY_DAY, analytics.INTEREST_BY_DAY) for offset in range(730)
+        ] + [PortfolioMetric(metric=analytics.LOANS_BY_STATUS, key='ACTIVE', count=2, amount=900)])
+
+        log = QueryLog()
+        with log.capture():
+            report = analytics.portfolio_summary(today, days=30)
+        self.assertEqual(len(log.queries), 1)
+        self.assertEqual(log.rows, 30 + 15 + 1)
+        self.assertEqual([day['date'] for day in report['payments_per_day']],
+                         [(today - timedelta(days=offset)).isoformat() for offset in range(29, -1, -1)])
+        self.assertEqual(report['interest_accrued_mtd'], 150)
+        self.assertEqual(report['outstanding_principal'], 900)
+
+
+class WorkerImportTests(SimpleTestCase):
+    def test_tasks_module_does_not_load_numpy(self):
+        # Celery workers import the tasks; NumPy should load only once a job needs it
+        script = "import sys, django; django.setup(); import loans.tasks; print('numpy' in sys.modules)"
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'creditservice.settings'}
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                cwd=settings.BASE_DIR, env=env)
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr)
+
+
+def random_money_case(rng):
+    """A random loan, balance, payment and accrued interest, as the models hold them."""
+    def rupees(low, high, whole=False):
+        paise = rng.randint(low * 100, high * 100)
+        return money.from_paise(paise - paise % 100 if whole else paise)
+
+    return {
+        'loan_amount': rupees(1000, 5000000, whole=rng.random() < 0.5),
+        'interest_rate': Decimal(rng.choice([rng.randint(1, 9999), rng.randint(1, 40) * 100])).scaleb(-2),
+        'term_period': rng.randint(1, 33),
+        'principal': rupees(0, 5000000),
+        'payment': rupees(1, 200000, whole=True),
+        'interest_accrued': rupees(0, 50000),
+    }
+
+
+class MoneyTests(SimpleTestCase):
+    """The Decimal helpers agree exactly with the integer-paise rules in money.py."""
+
+    CASES = 5000
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.cases = [random_money_case(rng) for _ in range(self.CASES)]
+
+    def test_emi_schedule_matches_decimal_schedule(self):
+        for case in self.cases:
+            loan_amount, rate, term = case['loan_amount'], case['interest_rate'], case['term_period']
+            expected, remaining = [], loan_amount
+            for month in range(1, term + 1):
+                interest = (remaining * rate / 100) / 12
+                if month == term:
+                    expected.append(round(remaining + interest))
+                else:
+                    expected.append(round(loan_amount * Decimal('0.03') + interest))
+                    remaining -= loan_amount * Decimal('0.03')
+            self.assertEqual(
+                money.emi_schedule(money.to_paise(loan_amount), money.to_basis_points(rate), term), expected, case
+            )
+
+    def test_daily_interest(self):
+        for case in self.cases:
+            principal, rate = case['principal'], case['interest_rate']
+            expected = money.daily_interest(money.to_paise(principal), money.to_basis_points(rate))
+            self.assertEqual(money.to_paise(utils.calculate_daily_interest(principal, rate)), expected, case)
+            loan = Loan(principal_balance=principal, interest_rate=rate)
+            self.assertEqual(money.to_paise(loan.calculate_daily_interest()), expected, case)
+            self.assertEqual(loan.calculate_daily_interest_rate(),
+                             Decimal(money.daily_rate_millipercent(money.to_basis_points(rate))).scaleb(-3))
+
+    def test_minimum_due(self):
+        for case in self.cases:
+            principal, accrued = case['principal'], case['interest_accrued']
+            self.assertEqual(
+                money.to_paise(utils.calculate_minimum_due(principal, accrued)),
+                money.minimum_due(money.to_paise(principal), money.to_paise(accrued)), case
+            )
+
+    def test_principal_after_payment(self):
+        principals, payments, rates = [], [], []
+        for case in self.cases:
+            principal, payment, rate = case['principal'], case['payment'], case['interest_rate']
+            expected = money.principal_after_payment(
+                money.to_paise(principal), money.to_paise(payment), money.to_basis_points(rate)
+            )
+            actual = utils.calculate_principal_after_payment(principal, payment, rate)
+            self.assertEqual(money.to_paise(actual), expected, case)
+            self.assertEqual(str(actual), str(money.from_paise(expected)), case)
+            principals.append(money.to_paise(principal))
+            payments.append(money.to_paise(payment))
+            rates.append(money.to_basis_points(rate))
+        self.assertEqual(
+            money.principal_after_payment_array(principals, payments, rates).tolist(),
+            [money.principal_after_payment(*values) for values in zip(principals, payments, rates)]
+        )
+
+    def test_payment_split_and_foreclosure(self):
+        for case in self.cases:
+            payment, loan_amount, rate = case['payment'], case['loan_amount'], case['interest_rate']
+            principal, interest = utils.calculate_payment_split(payment, loan_amount, rate)
+            self.assertEqual((money.to_paise(principal), money.to_paise(interest)), money.payment_split(
+                money.to_paise(payment), money.to_paise(loan_amount), money.to_basis_points(rate)
+            ), case)
+            balance = case['principal']
+            self.assertEqual(
+                money.to_paise(balance + utils.calculate_monthly_interest(balance, rate)),
+                money.foreclosure_amount(money.to_paise(balance), money.to_basis_points(rate)), case
+            )
@@ -0,0 +1,180 @@
+"""
+Columnar cache of the transactions CSV.
+
+Parsing ``transactions.csv`` with pandas on every scoring call dominates
+registration latency. The cache converts it once into NumPy arrays sorted by
+Aadhar ID and stores them as ``.npy`` files that are memory-mapped on load:
+
+    ids.npy      unique Aadhar IDs, sorted (int64)
+    offsets.npy  start of each ID's rows in the arrays below, plus the end (int64)
+    amount.npy   transaction amount (float64)
+    kind.npy     1 for CREDIT, -1 for DEBIT, 0 for anything else (int8)
+    date.npy     transaction date (datetime64[D])
+
+Looking up a user is a binary search over ``ids`` followed by a sum over a
+zero-copy slice. Each build lives in a directory named after the size and
+modification time of the CSV, so editing the CSV makes the next lookup
+rebuild, and readers never see a half-written cache.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.conf import settings
+
+KIND_CREDIT = 1
+KIND_DEBIT = -1
+
+COLUMNS = ('ids', 'offsets', 'amount', 'kind', 'date')
+
+_index = None
+
+
+class TransactionsIndex:
+    """Memory-mapped transactions grouped by Aadhar ID."""
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        for column in COLUMNS:
+            setattr(self, column, np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.amount)
+
+    def user_slice(self, aadhar_id):
+        """Return the row range of a user's transactions, or None if there are none."""
+        try:
+            key = int(aadhar_id)
+        except (TypeError, ValueError):
+            return None
+        position = np.searchsorted(self.ids, key)
+        if position == len(self.ids) or self.ids[position] != key:
+            return None
+        return slice(int(self.offsets[position]), int(self.offsets[position + 1]))
+
+    def credits_and_debits(self, aadhar_id):
+        """
+        Sum a user's credits and debits.
+
+        Returns:
+            Tuple of (credits, debits), or None if the user has no transactions
+        """
+        rows = self.user_slice(aadhar_id)
+        if rows is None:
+            return None
+        amount = self.amount[rows]
+        kind = self.kind[rows]
+        return (
+            float(amount[kind == KIND_CREDIT].sum()),
+            float(amount[kind == KIND_DEBIT].sum()),
+        )
+
+    def totals(self):
+        """
+        Sum credits and debits for every user in one pass.
+
+        Returns:
+            Tuple of (ids, credits, debits) arrays aligned by position
+        """
+        if len(self.ids) == 0:
+            return np.asarray(self.ids), np.zeros(0), np.zeros(0)
+        starts = self.offsets[:-1]
+        credits = np.add.reduceat(np.where(self.kind == KIND_CREDIT, self.amount, 0.0), starts)
+        debits = np.add.reduceat(np.where(self.kind == KIND_DEBIT, self.amount, 0.0), starts)
+        return np.asarray(self.ids), credits, debits
+
+
+def source_signature(csv_path):
+    """Identify a version of the CSV by its size and modification time."""
+    stat = os.stat(csv_path)
+    return f'{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def build_cache(csv_path=None, cache_dir=None):
+    """
+    Convert the transactions CSV into the columnar cache.
+
+    Returns:
+        Path of the directory holding the new cache
+    """
+    import pandas as pd
+
+    csv_path = csv_path or settings.TRANSACTIONS_CSV_PATH
+    cache_dir = cache_dir or settings.TRANSACTIONS_CACHE_DIR
+    signature = source_signature(csv_path)
+    target = os.path.join(cache_dir, signature)
+    if os.path.exists(os.path.join(target, 'meta.json')):
+        return target
+
+    source = csv_path
+    with open(csv_path, 'rb') as feed:
+        size = feed.seek(0, os.SEEK_END)
+        if size:
+            feed.seek(size - 1)
+            if feed.read(1) != b'\n':
+                # The feed is being appended to; leave out the unfinished last line
+                feed.seek(0)
+                data = feed.read()
+                source = io.BytesIO(data[:data.rfind(b'\n') + 1])
+
+    df = pd.read_csv(
+        source,
+        usecols=['AADHARID', 'Date', 'Amount', 'Transaction_type'],
+        dtype={'AADHARID': 'int64', 'Amount': 'float64', 'Transaction_type': 'str'},
+    )
+    df = df.sort_values('AADHARID', kind='mergesort')
+
+    ids, starts = np.unique(df['AADHARID'].to_numpy(), return_index=True)
+    kind = np.zeros(len(df), dtype=np.int8)
+    kind[(df['Transaction_type'] == 'CREDIT').to_numpy()] = KIND_CREDIT
+    kind[(df['Transaction_type'] == 'DEBIT').to_numpy()] = KIND_DEBIT
+    columns = {
+        'ids': ids.astype(np.int64),
+        'offsets': np.append(starts, len(df)).astype(np.int64),
+        'amount': df['Amount'].to_numpy(dtype=np.float64),
+        'kind': kind,
+        'date': pd.to_datetime(df['Date']).to_numpy().astype('datetime64[D]'),
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.build-', dir=cache_dir)
+    for column, values in columns.items():
+        np.save(os.path.join(staging, f'{column}.npy'), values)
+    with open(os.path.join(staging, 'meta.json'), 'w') as meta:
+        json.dump({'source': csv_path, 'signature': signature, 'rows': len(df), 'users': len(ids)}, meta)
+
+    os.chmod(staging, 0o755)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another process finished the same build first.
+        shutil.rmtree(staging, ignore_errors=True)
+
+    for entry in os.listdir(cache_dir):
+        if entry != signature and not entry.startswith('.build-'):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+    return target
+
+
+def get_index():
+    """
+    Return the transactions index, rebuilding it if the CSV has changed.
+
+    Returns:
+        TransactionsIndex, or None if the transactions CSV doesn't exist
+    """
+    global _index
+
+    csv_path = settings.TRANSACTIONS_CSV_PATH
+    if not os.path.exists(csv_path):
+        return None
+
+    signature = source_signature(csv_path)
+    if _index is None or _index.signature != signature:
+        _index = TransactionsIndex(build_cache(csv_path), signature)
+    return _index
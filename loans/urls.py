@@ -4,13 +4,20 @@ URL configuration for loans application.
 
 from django.urls import path
 from .views import (
-    RegisterUserView, ApplyLoanView,
-    MakePaymentView, GetStatementView
+    RegisterUserView, BulkRegisterUsersView, ApplyLoanView,
+    MakePaymentView, PrepayLoanView, ForecloseLoanView,
+    GetStatementView, GetBalanceView, PortfolioView, CacheStatsView
 )
 
 urlpatterns = [
     path('register-user/', RegisterUserView.as_view(), name='register-user'),
+    path('register-users/', BulkRegisterUsersView.as_view(), name='register-users'),
     path('apply-loan/', ApplyLoanView.as_view(), name='apply-loan'),
     path('make-payment/', MakePaymentView.as_view(), name='make-payment'),
+    path('prepay-loan/', PrepayLoanView.as_view(), name='prepay-loan'),
+    path('foreclose-loan/', ForecloseLoanView.as_view(), name='foreclose-loan'),
     path('get-statement/', GetStatementView.as_view(), name='get-statement'),
+    path('get-balance/', GetBalanceView.as_view(), name='get-balance'),
+    path('portfolio/', PortfolioView.as_view(), name='portfolio'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
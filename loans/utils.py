@@ -2,9 +2,13 @@
 Utility functions for the loans application.
 """
 
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_EVEN
 from datetime import datetime, timedelta
 
+# Amounts are stored to the paisa, half to even (see money.py)
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
 
 def calculate_emi(principal, rate, time):
     """
@@ -43,8 +47,7 @@ def calculate_minimum_due(principal, interest_accrued):
     Returns:
         Minimum due amount
     """
-    principal_portion = principal * Decimal('0.03')  # 3% of principal
-    return principal_portion + interest_accrued
+    return (principal * Decimal('0.03') + interest_accrued).quantize(CENT, rounding=ROUND_HALF_EVEN)
 
 
 def calculate_daily_interest(principal, annual_rate):
@@ -56,10 +59,62 @@ def calculate_daily_interest(principal, annual_rate):
         annual_rate: Annual interest rate in percentage
     
     Returns:
-        Daily interest amount
+        Daily interest amount, rounded to the paisa
     """
-    daily_rate = round(Decimal(annual_rate) / Decimal('365'), 3)
-    return principal * (daily_rate / 100)
+    daily_rate = round(Decimal(annual_rate) / 365, 3)
+    return (principal * daily_rate / 100).quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def calculate_monthly_interest(principal, annual_rate):
+    """
+    Calculate a month of interest.
+    
+    Args:
+        principal: Principal the interest is charged on
+        annual_rate: Annual interest rate in percentage
+    
+    Returns:
+        Monthly interest amount, rounded to the paisa
+    """
+    return (principal * annual_rate / 1200).quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def calculate_principal_after_payment(principal, amount, annual_rate):
+    """
+    Calculate the principal left after a payment.
+    
+    The payment first covers a month of interest on the current principal;
+    the rest reduces principal, which never goes below zero.
+    
+    Args:
+        principal: Current principal balance
+        amount: Payment amount
+        annual_rate: Annual interest rate in percentage
+    
+    Returns:
+        Remaining principal, rounded to the paisa
+    """
+    # One division, so the result is rounded once
+    remaining = ((principal * (1200 + annual_rate) - amount * 1200) / 1200).quantize(CENT, rounding=ROUND_HALF_EVEN)
+    return max(ZERO, remaining)
+
+
+def calculate_payment_split(amount, loan_amount, annual_rate):
+    """
+    Split a payment into principal and interest for a statement.
+    
+    Interest is a month at the loan's rate on the original loan amount.
+    
+    Args:
+        amount: Payment amount
+        loan_amount: Original loan amount
+        annual_rate: Annual interest rate in percentage
+    
+    Returns:
+        Tuple of (principal, interest), each rounded to the paisa
+    """
+    principal = ((amount * 1200 - loan_amount * annual_rate) / 1200).quantize(CENT, rounding=ROUND_HALF_EVEN)
+    return principal, calculate_monthly_interest(loan_amount, annual_rate)
 
 
 def calculate_credit_score_from_balance(balance):
@@ -70,16 +125,43 @@ def calculate_credit_score_from_balance(balance):
         balance: Account balance in rupees
     
     Returns:
-        Credit score between 300 and 900
-    """
-    if balance >= 1000000:  # Rs. 10,00,000
-        return 900
-    elif balance <= 100000:  # Rs. 1,00,000
-        return 300
-    else:
-        # Score adjusts by 10 points for every Rs. 15,000 change in balance
-        excess_balance = balance - 100000
-        credit_score = 300 + (excess_balance // 15000) * 10
-        
-        # Cap at 900
-        return min(900, credit_score)
+        Credit score from the configured score model, see ``scoring.py``
+    """
+    from .scoring import get_model
+
+    return get_model().score(balance)
+
+
+def days_past_due_bucket(days_past_due):
+    """
+    Place a days-past-due count in its collections bucket.
+    
+    Args:
+        days_past_due: Days since the oldest unpaid bill fell due
+    
+    Returns:
+        One of '1-30', '31-60', '61-90' or '90+'
+    """
+    if days_past_due <= 30:
+        return '1-30'
+    elif days_past_due <= 60:
+        return '31-60'
+    elif days_past_due <= 90:
+        return '61-90'
+    return '90+'
+
+
+def credit_score_band(credit_score):
+    """
+    Place a credit score in its 100-point reporting band.
+    
+    Args:
+        credit_score: Credit score between 300 and 900, or None
+    
+    Returns:
+        Band label such as '600-699', or 'UNSCORED'
+    """
+    if credit_score is None:
+        return 'UNSCORED'
+    floor = min(max(credit_score, 300), 800) // 100 * 100
+    return f"{floor}-{floor + 99}" if floor < 800 else "800-900"
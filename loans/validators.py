@@ -0,0 +1,397 @@
+"""
+Lightweight request validation for the API views.
+
+The schemas here accept the same input as the DRF serializers in
+``serializers.py`` and report the same errors, message for message and in
+the same order, but skip building a serializer and its fields on every
+request. Fields are plain slotted objects created once at import, and each
+schema precompiles its list of (field name, required, parser, check) steps.
+
+``Schema.validate(data)`` returns ``(validated_data, errors)``; ``errors`` is
+a dict of field name to messages, empty when the data is valid, in the shape
+``serializer.errors`` has.
+"""
+
+import datetime
+import decimal
+import re
+import uuid
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import EmailValidator
+from django.utils.dateparse import parse_date
+from django.utils.encoding import smart_str
+from rest_framework.settings import ISO_8601, api_settings
+from rest_framework.utils import html, humanize_datetime
+
+from .models import Loan
+
+EMPTY = object()  # A field missing from the input
+
+REQUIRED = 'This field is required.'
+NULL = 'This field may not be null.'
+
+
+class Invalid(Exception):
+    """Raised by a field or a check with the field's error messages."""
+
+    def __init__(self, *messages):
+        super().__init__(*messages)
+        self.messages = list(messages)
+
+
+class Field:
+    """A required, non-null input field."""
+
+    __slots__ = ('name', 'required')
+
+    def __init__(self, name, required=True):
+        self.name = name
+        self.required = required
+
+    def run(self, value):
+        """Validate an input value and return it converted."""
+        if value is EMPTY:
+            raise Invalid(REQUIRED)
+        if value is None:
+            raise Invalid(NULL)
+        return self.parse(value)
+
+    def parse(self, value):
+        raise NotImplementedError
+
+
+class CharField(Field):
+    """A string, trimmed of surrounding whitespace."""
+
+    __slots__ = ('max_length', 'max_length_message')
+
+    def __init__(self, name, max_length=None):
+        super().__init__(name)
+        self.max_length = max_length
+        self.max_length_message = f'Ensure this field has no more than {max_length} characters.'
+
+    def run(self, value):
+        if value == '' or (value is not EMPTY and str(value).strip() == ''):
+            raise Invalid('This field may not be blank.')
+        return super().run(value)
+
+    def parse(self, value):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise Invalid('Not a valid string.')
+        value = str(value).strip()
+        errors = self.check_value(value)
+        if errors:
+            raise Invalid(*errors)
+        return value
+
+    def check_value(self, value):
+        """Collect the messages of every validator the value fails."""
+        errors = []
+        if self.max_length is not None and len(value) > self.max_length:
+            errors.append(self.max_length_message)
+        if '\x00' in value:
+            errors.append('Null characters are not allowed.')
+        for character in value:
+            if 0xD800 <= ord(character) <= 0xDFFF:
+                errors.append(f'Surrogate characters are not allowed: U+{ord(character):X}.')
+                break
+        return errors
+
+
+class EmailField(CharField):
+    """A string that is a valid email address."""
+
+    __slots__ = ()
+
+    email_validator = EmailValidator()
+
+    def check_value(self, value):
+        errors = super().check_value(value)
+        try:
+            self.email_validator(value)
+        except DjangoValidationError:
+            errors.append('Enter a valid email address.')
+        return errors
+
+
+class IntegerField(Field):
+    """An integer; strings like '12' and '12.0' are accepted."""
+
+    __slots__ = ()
+
+    MAX_STRING_LENGTH = 1000
+    re_decimal = re.compile(r'\.0*\s*$')
+
+    def parse(self, value):
+        if isinstance(value, str) and len(value) > self.MAX_STRING_LENGTH:
+            raise Invalid('String value too large.')
+        try:
+            return int(self.re_decimal.sub('', str(value)))
+        except (ValueError, TypeError):
+            raise Invalid('A valid integer is required.')
+
+
+class DecimalField(Field):
+    """A finite decimal with limited digits, quantized to its decimal places."""
+
+    __slots__ = ('max_digits', 'decimal_places', 'max_whole_digits', 'exponent', 'context')
+
+    MAX_STRING_LENGTH = 1000
+
+    def __init__(self, name, max_digits, decimal_places):
+        super().__init__(name)
+        self.max_digits = max_digits
+        self.decimal_places = decimal_places
+        self.max_whole_digits = max_digits - decimal_places
+        self.exponent = decimal.Decimal('.1') ** decimal_places
+        self.context = decimal.Context(prec=max_digits)
+
+    def parse(self, value):
+        value = smart_str(value).strip()
+        if len(value) > self.MAX_STRING_LENGTH:
+            raise Invalid('String value too large.')
+        try:
+            value = decimal.Decimal(value)
+        except decimal.DecimalException:
+            raise Invalid('A valid number is required.')
+        if not value.is_finite():
+            raise Invalid('A valid number is required.')
+
+        _, digits, exponent = value.as_tuple()
+        if exponent >= 0:
+            total_digits = whole_digits = len(digits) + exponent
+            decimal_places = 0
+        elif len(digits) > -exponent:
+            total_digits = len(digits)
+            whole_digits = total_digits + exponent
+            decimal_places = -exponent
+        else:
+            total_digits = decimal_places = -exponent
+            whole_digits = 0
+
+        if total_digits > self.max_digits:
+            raise Invalid(f'Ensure that there are no more than {self.max_digits} digits in total.')
+        if decimal_places > self.decimal_places:
+            raise Invalid(f'Ensure that there are no more than {self.decimal_places} decimal places.')
+        if whole_digits > self.max_whole_digits:
+            raise Invalid(f'Ensure that there are no more than {self.max_whole_digits} digits before the decimal point.')
+
+        return value.quantize(self.exponent, context=self.context)
+
+
+class UUIDField(Field):
+    """A UUID in any form ``uuid.UUID`` accepts, or an integer."""
+
+    __slots__ = ()
+
+    def parse(self, value):
+        if isinstance(value, uuid.UUID):
+            return value
+        try:
+            if isinstance(value, int):
+                return uuid.UUID(int=value)
+            if isinstance(value, str):
+                return uuid.UUID(hex=value)
+        except ValueError:
+            pass
+        raise Invalid('Must be a valid UUID.')
+
+
+class DateField(Field):
+    """A date in one of DRF's DATE_INPUT_FORMATS."""
+
+    __slots__ = ()
+
+    def parse(self, value):
+        if isinstance(value, datetime.datetime):
+            raise Invalid('Expected a date but got a datetime.')
+        if isinstance(value, datetime.date):
+            return value
+
+        for input_format in api_settings.DATE_INPUT_FORMATS:
+            if input_format.lower() == ISO_8601:
+                try:
+                    parsed = parse_date(value)
+                except (ValueError, TypeError):
+                    continue
+                if parsed is not None:
+                    return parsed
+            else:
+                try:
+                    return datetime.datetime.strptime(value, input_format).date()
+                except (ValueError, TypeError):
+                    continue
+
+        formats = humanize_datetime.date_formats(api_settings.DATE_INPUT_FORMATS)
+        raise Invalid(f'Date has wrong format. Use one of these formats instead: {formats}.')
+
+
+class Schema:
+    """
+    Base class for request schemas.
+
+    Subclasses list their ``fields`` in order and may define a
+    ``validate_<field name>`` static method, which runs once the field is
+    valid, may convert the value, and raises ``Invalid`` to reject it.
+    """
+
+    fields = ()
+    steps = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.steps = tuple(
+            (field.name, field.required, field.run, getattr(cls, f'validate_{field.name}', None))
+            for field in cls.fields
+        )
+
+    @classmethod
+    def validate(cls, data):
+        """
+        Validate request data, a dict or a QueryDict.
+
+        Returns:
+            Tuple of (validated data, errors)
+        """
+        if data is None:
+            return {}, {api_settings.NON_FIELD_ERRORS_KEY: ['No data provided']}
+        if not isinstance(data, Mapping):
+            return {}, {api_settings.NON_FIELD_ERRORS_KEY: [
+                f'Invalid data. Expected a dictionary, but got {type(data).__name__}.'
+            ]}
+
+        # Like DRF, a blank optional field in form or query data counts as missing
+        form_data = html.is_html_input(data)
+        validated = {}
+        errors = {}
+        for name, required, run, check in cls.steps:
+            if not required and (name not in data or (form_data and data[name] == '')):
+                continue
+            try:
+                value = run(data[name] if name in data else EMPTY)
+                if check is not None:
+                    value = check(value)
+            except Invalid as exc:
+                errors[name] = exc.messages
+            else:
+                validated[name] = value
+
+        if errors:
+            return {}, errors
+        return validated, errors
+
+
+class RegisterUserSchema(Schema):
+    """Schema for user registration."""
+
+    fields = (
+        CharField('aadhar_id', max_length=12),
+        CharField('name', max_length=255),
+        EmailField('email_id'),
+        DecimalField('annual_income', max_digits=12, decimal_places=2),
+    )
+
+    @staticmethod
+    def validate_aadhar_id(value):
+        """Validate aadhar_id format."""
+        if not value.isdigit() or len(value) != 12:
+            raise Invalid("Aadhar ID must be a 12-digit number.")
+        return value
+
+    @staticmethod
+    def validate_annual_income(value):
+        """Validate annual_income is positive."""
+        if value <= 0:
+            raise Invalid("Annual income must be positive.")
+        return value
+
+
+class LoanApplicationSchema(Schema):
+    """Schema for loan application."""
+
+    fields = (
+        UUIDField('unique_user_id'),
+        CharField('loan_type', max_length=20),
+        DecimalField('loan_amount', max_digits=10, decimal_places=2),
+        DecimalField('interest_rate', max_digits=5, decimal_places=2),
+        IntegerField('term_period'),
+        DateField('disbursement_date'),
+    )
+
+    valid_loan_types = [choice[0] for choice in Loan.LOAN_TYPE_CHOICES]
+
+    @staticmethod
+    def validate_loan_type(value):
+        """Validate loan_type is a valid type."""
+        valid_types = LoanApplicationSchema.valid_loan_types
+        if value not in valid_types and value != "Credit Card Loan":
+            raise Invalid(f"Loan type must be one of: {', '.join(valid_types)}")
+        if value == "Credit Card Loan":
+            return "CREDIT_CARD"
+        return value
+
+    @staticmethod
+    def validate_loan_amount(value):
+        """Validate loan_amount is positive and within limits."""
+        if value <= 0:
+            raise Invalid("Loan amount must be positive.")
+        if value > 5000:
+            raise Invalid("Loan amount cannot exceed Rs. 5000.")
+        return value
+
+    @staticmethod
+    def validate_interest_rate(value):
+        """Validate interest_rate is within acceptable range."""
+        if value < 12:
+            raise Invalid("Interest rate must be at least 12%.")
+        return value
+
+    @staticmethod
+    def validate_term_period(value):
+        """Validate term_period is positive."""
+        if value <= 0:
+            raise Invalid("Term period must be positive.")
+        return value
+
+
+class PaymentSchema(Schema):
+    """Schema for payment processing."""
+
+    fields = (
+        UUIDField('loan_id'),
+        DecimalField('amount', max_digits=10, decimal_places=2),
+    )
+
+    @staticmethod
+    def validate_amount(value):
+        """Validate amount is positive."""
+        if value <= 0:
+            raise Invalid("Payment amount must be positive.")
+        return value
+
+
+class ForeclosureSchema(Schema):
+    """Schema for loan foreclosure."""
+
+    fields = (
+        UUIDField('loan_id'),
+    )
+
+
+class StatementSchema(Schema):
+    """Schema for loan statement."""
+
+    fields = (
+        UUIDField('loan_id'),
+    )
+
+
+class BalanceSchema(Schema):
+    """Schema for a loan balance from the ledger."""
+
+    fields = (
+        UUIDField('loan_id'),
+        DateField('as_of', required=False),
+    )
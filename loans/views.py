@@ -2,26 +2,29 @@
 Views for the loans application.
 """
 
-import uuid
-from decimal import Decimal
-from datetime import datetime, timedelta
-from django.db import transaction
-from django.utils import timezone
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404, render
-from django.http import JsonResponse
-
-from .models import User, Loan, Payment, Bill, EMISchedule
-from .serializers import (
-    RegisterUserSerializer, LoanApplicationSerializer, 
-    PaymentSerializer, StatementSerializer,
-    EMIDateAmountSerializer, PastTransactionSerializer,
-    UpcomingTransactionSerializer
+from django.shortcuts import render
+from django.http import Http404, JsonResponse
+from django.conf import settings
+from django.utils import timezone
+
+from creditservice.routers import use_read_replica
+
+from .models import User, Loan, Payment, EMISchedule
+from .validators import (
+    RegisterUserSchema, LoanApplicationSchema,
+    PaymentSchema, ForeclosureSchema, StatementSchema, BalanceSchema
+)
+from . import entity_cache, ledger, onboarding, payment_queue, statement_versions
+from .analytics import portfolio_summary
+from .renderers import FastJSONResponseMixin
+from .services import (
+    validation_error_message, score_from_transactions,
+    check_loan_eligibility, create_loan, check_payment, record_payment,
+    record_prepayment, statement_transactions
 )
-# Import utility functions directly
-from .utils import calculate_credit_score_from_balance
 
 
 def index(request):
@@ -47,6 +50,16 @@ def index(request):
                     "method": "POST",
                     "description": "Make a payment for a loan"
                 },
+                {
+                    "path": "/api/prepay-loan/",
+                    "method": "POST",
+                    "description": "Prepay part of a loan and recompute its EMIs"
+                },
+                {
+                    "path": "/api/foreclose-loan/",
+                    "method": "POST",
+                    "description": "Pay a loan off in full"
+                },
                 {
                     "path": "/api/get-statement/",
                     "method": "GET",
@@ -71,19 +84,15 @@ class RegisterUserView(APIView):
     """
     
     def post(self, request):
-        serializer = RegisterUserSerializer(data=request.data)
-        if not serializer.is_valid():
-            # Convert validation errors to a simple string message
-            error_message = ""
-            for field, errors in serializer.errors.items():
-                error_message += f"{field}: {' '.join(errors)} "
-            return Response({"error": error_message.strip()}, status=status.HTTP_400_BAD_REQUEST)
+        data, errors = RegisterUserSchema.validate(request.data)
+        if errors:
+            return Response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Extract validated data
-        aadhar_id = serializer.validated_data.get('aadhar_id')
-        name = serializer.validated_data.get('name')
-        email = serializer.validated_data.get('email_id')
-        annual_income = serializer.validated_data.get('annual_income')
+        aadhar_id = data.get('aadhar_id')
+        name = data.get('name')
+        email = data.get('email_id')
+        annual_income = data.get('annual_income')
         
         # Check if user with the same Aadhar ID already exists
         if User.objects.filter(aadhar_id=aadhar_id).exists():
@@ -103,63 +112,8 @@ class RegisterUserView(APIView):
         
         # Calculate credit score synchronously
         try:
-            import pandas as pd
-            import os
-            from django.conf import settings
-            
-            # Read the transactions CSV file
-            csv_path = settings.TRANSACTIONS_CSV_PATH
-            if not os.path.exists(csv_path):
-                user.credit_score = 300  # Default minimum score if CSV doesn't exist
-                user.save()
-            else:
-                df = pd.read_csv(csv_path)
-                
-                # Filter transactions for the specific user
-                user_transactions = df[df['AADHARID'] == aadhar_id]
-                
-                if user_transactions.empty:
-                    user.credit_score = 300  # Default minimum score if no transactions
-                else:
-                    # Calculate account balance (CREDIT - DEBIT)
-                    user_transactions['Amount'] = user_transactions['Amount'].astype(float)
-                    
-                    # Calculate credit and debit separately
-                    credits = user_transactions[user_transactions['Transaction_type'] == 'CREDIT']['Amount'].sum()
-                    debits = user_transactions[user_transactions['Transaction_type'] == 'DEBIT']['Amount'].sum()
-                    
-                    # Calculate net balance
-                    balance = credits - debits
-                    
-                    print(f"User {aadhar_id} - Credits: {credits}, Debits: {debits}, Balance: {balance}")
-                    
-                    # Calculate credit score based on account balance
-                    if balance >= 1000000:  # Rs. 10,00,000
-                        credit_score = 900
-                    elif balance <= 100000:  # Rs. 1,00,000
-                        credit_score = 300
-                    else:
-                        # Score adjusts by 10 points for every Rs. 15,000 change in balance
-                        excess_balance = balance - 100000
-                        credit_score = 300 + int((excess_balance / 15000) * 10)
-                        
-                        # Cap at 900
-                        credit_score = min(900, credit_score)
-                    
-                    print(f"Calculated credit score: {credit_score}")
-                    
-                    # Make sure credit score is above 450 for users with high balances
-                    if balance >= 500000:  # Rs. 5,00,000
-                        credit_score = max(credit_score, 700)
-                    elif balance >= 250000:  # Rs. 2,50,000
-                        credit_score = max(credit_score, 600)
-                    elif balance >= 150000:  # Rs. 1,50,000
-                        credit_score = max(credit_score, 500)
-                    
-                    # Update user's credit score
-                    user.credit_score = int(credit_score)
-                
-                user.save()
+            user.credit_score, user.credit_score_model = score_from_transactions(aadhar_id)
+            user.save()
         except Exception as e:
             # Log the error but continue
             print(f"Error calculating credit score: {str(e)}")
@@ -171,115 +125,58 @@ class RegisterUserView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class BulkRegisterUsersView(FastJSONResponseMixin, APIView):
+    """
+    API view for registering a batch of users, with a result per row.
+    """
+    
+    def post(self, request):
+        users = request.data.get('users') if hasattr(request.data, 'get') else None
+        if not isinstance(users, list):
+            return Response({"error": "users: Expected a list of users."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(users) > settings.BULK_REGISTRATION_MAX_ROWS:
+            return Response({
+                "error": f"users: Ensure this list has no more than {settings.BULK_REGISTRATION_MAX_ROWS} users."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = onboarding.register_users(users)
+        
+        return Response({"error": None, **result}, status=status.HTTP_200_OK)
+
+
 class ApplyLoanView(APIView):
     """
     API view for loan application.
     """
     
     def post(self, request):
-        serializer = LoanApplicationSerializer(data=request.data)
-        if not serializer.is_valid():
-            # Convert validation errors to a simple string message
-            error_message = ""
-            for field, errors in serializer.errors.items():
-                error_message += f"{field}: {' '.join(errors)} "
-            return Response({"error": error_message.strip()}, status=status.HTTP_400_BAD_REQUEST)
+        data, errors = LoanApplicationSchema.validate(request.data)
+        if errors:
+            return Response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Extract validated data
-        unique_user_id = serializer.validated_data.get('unique_user_id')
-        loan_type = serializer.validated_data.get('loan_type')
-        loan_amount = serializer.validated_data.get('loan_amount')
-        interest_rate = serializer.validated_data.get('interest_rate')
-        term_period = serializer.validated_data.get('term_period')
-        disbursement_date = serializer.validated_data.get('disbursement_date')
+        unique_user_id = data.get('unique_user_id')
+        loan_type = data.get('loan_type')
+        loan_amount = data.get('loan_amount')
+        interest_rate = data.get('interest_rate')
+        term_period = data.get('term_period')
+        disbursement_date = data.get('disbursement_date')
         
         try:
-            # Get user
-            user = User.objects.get(unique_user_id=unique_user_id)
-            
-            # Check credit score
-            if not user.credit_score or user.credit_score < 300:
-                return Response({
-                    "error": "Loan application rejected. Credit score is too low."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            print(f"User credit score: {user.credit_score}")
-            
-            # Check annual income
-            if user.annual_income < 150000:  # Rs. 1,50,000
-                return Response({
-                    "error": "Loan application rejected. Annual income is below the minimum requirement."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check loan amount (already validated in serializer)
+            # Get user, preferring the replica for the eligibility checks.
+            # A user registered moments ago may not have replicated yet.
+            try:
+                with use_read_replica():
+                    user = entity_cache.get_user(unique_user_id)
+            except User.DoesNotExist:
+                user = entity_cache.get_user(unique_user_id)
             
-            # Calculate monthly income
-            monthly_income = user.annual_income / 12
-            
-            # Calculate EMI amount for first month (principal portion + interest)
-            principal_portion = loan_amount * Decimal('0.03')  # 3% of principal
-            monthly_interest = (loan_amount * interest_rate / 100) / 12
-            emi_amount = principal_portion + monthly_interest
-            
-            # Check if EMI exceeds 20% of monthly income
-            if emi_amount > (monthly_income * Decimal('0.2')):
-                return Response({
-                    "error": "Loan application rejected. EMI exceeds 20% of monthly income."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check if monthly interest is at least Rs. 50
-            if monthly_interest < 50:
-                return Response({
-                    "error": "Loan application rejected. Monthly interest is below the minimum requirement."
-                }, status=status.HTTP_400_BAD_REQUEST)
+            check_loan_eligibility(user, loan_amount, interest_rate)
             
             # Create loan with atomic transaction
-            with transaction.atomic():
-                loan = Loan.objects.create(
-                    user=user,
-                    loan_type=loan_type,
-                    loan_amount=loan_amount,
-                    interest_rate=interest_rate,
-                    term_period=term_period,
-                    disbursement_date=disbursement_date,
-                    principal_balance=loan_amount,
-                    status='ACTIVE'
-                )
-                
-                # Calculate EMI schedule
-                due_dates = []
-                remaining_principal = loan_amount
-                
-                for month in range(1, term_period + 1):
-                    due_date = disbursement_date + timedelta(days=30 * month)
-                    
-                    # Calculate interest for this month
-                    monthly_interest = (remaining_principal * interest_rate / 100) / 12
-                    
-                    # Calculate principal portion (3% of the original principal)
-                    principal_portion = loan_amount * Decimal('0.03')
-                    
-                    # For the last month, adjust to pay all remaining principal
-                    if month == term_period:
-                        amount_due = remaining_principal + monthly_interest
-                    else:
-                        amount_due = principal_portion + monthly_interest
-                        remaining_principal -= principal_portion
-                    
-                    # Round to nearest integer
-                    amount_due = round(amount_due)
-                    
-                    # Create EMI schedule entry
-                    EMISchedule.objects.create(
-                        loan=loan,
-                        due_date=due_date,
-                        amount_due=amount_due
-                    )
-                    
-                    due_dates.append({
-                        "date": due_date.strftime('%Y-%m-%d'),
-                        "amount_due": amount_due
-                    })
+            loan, due_dates = create_loan(
+                user, loan_type, loan_amount, interest_rate, term_period, disbursement_date
+            )
             
             # Return success response with loan details
             return Response({
@@ -298,99 +195,39 @@ class ApplyLoanView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class MakePaymentView(APIView):
+class MakePaymentView(FastJSONResponseMixin, APIView):
     """
     API view for processing loan payments.
     """
     
     def post(self, request):
-        serializer = PaymentSerializer(data=request.data)
-        if not serializer.is_valid():
-            # Convert validation errors to a simple string message
-            error_message = ""
-            for field, errors in serializer.errors.items():
-                error_message += f"{field}: {' '.join(errors)} "
-            return Response({"error": error_message.strip()}, status=status.HTTP_400_BAD_REQUEST)
+        data, errors = PaymentSchema.validate(request.data)
+        if errors:
+            return Response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Extract validated data
-        loan_id = serializer.validated_data.get('loan_id')
-        amount = serializer.validated_data.get('amount')
+        loan_id = data.get('loan_id')
+        amount = data.get('amount')
         
         try:
             # Get loan
-            loan = Loan.objects.get(loan_id=loan_id)
-            
-            # Check if loan is active
-            if loan.status != 'ACTIVE':
-                return Response({
-                    "error": f"Payment rejected. Loan is not active, current status: {loan.status}."
-                }, status=status.HTTP_400_BAD_REQUEST)
+            loan = entity_cache.get_loan(loan_id, with_user=True)
             
-            # Get upcoming EMIs that are not paid
-            unpaid_emis = EMISchedule.objects.filter(
-                loan=loan,
-                is_paid=False
-            ).order_by('due_date')
-            
-            if not unpaid_emis:
-                return Response({
-                    "error": "Payment rejected. No pending EMIs found."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Check if trying to pay for future EMIs before past EMIs
-            earliest_unpaid_emi = unpaid_emis[0]
+            # Get the earliest EMI that is not paid
+            earliest_unpaid_emi = None
+            if loan.status == 'ACTIVE':
+                earliest_unpaid_emi = EMISchedule.objects.filter(
+                    loan=loan,
+                    is_paid=False
+                ).order_by('due_date').first()
             
-            # Check if payment matches the due amount for the earliest unpaid EMI
-            if amount != earliest_unpaid_emi.amount_due:
-                return Response({
-                    "error": f"Payment rejected. The amount does not match the due installment of ₹{earliest_unpaid_emi.amount_due}."
-                }, status=status.HTTP_400_BAD_REQUEST)
+            check_payment(loan, amount, earliest_unpaid_emi)
             
-            # Process payment with atomic transaction
-            with transaction.atomic():
-                # Create payment record
-                payment = Payment.objects.create(
-                    loan=loan,
-                    amount=amount,
-                    payment_date=timezone.now(),
-                    status='COMPLETED'
-                )
-                
-                # Update EMI schedule
-                earliest_unpaid_emi.is_paid = True
-                earliest_unpaid_emi.save()
-                
-                # Update principal balance
-                # Get current bill
-                current_bill = Bill.objects.filter(
-                    loan=loan,
-                    status__in=['GENERATED', 'PARTIALLY_PAID']
-                ).order_by('-billing_date').first()
-                
-                if current_bill:
-                    # Update bill status
-                    if current_bill.amount_paid + amount >= current_bill.total_due_amount:
-                        current_bill.status = 'PAID'
-                    else:
-                        current_bill.status = 'PARTIALLY_PAID'
-                    
-                    current_bill.amount_paid += amount
-                    current_bill.save()
-                
-                # Reduce the principal balance by the principal portion (excluding interest)
-                if loan.principal_balance > 0:
-                    # Calculate interest portion
-                    interest_portion = (loan.principal_balance * loan.interest_rate / 100) / 12
-                    principal_portion = amount - interest_portion
-                    
-                    # Ensure we don't go below zero
-                    loan.principal_balance = max(0, loan.principal_balance - principal_portion)
-                    
-                    # If principal balance is zero, check if all EMIs are paid
-                    if loan.principal_balance == 0 and not EMISchedule.objects.filter(loan=loan, is_paid=False).exists():
-                        loan.status = 'CLOSED'
-                    
-                    loan.save()
+            # Process payment with atomic transaction, or in the writer's next batch
+            if settings.PAYMENT_WRITE_QUEUE:
+                payment_queue.submit(loan, amount).result()
+            else:
+                record_payment(loan, amount, earliest_unpaid_emi)
             
             # Return success response
             return Response({
@@ -408,82 +245,168 @@ class MakePaymentView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class GetStatementView(APIView):
+def prepayment_response(payment, schedule, foreclosed, loan):
+    """The response body of a prepayment or foreclosure."""
+    return {
+        "error": None,
+        "message": f"{'Foreclosure' if foreclosed else 'Prepayment'} of ₹{payment.amount} recorded successfully.",
+        "principal_balance": loan.principal_balance,
+        "status": loan.status,
+        "due_dates": [
+            {"date": due_date.strftime('%Y-%m-%d'), "amount_due": amount_due}
+            for due_date, amount_due in schedule
+        ]
+    }
+
+
+class PrepayLoanView(FastJSONResponseMixin, APIView):
+    """
+    API view for prepaying part of a loan, which recomputes its remaining EMIs.
+    """
+
+    schema = PaymentSchema
+    foreclose = False
+
+    def post(self, request):
+        data, errors = self.schema.validate(request.data)
+        if errors:
+            return Response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            loan = entity_cache.get_loan(data.get('loan_id'), with_user=True)
+            # Always written directly: prepayments don't go through the payment queue
+            payment, schedule = record_prepayment(loan, None if self.foreclose else data.get('amount'))
+            return Response(prepayment_response(payment, schedule, self.foreclose, loan), status=status.HTTP_200_OK)
+
+        except Loan.DoesNotExist:
+            return Response({
+                "error": "Loan not found."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                "error": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ForecloseLoanView(PrepayLoanView):
+    """
+    API view for paying a loan off in full at its foreclosure amount.
+    """
+
+    schema = ForeclosureSchema
+    foreclose = True
+
+
+class GetStatementView(FastJSONResponseMixin, APIView):
     """
     API view for fetching loan statements.
     """
     
     def get(self, request):
-        serializer = StatementSerializer(data=request.query_params)
-        if not serializer.is_valid():
-            # Convert validation errors to a simple string message
-            error_message = ""
-            for field, errors in serializer.errors.items():
-                error_message += f"{field}: {' '.join(errors)} "
-            return Response({"error": error_message.strip()}, status=status.HTTP_400_BAD_REQUEST)
+        data, errors = StatementSchema.validate(request.query_params)
+        if errors:
+            return Response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Extract validated data
-        loan_id = serializer.validated_data.get('loan_id')
+        loan_id = data.get('loan_id')
         
         try:
-            # Get loan
-            loan = get_object_or_404(Loan, loan_id=loan_id)
-            
-            # Check if loan is closed
-            if loan.status == 'CLOSED':
-                return Response({
-                    "error": "Loan does not exist or has been closed."
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Get past transactions (paid EMIs)
-            past_transactions = []
-            paid_emis = EMISchedule.objects.filter(
-                loan=loan,
-                is_paid=True
-            ).order_by('due_date')
-            
-            for emi in paid_emis:
-                # Get corresponding payment - don't restrict to the exact due date
-                payment = Payment.objects.filter(
-                    loan=loan
-                ).order_by('payment_date').first()
-                
-                if payment:
-                    # Calculate principal and interest portions more accurately
-                    # Calculate interest portion (monthly interest)
-                    monthly_interest = (loan.loan_amount * loan.interest_rate / 100) / 12
-                    # Principal is the payment amount minus the interest
-                    principal_portion = payment.amount - monthly_interest
-                    
-                    # Round values to 2 decimal places for readability
-                    past_transactions.append({
-                        "date": emi.due_date.strftime('%Y-%m-%d'),
-                        "principal_due": round(principal_portion, 2),
-                        "interest": round(monthly_interest, 2),
-                        "amount_paid": round(payment.amount, 2)
-                    })
-            
-            # Get upcoming transactions (unpaid EMIs)
-            upcoming_transactions = []
-            unpaid_emis = EMISchedule.objects.filter(
-                loan=loan,
-                is_paid=False
-            ).order_by('due_date')
-            
-            for emi in unpaid_emis:
-                upcoming_transactions.append({
-                    "date": emi.due_date.strftime('%Y-%m-%d'),
-                    "amount_due": round(emi.amount_due, 2)
-                })
-            
-            # Return success response
-            return Response({
-                "error": None,
-                "past_transactions": past_transactions,
-                "upcoming_transactions": upcoming_transactions
-            }, status=status.HTTP_200_OK)
-            
+            with use_read_replica():
+                etag = statement_versions.etag(loan_id)
+                not_modified = statement_versions.not_modified(request, etag)
+                if not_modified is not None:
+                    return not_modified
+                response = self.build_statement(loan_id)
+            if etag is not None and response.status_code == status.HTTP_200_OK:
+                statement_versions.tag(response, etag)
+            return response
         except Exception as e:
             return Response({
                 "error": str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
+
+    def build_statement(self, loan_id):
+        """Assemble the statement payload for a loan."""
+        # Get loan
+        try:
+            loan = entity_cache.get_loan(loan_id)
+        except Loan.DoesNotExist:
+            raise Http404("No Loan matches the given query.")
+        
+        # Check if loan is closed
+        if loan.status == 'CLOSED':
+            return Response({
+                "error": "Loan does not exist or has been closed."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        paid_emis = EMISchedule.objects.filter(
+            loan=loan,
+            is_paid=True
+        ).order_by('due_date')
+        unpaid_emis = EMISchedule.objects.filter(
+            loan=loan,
+            is_paid=False
+        ).order_by('due_date')
+        first_payment = Payment.objects.filter(
+            loan=loan
+        ).order_by('payment_date').first()
+        
+        past_transactions, upcoming_transactions = statement_transactions(
+            loan, paid_emis, unpaid_emis, first_payment
+        )
+        
+        # Return success response
+        return Response({
+            "error": None,
+            "past_transactions": past_transactions,
+            "upcoming_transactions": upcoming_transactions
+        }, status=status.HTTP_200_OK)
+
+
+class PortfolioView(APIView):
+    """
+    API view for book-level portfolio analytics.
+    """
+    
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({"error": "days: A valid integer is required."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        with use_read_replica():
+            report = portfolio_summary(timezone.localdate(), days=max(days, 1))
+        
+        return Response({"error": None, **report}, status=status.HTTP_200_OK)
+
+
+class CacheStatsView(APIView):
+    """
+    API view for the hit and miss counts of the hot-entity cache.
+    """
+    
+    def get(self, request):
+        return Response({"error": None, **entity_cache.stats()}, status=status.HTTP_200_OK)
+
+
+class GetBalanceView(APIView):
+    """
+    API view for a loan's balances today or at the end of a past day, from the ledger.
+    """
+    
+    def get(self, request):
+        data, errors = BalanceSchema.validate(request.query_params)
+        if errors:
+            return Response({"error": validation_error_message(errors)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        loan_id = data.get('loan_id')
+        with use_read_replica():
+            try:
+                entity_cache.get_loan(loan_id)
+            except Loan.DoesNotExist:
+                return Response({
+                    "error": "Loan not found."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            balance = ledger.balance_as_of(loan_id, data.get('as_of'))
+        
+        return Response({"error": None, "loan_id": loan_id, **balance}, status=status.HTTP_200_OK)